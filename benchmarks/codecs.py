@@ -0,0 +1,49 @@
+"""
+Benchmark comparing the wall time and the CPU time of writing a tar of a
+synthetic root filesystem with single threaded gzip (`w:gz`, as image
+tars used to be written) and with each codec.
+
+The zstd codec is only measured if the zstandard package is installed.
+
+Usage: python benchmarks/codecs.py [size in MiB]
+"""
+import os
+import sys
+import gzip
+import time
+import shutil
+import tempfile
+import importlib.util
+
+from synthetic import synthetic_rootfs
+from fetchy.codec import CODECS
+
+
+def measure(name, open_output, source, directory):
+    path = os.path.join(directory, name)
+    start = (time.perf_counter(), time.process_time())
+    with open(source, "rb") as rootfs, open_output(path) as output:
+        shutil.copyfileobj(rootfs, output, 64 * 1024)
+    wall = time.perf_counter() - start[0]
+    cpu = time.process_time() - start[1]
+    ratio = os.path.getsize(path) / os.path.getsize(source)
+    print(f"{name:>6}: {wall:6.2f}s wall, {cpu:6.2f}s cpu, {ratio:.1%} of the size")
+    os.unlink(path)
+
+
+def main(size=1024):
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "rootfs.tar")
+        synthetic_rootfs(source, int(size) * 1024 * 1024)
+        size = os.path.getsize(source) / 1024 ** 2
+        print(f"{size:.0f} MiB rootfs, {os.cpu_count()} cpus")
+
+        measure("w:gz", lambda path: gzip.open(path, "wb"), source, directory)
+        for (name, codec) in CODECS.items():
+            if name == "zstd" and importlib.util.find_spec("zstandard") is None:
+                continue
+            measure(name, codec().open, source, directory)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,57 @@
+"""
+Benchmark comparing a warm start from a pickled Repository with a
+warm start from a memory mapped package index, resolving a few
+hundred packages from a synthetic 60k package index.
+
+Usage: python benchmarks/index.py [count] [lookups]
+"""
+import gc
+import io
+import os
+import sys
+import time
+import pickle
+import tempfile
+
+from synthetic import synthetic_index
+from fetchy.plugins.packages.parser import iter_stanzas, DEFAULT_FIELDS
+from fetchy.plugins.packages.package import package_from_dict
+from fetchy.plugins.packages.repository import Repository
+from fetchy.plugins.packages.index import PackageIndex, write_index
+
+
+def main(count=60000, lookups=300):
+    stanzas = list(iter_stanzas(io.BytesIO(synthetic_index(count)), DEFAULT_FIELDS))
+    names = [stanza["Package"] for stanza in stanzas[::count // lookups]]
+
+    repository = Repository()
+    for stanza in stanzas:
+        repository.add(package_from_dict(stanza, "http://localhost/"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_path = os.path.join(directory, "repository.pkl")
+        index_path = os.path.join(directory, "repository.idx")
+
+        with open(pickle_path, "wb") as pkl_file:
+            pickle.dump(repository, pkl_file)
+        write_index(index_path, stanzas, "http://localhost/")
+
+        del repository, stanzas
+        gc.collect()
+
+        start = time.perf_counter()
+        repository = Repository(indices=[PackageIndex(index_path)])
+        for name in names:
+            repository[name].dependencies
+        print(f"  mmap: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        start = time.perf_counter()
+        with open(pickle_path, "rb") as pkl_file:
+            repository = pickle.load(pkl_file)
+        for name in names:
+            repository[name].dependencies
+        print(f"pickle: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
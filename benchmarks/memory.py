@@ -0,0 +1,40 @@
+"""
+Benchmark reporting the memory held per package once every package
+of an index has been built and its dependency fields parsed.
+
+Usage: python benchmarks/memory.py [path to a Packages(.gz|.xz) file]
+"""
+import io
+import gc
+import sys
+import tracemalloc
+
+from synthetic import load_index
+from fetchy.plugins.packages.parser import iter_stanzas, DEFAULT_FIELDS
+from fetchy.plugins.packages.package import package_from_dict
+
+
+def main(path=None):
+    stanzas = list(iter_stanzas(io.BytesIO(load_index(path)), DEFAULT_FIELDS))
+    origin = "http://localhost/"
+
+    gc.collect()
+    tracemalloc.start()
+    packages = []
+    for stanza in stanzas:
+        package = package_from_dict(stanza, origin)
+        package.dependencies
+        package.pre_dependencies
+        package.provides
+        packages.append(package)
+
+    del stanzas
+    gc.collect()
+    (current, _) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{len(packages)} packages, {current / len(packages):.0f} bytes per package")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
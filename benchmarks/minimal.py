@@ -0,0 +1,47 @@
+"""
+Benchmark the total installed size of the closures picked by the
+Resolver, which picks the smallest alternative, and the MinimalResolver,
+which picks the alternative adding the least to the closure.
+
+The closure of every package in a sample is resolved on its own, with a
+single resolver per kind so memoized closures are shared between them.
+
+Usage: python benchmarks/minimal.py [path to a Packages(.gz|.xz) file] [sample]
+"""
+import io
+import sys
+import time
+
+from synthetic import load_index
+from fetchy.plugins.packages.parser import iter_stanzas, DEFAULT_FIELDS
+from fetchy.plugins.packages.package import package_from_dict
+from fetchy.plugins.packages.repository import Repository
+from fetchy.plugins.packages.resolver import Resolver, MinimalResolver
+
+
+def measure(name, resolver, names):
+    start = time.perf_counter()
+    (count, size) = (0, 0)
+    for package in names:
+        closure = resolver.gather_dependencies([package])
+        count += len(closure)
+        size += sum(package.installed_size for package in closure.values())
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>7}: {len(names)} closures, {count / len(names):.0f} packages "
+        f"and {size / len(names) / 1024:.0f} MiB on average in {elapsed:.2f}s"
+    )
+
+
+def main(path=None, sample=100):
+    repository = Repository()
+    for stanza in iter_stanzas(io.BytesIO(load_index(path, 5000)), DEFAULT_FIELDS):
+        repository.add(package_from_dict(stanza, "http://localhost/"))
+    names = list(repository.pkgs)[-int(sample) :]
+
+    measure("simple", Resolver(repository), names)
+    measure("minimal", MinimalResolver(repository), names)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
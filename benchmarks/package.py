@@ -0,0 +1,51 @@
+"""
+Benchmark comparing eager and lazy parsing of the dependency fields
+of every package in an index, reporting parse time and the peak
+memory allocated while building the packages.
+
+Usage: python benchmarks/package.py [path to a Packages(.gz|.xz) file]
+"""
+import io
+import sys
+import time
+import tracemalloc
+
+from synthetic import load_index
+from fetchy.plugins.packages.parser import iter_stanzas, DEFAULT_FIELDS
+from fetchy.plugins.packages.package import package_from_dict
+
+
+def build(stanzas, eager):
+    packages = []
+    for stanza in stanzas:
+        package = package_from_dict(stanza, "http://localhost/")
+        if eager:
+            package.dependencies
+            package.pre_dependencies
+            package.provides
+        packages.append(package)
+    return packages
+
+
+def measure(name, stanzas, eager):
+    tracemalloc.start()
+    start = time.perf_counter()
+    packages = build(stanzas, eager)
+    elapsed = time.perf_counter() - start
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:>5}: {len(packages)} packages in {elapsed:.2f}s, "
+        f"peak {peak / 1024 / 1024:.1f}MB"
+    )
+
+
+def main(path=None):
+    stanzas = list(iter_stanzas(io.BytesIO(load_index(path)), DEFAULT_FIELDS))
+
+    measure("eager", stanzas, True)
+    measure("lazy", stanzas, False)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,54 @@
+"""
+Benchmark comparing the line based text parser with the
+bytes level stanza parser on a synthetic 60k package index.
+
+Usage: python benchmarks/parser.py [count]
+"""
+import io
+import sys
+import time
+
+from synthetic import synthetic_index
+from fetchy.plugins.packages.parser import iter_stanzas, DEFAULT_FIELDS
+
+
+def legacy_stanzas(fp, fields):
+    pkg = {}
+    for line in fp:
+        if line.startswith("\r\n") or line.startswith("\n"):
+            if pkg:
+                yield pkg
+                pkg = {}
+
+        for field in fields:
+            if line.startswith(field):
+                pkg[field] = line.rstrip()[(len(field) + 2) :]
+                break
+
+
+def measure(name, function, data, count):
+    start = time.perf_counter()
+    parsed = sum(1 for _ in function(data))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8}: {parsed} stanzas in {elapsed:.2f}s ({count / elapsed:,.0f} stanzas/s)")
+
+
+def main(count=60000):
+    data = synthetic_index(count)
+
+    measure(
+        "legacy",
+        lambda data: legacy_stanzas(io.StringIO(data.decode()), DEFAULT_FIELDS),
+        data,
+        count,
+    )
+    measure(
+        "bytes",
+        lambda data: iter_stanzas(io.BytesIO(data), DEFAULT_FIELDS),
+        data,
+        count,
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,80 @@
+"""
+Benchmark resolving the dependency closure of every package of an
+index in a single pass, and comparing the iterative worklist resolver
+with the recursive resolver that tracked visited names in a list.
+
+The closure of a texlive-full like index is resolved twice by the same
+resolver, the second time every candidate has been chosen already and
+only the dependency graph is walked.
+
+Usage: python benchmarks/resolver.py [path to a Packages(.gz|.xz) file] [sample]
+"""
+import io
+import sys
+import time
+
+from synthetic import load_index, texlive_index
+from fetchy.plugins.packages.parser import iter_stanzas, DEFAULT_FIELDS
+from fetchy.plugins.packages.package import package_from_dict
+from fetchy.plugins.packages.repository import Repository
+from fetchy.plugins.packages.resolver import Resolver
+
+
+class RecursiveResolver(Resolver):
+    def gather_dependencies(self, names, excludes=()):
+        visited = []
+        items = {}
+        for name in names:
+            self.gather_dependency_tree(name, items, visited, excludes)
+        return items
+
+    def gather_dependency_tree(self, name, to_install, visited, excludes):
+        if name in visited:
+            return
+        visited.append(name)
+        if name in excludes or not name or name not in self.packages:
+            return
+
+        package = self.packages[name]
+        for candidate in self._candidates(package):
+            self.gather_dependency_tree(candidate, to_install, visited, excludes)
+        to_install[name] = package
+
+
+def load_repository(data):
+    repository = Repository()
+    for stanza in iter_stanzas(io.BytesIO(data), DEFAULT_FIELDS):
+        repository.add(package_from_dict(stanza, "http://localhost/"))
+    return repository
+
+
+def measure(name, resolver, names):
+    start = time.perf_counter()
+    closure = resolver.gather_dependencies(names)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>9}: closure of {len(names)} packages "
+        f"({len(closure)} packages) in {elapsed:.3f}s"
+    )
+
+
+def main(path=None, sample=2000):
+    sys.setrecursionlimit(100000)
+
+    repository = load_repository(load_index(path))
+    names = list(repository.pkgs)
+
+    measure("worklist", Resolver(repository), names)
+
+    # The recursive resolver is quadratic in the size of the closure,
+    # compare both on a sample of the packages.
+    measure("worklist", Resolver(repository), names[: int(sample)])
+    measure("recursive", RecursiveResolver(repository), names[: int(sample)])
+
+    resolver = Resolver(load_repository(texlive_index()))
+    measure("cold", resolver, ["texlive-full"])
+    measure("warm", resolver, ["texlive-full"])
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
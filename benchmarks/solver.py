@@ -0,0 +1,51 @@
+"""
+Benchmark resolving large closures with the ConstraintResolver, such as
+the closure of `texlive-full`, next to the Resolver that ignores versions
+and conflicts.
+
+Without arguments a synthetic texlive-full shaped index is added to a
+synthetic index of 60000 packages.
+
+Usage: python benchmarks/solver.py [path to a Packages(.gz|.xz) file] [package...]
+"""
+import io
+import sys
+import time
+
+from synthetic import load_index, texlive_index
+from fetchy.plugins.packages.parser import iter_stanzas, DEFAULT_FIELDS
+from fetchy.plugins.packages.package import package_from_dict
+from fetchy.plugins.packages.repository import Repository
+from fetchy.plugins.packages.resolver import Resolver
+from fetchy.plugins.packages.solver import ConstraintResolver
+
+
+def measure(name, resolver, names, runs=3):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        closure = resolver.gather_dependencies(names)
+        timings.append(time.perf_counter() - start)
+    print(
+        f"{name:>10}: {len(closure)} packages, "
+        f"first run {timings[0] * 1000:.0f}ms, "
+        f"warm {min(timings[1:]) * 1000:.0f}ms"
+    )
+
+
+def main(path=None, *names):
+    data = load_index(path)
+    if not path:
+        data += b"\n" + texlive_index()
+    names = list(names) or ["texlive-full"]
+
+    repository = Repository()
+    for stanza in iter_stanzas(io.BytesIO(data), DEFAULT_FIELDS):
+        repository.add(package_from_dict(stanza, "http://localhost/"))
+
+    measure("constraint", ConstraintResolver(repository, architecture="amd64"), names)
+    measure("worklist", Resolver(repository), names)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,176 @@
+"""
+Helpers for generating synthetic package indices, shaped like
+the `Packages` files found on Ubuntu and Debian mirrors, and
+synthetic root filesystems.
+"""
+import io
+import gzip
+import lzma
+import random
+import tarfile
+
+DESCRIPTION = (
+    "Description: synthetic package used for benchmarking\n"
+    " This package does not exist, it is generated to resemble\n"
+    " a stanza found in the main and universe components.\n"
+    " .\n"
+    " It contains a multi-line description on purpose.\n"
+)
+
+
+def synthetic_index(count=60000, seed=42):
+    """
+    Return a synthetic `Packages` index containing `count` stanzas as bytes.
+    """
+    rng = random.Random(seed)
+    names = [f"pkg{i}" for i in range(count)]
+    stanzas = []
+    for (i, name) in enumerate(names):
+        depends = ", ".join(
+            f"{rng.choice(names[:i] or names)} (>= {rng.randint(0, 9)}.{rng.randint(0, 9)})"
+            if rng.random() < 0.5
+            else f"{rng.choice(names)} | {rng.choice(names)}"
+            for _ in range(rng.randint(0, 6))
+        )
+        lines = [
+            f"Package: {name}",
+            "Architecture: amd64",
+            f"Version: {rng.randint(0, 2)}:{rng.randint(0, 9)}.{rng.randint(0, 20)}-{rng.randint(1, 5)}ubuntu{rng.randint(0, 3)}",
+            "Priority: optional",
+            "Section: misc",
+            "Maintainer: Ubuntu Developers <ubuntu-devel-discuss@lists.ubuntu.com>",
+            f"Installed-Size: {rng.randint(1, 100000)}",
+        ]
+        if rng.random() < 0.1:
+            lines.append(f"Provides: virtual{rng.randint(0, 500)}")
+        if rng.random() < 0.2:
+            lines.append(f"Pre-Depends: {rng.choice(names)}")
+        if depends:
+            lines.append(f"Depends: {depends}")
+        lines += [
+            f"Filename: pool/main/{name[0]}/{name}/{name}_1.0_amd64.deb",
+            f"Size: {rng.randint(1000, 10000000)}",
+            f"MD5sum: {rng.getrandbits(128):032x}",
+            f"SHA1: {rng.getrandbits(160):040x}",
+            f"SHA256: {rng.getrandbits(256):064x}",
+        ]
+        stanzas.append("\n".join(lines) + "\n" + DESCRIPTION)
+    return "\n".join(stanzas).encode()
+
+
+def load_index(path=None, count=60000):
+    """
+    Return the contents of a (compressed) `Packages` index as bytes, or a
+    synthetic index of `count` stanzas if no path is given.
+    """
+    if not path:
+        return synthetic_index(count)
+    if path.endswith(".xz"):
+        return lzma.open(path).read()
+    if path.endswith(".gz"):
+        return gzip.open(path).read()
+    with open(path, "rb") as index_file:
+        return index_file.read()
+
+
+def texlive_index(seed=42):
+    """
+    Return a synthetic `Packages` index shaped like the closure of
+    `texlive-full`: a few hundred texlive packages on top of layers of
+    libraries and fonts, with versioned dependencies, alternatives,
+    virtual packages, Breaks/Conflicts and architecture qualifiers.
+    """
+    rng = random.Random(seed)
+    stanzas = []
+
+    def add(name, version, architecture="amd64", **fields):
+        lines = [
+            f"Package: {name}",
+            f"Architecture: {architecture}",
+            f"Version: {version}",
+            f"Installed-Size: {rng.randint(1, 100000)}",
+        ]
+        lines += [f"{field.replace('_', '-')}: {value}" for (field, value) in fields.items() if value]
+        lines.append(f"Filename: pool/main/{name[0]}/{name}/{name}_{version}_{architecture}.deb")
+        stanzas.append("\n".join(lines) + "\n" + DESCRIPTION)
+
+    libraries = [f"lib{i}" for i in range(800)]
+    for (i, name) in enumerate(libraries):
+        for version in range(1, 4):
+            depends = ", ".join(
+                f"{rng.choice(libraries[:i])} (>= {rng.randint(1, 2)})"
+                for _ in range(rng.randint(0, 4) if i else 0)
+            )
+            add(name, f"{version}.0-1", Depends=depends)
+        add(name, "3.0-1", architecture="i386")
+
+    fonts = [f"fonts-{i}" for i in range(300)]
+    for (i, name) in enumerate(fonts):
+        add(
+            name,
+            "1.0-1",
+            architecture="all",
+            Depends=f"{rng.choice(libraries)}, fontconfig-config",
+            Provides="xfonts",
+            Conflicts=f"{fonts[i - 1]}" if i % 10 == 1 else "",
+        )
+    add("fontconfig-config", "2.12-1", architecture="all", Depends="ucf")
+    add("ucf", "3.0-1", architecture="all")
+
+    texlive = [f"texlive-{i}" for i in range(600)]
+    add("texlive-base", "2017.20180305-1", architecture="all", Depends="ucf, lib0")
+    for (i, name) in enumerate(texlive):
+        depends = [
+            "texlive-base (>= 2017.20180305)",
+            f"{rng.choice(libraries)} (<< 3)",
+            f"{rng.choice(fonts)} | {rng.choice(fonts)} | xfonts",
+            f"{rng.choice(libraries)} [amd64], {rng.choice(libraries)}-dev [i386]",
+        ]
+        if i:
+            depends.append(f"{rng.choice(texlive[:i])}")
+        if i % 7 == 0:
+            depends.append(f"{name}-broken | {name}-working")
+            add(f"{name}-broken", "1.0-1", architecture="all", Depends="texlive-base (<< 2017)")
+            add(f"{name}-working", "1.0-1", architecture="all")
+        add(
+            name,
+            "2017.20180305-1",
+            architecture="all",
+            Depends=", ".join(depends),
+            Breaks="texlive-base (<< 2016)",
+        )
+
+    add("texlive-full", "2017.20180305-1", architecture="all", Depends=", ".join(texlive))
+    return "\n".join(stanzas).encode()
+
+
+def synthetic_rootfs(path, size=1024 * 1024 * 1024, seed=42):
+    """
+    Write an uncompressed tar of a synthetic root filesystem of about
+    `size` bytes to `path`. Like a real root filesystem it mixes text
+    (scripts, documentation), sparse binaries and compressed data.
+    """
+    rng = random.Random(seed)
+    letters = b"abcdefghijklmnopqrstuvwxyz"
+    words = [
+        bytes(rng.choice(letters) for _ in range(rng.randint(2, 9)))
+        for _ in range(2000)
+    ]
+    text = b" ".join(rng.choice(words) for _ in range(400000))
+    noise = bytes(rng.getrandbits(8) for _ in range(1024 * 1024))
+    binary = b"".join(
+        noise[i : i + 64] + b"\0" * rng.randint(0, 192)
+        for i in range(0, len(noise), 64)
+    )
+    pools = [text, binary, noise]
+
+    written = 0
+    with tarfile.open(path, "w") as tar:
+        while written < size:
+            pool = rng.choices(pools, weights=[5, 4, 1])[0]
+            length = min(int(rng.paretovariate(1.2) * 4096), len(pool) // 2)
+            start = rng.randrange(len(pool) - length)
+            info = tarfile.TarInfo(f"./usr/share/file{tar.offset}")
+            info.size = length
+            tar.addfile(info, io.BytesIO(pool[start : start + length]))
+            written += length
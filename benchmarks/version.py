@@ -0,0 +1,93 @@
+"""
+Microbenchmark sorting every version string of an index, comparing
+a pairwise port of dpkg's `verrevcmp` with the precomputed sort keys
+of Version objects. Also checks that both agree on the ordering.
+
+Usage: python benchmarks/version.py [path to a Packages(.gz|.xz) file]
+"""
+import io
+import sys
+import time
+
+from functools import cmp_to_key
+from operator import attrgetter
+from synthetic import load_index
+from fetchy.plugins.packages.parser import iter_stanzas
+from fetchy.plugins.packages.version import version_from_string
+
+
+def order(character):
+    if character.isdigit():
+        return 0
+    if character.isalpha():
+        return ord(character)
+    if character == "~":
+        return -1
+    if character:
+        return ord(character) + 256
+    return 0
+
+
+def verrevcmp(left, right):
+    (i, j) = (0, 0)
+    while i < len(left) or j < len(right):
+        first_diff = 0
+        while (i < len(left) and not left[i].isdigit()) or (
+            j < len(right) and not right[j].isdigit()
+        ):
+            left_order = order(left[i]) if i < len(left) else 0
+            right_order = order(right[j]) if j < len(right) else 0
+            if left_order != right_order:
+                return left_order - right_order
+            (i, j) = (i + 1, j + 1)
+        while i < len(left) and left[i] == "0":
+            i += 1
+        while j < len(right) and right[j] == "0":
+            j += 1
+        while i < len(left) and left[i].isdigit() and j < len(right) and right[j].isdigit():
+            if not first_diff:
+                first_diff = ord(left[i]) - ord(right[j])
+            (i, j) = (i + 1, j + 1)
+        if i < len(left) and left[i].isdigit():
+            return 1
+        if j < len(right) and right[j].isdigit():
+            return -1
+        if first_diff:
+            return first_diff
+    return 0
+
+
+def dpkg_compare(left, right):
+    if left.epoch != right.epoch:
+        return left.epoch - right.epoch
+    return verrevcmp(left.upstream_version, right.upstream_version) or verrevcmp(
+        left.debian_revision, right.debian_revision
+    )
+
+
+def main(path=None):
+    strings = [
+        stanza["Version"]
+        for stanza in iter_stanzas(io.BytesIO(load_index(path)), ["Version"])
+    ]
+
+    start = time.perf_counter()
+    versions = [version_from_string(string) for string in strings]
+    print(f"        parse: {len(versions)} versions in {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    by_comparator = sorted(versions, key=cmp_to_key(dpkg_compare))
+    print(f"verrevcmp sort: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    by_key = sorted(versions, key=attrgetter("key"))
+    print(f"     key sort: {time.perf_counter() - start:.3f}s")
+
+    mismatches = sum(
+        dpkg_compare(left, right) != 0 for (left, right) in zip(by_comparator, by_key)
+    )
+    print(f"   mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -1,5 +1,7 @@
 import tempfile
 
+from .cache import enforce_cache_budget
+from .codec import get_codec, is_local_daemon
 from .context import Context
 from .dockerfile import DockerFile
 from .dfs import DockerFileSystem
@@ -10,13 +12,18 @@ logger = Logger(__name__)
 
 
 class BluePrint(object):
-    def __init__(self, distribution, codename, architecture, tag, base, plugins):
+    def __init__(
+        self, distribution, codename, architecture, tag, base, plugins, options=None
+    ):
+        if options is None:
+            options = {}
         self.distribution = distribution
         self.architecture = architecture
         self.codename = codename
         self.base = base
         self.tag = tag
         self.plugins = plugins
+        self.options = options
 
     def _create_context(self):
         directory = tempfile.mkdtemp()
@@ -31,18 +38,24 @@ class BluePrint(object):
                 logger.error(f"{plugin.name} failed validation phase.")
                 return
 
-        with self._create_context() as context:
-            for plugin in self.plugins:
-                plugin.build(context)
+        try:
+            with self._create_context() as context:
+                for plugin in self.plugins:
+                    plugin.build(context)
 
-            print("Installing dependencies, this might take a while...")
-            (id, build_id) = context.dockerfile.build()
+                print("Installing dependencies, this might take a while...")
+                (id, build_id) = context.dockerfile.build()
 
-            print("Done! Slimming down image...")
-            dfs = DockerFileSystem(id, self.tag, context.dockerfile.client)
-            dfs.build_minimal_image()
+                print("Done! Slimming down image...")
+                client = context.dockerfile.client
+                codec = get_codec(self.options.get("codec"), is_local_daemon(client))
+                dfs = DockerFileSystem(id, self.tag, client, codec)
+                dfs.build_minimal_image()
 
-            print("Cleaning up...")
-            context.dockerfile.client.images.remove(id)
+                print("Cleaning up...")
+                context.dockerfile.client.images.remove(id)
 
-            return {"tag": self.tag}
+                return {"tag": self.tag}
+        finally:
+            # Entries used by this build are no longer pinned once it is done
+            enforce_cache_budget()
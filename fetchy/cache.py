@@ -0,0 +1,309 @@
+import os
+import re
+import atexit
+import logging
+import threading
+
+from pathlib import Path
+from contextlib import contextmanager
+from fetchy.utils import get_cache_dir
+
+try:
+    import fcntl
+except ImportError:
+    # Without file locks, entries are still marked as used by pinning them
+    # but they are not protected from eviction by other processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# The environment variable holding the byte budget of the cache, if set
+# the cache is pruned after every build.
+CACHE_SIZE_VARIABLE = "FETCHY_CACHE_SIZE"
+
+LOCK_FILE = ".lock"
+PINS_DIRECTORY = "pins"
+
+# The types of entries that are never evicted, the indices of imported
+# packages are small and can not be downloaded again
+PERSISTENT_KINDS = ("imported",)
+
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(size):
+    """Function for parsing a size in bytes
+
+    Sizes are given as a number of bytes with an optional (binary)
+    unit, e.g. `512M`, `10G` or `10GiB`.
+    """
+    match = re.fullmatch(
+        r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*", str(size), re.IGNORECASE
+    )
+    if match is None:
+        raise ValueError(f"Invalid size {size}")
+    return int(float(match.group(1)) * UNITS[match.group(2).upper()])
+
+
+def format_size(size):
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "T"
+    return f"{size:.1f}{unit}" if unit != "B" else f"{size}B"
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+class CacheEntry(object):
+    __slots__ = ("path", "kind", "size", "accessed")
+
+    def __init__(self, path, kind, size, accessed):
+        """
+        A CacheEntry is a single file in the cache directory.
+
+        Parameters
+        ----------
+        path : the path of the file.
+
+        kind : the type of the entry, the directory of the cache it is in
+            (e.g. `debs` or `indices`).
+
+        size : the size of the file in bytes.
+
+        accessed : the time the entry was last used.
+        """
+        self.path = path
+        self.kind = kind
+        self.size = size
+        self.accessed = accessed
+
+
+class CacheManager(object):
+    def __init__(self, directory=None):
+        """
+        The CacheManager keeps track of the size and the last use of the
+        entries in the cache directory and evicts the least recently
+        used entries once the cache exceeds its budget.
+
+        Entries are marked as used by pinning them, which also protects
+        them from eviction for as long as the pinning process runs.
+        Every process records its pins in a pin file it holds a lock on,
+        the pins of a process that is no longer running are ignored.
+        Pins are only recorded on platforms with `fcntl`.
+
+        Parameters
+        ----------
+        directory : the cache directory, by default `get_cache_dir()`.
+        """
+        if directory is None:
+            directory = get_cache_dir()
+        self.directory = Path(directory)
+        self._pins = None
+        self._pinned_paths = set()
+        # Pins are added by the threads of a build, the pin file of this
+        # process is only opened and written by one thread at a time
+        self._pins_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, exclusive=False):
+        """
+        Holds the lock of the cache directory, pins are added with a
+        shared lock while the cache is pruned with an exclusive lock.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(Path(self.directory, LOCK_FILE), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def pin(self, path):
+        """
+        Marks the entry at `path` as used and protects it from eviction
+        until this process exits or releases its pins. Entries should
+        be pinned before checking whether they exist.
+        """
+        pinned = os.path.abspath(path)
+        with self._pins_lock:
+            if pinned in self._pinned_paths:
+                return path
+            if fcntl is None:
+                self._pinned_paths.add(pinned)
+                _touch(path)
+                return path
+
+            with self._locked():
+                if self._pins is None:
+                    pins = Path(self.directory, PINS_DIRECTORY)
+                    pins.mkdir(exist_ok=True)
+                    self._pins = open(Path(pins, f"{os.getpid()}.pins"), "w")
+                    fcntl.flock(self._pins, fcntl.LOCK_EX)
+                    atexit.register(self.release)
+                self._pins.write(f"{pinned}\n")
+                self._pins.flush()
+                self._pinned_paths.add(pinned)
+                _touch(path)
+        return path
+
+    def release(self):
+        """
+        Releases the pins of this process.
+        """
+        with self._pins_lock:
+            self._pinned_paths.clear()
+            if self._pins is not None:
+                with self._locked(exclusive=True):
+                    try:
+                        os.unlink(self._pins.name)
+                    except FileNotFoundError:
+                        pass
+                    self._pins.close()
+                    self._pins = None
+
+    def _pinned(self):
+        """
+        Returns the paths pinned by running processes, removing the pin
+        files of processes that are no longer running.
+        """
+        pinned = set(self._pinned_paths)
+        pins = Path(self.directory, PINS_DIRECTORY)
+        if fcntl is None or not pins.exists():
+            return pinned
+
+        for path in pins.iterdir():
+            if self._pins is not None and path.name == Path(self._pins.name).name:
+                continue
+            try:
+                pin_file = open(path)
+            except FileNotFoundError:
+                # The pin file was released in the meantime
+                continue
+            with pin_file:
+                try:
+                    fcntl.flock(pin_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    pinned.update(pin_file.read().splitlines())
+                    continue
+                os.unlink(path)
+        return pinned
+
+    def entries(self):
+        """
+        Returns a list of all entries in the cache.
+        """
+        entries = []
+        for (root, directories, files) in os.walk(self.directory):
+            root = Path(root)
+            if root == self.directory:
+                directories[:] = [d for d in directories if d != PINS_DIRECTORY]
+                files = [f for f in files if f != LOCK_FILE]
+            kind = root.relative_to(self.directory).parts[:1]
+            for name in files:
+                path = Path(root, name)
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append(
+                    CacheEntry(
+                        path,
+                        kind[0] if kind else "other",
+                        stat.st_size,
+                        max(stat.st_atime, stat.st_mtime),
+                    )
+                )
+        return entries
+
+    def stats(self):
+        """
+        Returns a dictionary of the number of entries, their total size
+        and the time the least recently used entry was used per type.
+        """
+        stats = {}
+        for entry in self.entries():
+            (count, size, oldest) = stats.get(entry.kind, (0, 0, entry.accessed))
+            stats[entry.kind] = (
+                count + 1,
+                size + entry.size,
+                min(oldest, entry.accessed),
+            )
+        return stats
+
+    def prune(self, budget):
+        """
+        Evicts the least recently used entries until the cache fits
+        in `budget` bytes, entries pinned by running processes and
+        entries of PERSISTENT_KINDS are never evicted. Returns the list
+        of evicted entries.
+        """
+        evicted = []
+        with self._locked(exclusive=True):
+            pinned = self._pinned()
+            entries = self.entries()
+            total = sum(entry.size for entry in entries)
+            for entry in sorted(entries, key=lambda entry: entry.accessed):
+                if total <= budget:
+                    break
+                if entry.kind in PERSISTENT_KINDS:
+                    continue
+                if str(entry.path.absolute()) in pinned:
+                    continue
+                try:
+                    entry.path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= entry.size
+                evicted.append(entry)
+        if total > budget:
+            logger.warning(
+                f"The cache uses {format_size(total)} after pruning, "
+                f"entries in use exceed the budget of {format_size(budget)}"
+            )
+        return evicted
+
+
+_managers = {}
+
+
+def get_cache_manager():
+    """
+    Returns the CacheManager of the cache directory of this process.
+    """
+    directory = get_cache_dir()
+    manager = _managers.get(directory)
+    if manager is None:
+        manager = _managers[directory] = CacheManager(directory)
+    return manager
+
+
+def get_cache_budget():
+    """
+    Returns the budget of the cache in bytes set in the environment,
+    or None if the cache is unbounded.
+    """
+    budget = os.environ.get(CACHE_SIZE_VARIABLE)
+    return parse_size(budget) if budget else None
+
+
+def enforce_cache_budget():
+    """
+    Releases the pins of this process and prunes the cache if a
+    budget is set in the environment.
+    """
+    manager = get_cache_manager()
+    manager.release()
+    budget = get_cache_budget()
+    if budget is not None:
+        evicted = manager.prune(budget)
+        if evicted:
+            logger.info(
+                f"Evicted {len(evicted)} cache entries "
+                f"({format_size(sum(entry.size for entry in evicted))})"
+            )
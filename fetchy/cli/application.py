@@ -1,6 +1,7 @@
 from fetchy import Fetchy, __version__
 
 from .commands.blueprint import BlueprintCommand
+from .commands.cache import CacheCommand
 from .commands.dockerize import DockerizeCommand
 
 from fetchy.plugins import PackagesPlugin
@@ -13,4 +14,4 @@ class FetchyApplication(BaseApplication):
         super(FetchyApplication, self).__init__("Fetchy", __version__)
         self.fetchy = Fetchy()
         self.fetchy.register_plugin("packages", PackagesPlugin)
-        self.add_commands(DockerizeCommand(), BlueprintCommand())
+        self.add_commands(DockerizeCommand(), BlueprintCommand(), CacheCommand())
@@ -6,13 +6,19 @@ class BlueprintCommand(FetchyCommandBase):
     Dockerize a blueprint into a docker image.
 
     blueprint
-      {file        : the blueprint to dockerize}
+      {file         : the blueprint to dockerize}
+      {--r|refresh  : If set, check the mirrors for updated package indices}
+      {--offline    : If set, never use the network, only cached packages and local mirrors}
+      {--j|jobs=    : If set, the number of processes to use for parsing package indices}
+      {--downloads= : If set, the number of packages to download concurrently}
+      {--spread=    : If set, the number of fastest mirrors to spread downloads over}
+      {--codec=     : If set, the compression of image tars, either `none`, `gzip` or `zstd`}
     """
 
     def handle(self):
         file = self.argument("file")
 
-        blueprint = self.fetchy.blueprint_from_yaml(file)
+        blueprint = self.fetchy.blueprint_from_yaml(file, self.blueprint_options())
         result = blueprint.dockerize()
 
         self.line(f"Succesfully built image: `{result['tag']}`!")
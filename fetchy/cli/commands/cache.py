@@ -0,0 +1,93 @@
+import time
+
+from .command import FetchyCommandBase
+
+from fetchy.cache import (
+    CACHE_SIZE_VARIABLE,
+    get_cache_budget,
+    get_cache_manager,
+    format_size,
+    parse_size,
+)
+from fetchy.plugins.packages.importer import APT_ARCHIVES, PackageImporter
+
+
+class CacheStatsCommand(FetchyCommandBase):
+    """
+    Show the size of the cache per type of entry.
+
+    stats
+    """
+
+    def handle(self):
+        manager = get_cache_manager()
+        stats = manager.stats()
+        now = time.time()
+
+        rows = [
+            [kind, str(count), format_size(size), f"{(now - oldest) / 86400:.1f}"]
+            for (kind, (count, size, oldest)) in sorted(stats.items())
+        ]
+        count = sum(count for (count, _, _) in stats.values())
+        size = sum(size for (_, size, _) in stats.values())
+        rows.append(["total", str(count), format_size(size), ""])
+        self.render_table(["type", "entries", "size", "oldest (days)"], rows)
+
+        budget = get_cache_budget()
+        if budget is not None:
+            self.line(f"The cache is limited to {format_size(budget)}")
+        self.line(f"Cache directory: {manager.directory}")
+
+
+class CachePruneCommand(FetchyCommandBase):
+    """
+    Evict the least recently used entries of the cache.
+
+    prune
+      {--s|max-size= : The size to shrink the cache to (e.g. `10G`), by default
+              the size set in the FETCHY_CACHE_SIZE environment variable}
+    """
+
+    def handle(self):
+        budget = self.option("max-size")
+        budget = parse_size(budget) if budget is not None else get_cache_budget()
+        if budget is None:
+            self.line_error(
+                f"No size given, use --max-size or set {CACHE_SIZE_VARIABLE}",
+                style="error",
+            )
+            return 1
+
+        evicted = get_cache_manager().prune(budget)
+        self.line(
+            f"Evicted {len(evicted)} entries "
+            f"({format_size(sum(entry.size for entry in evicted))})"
+        )
+
+
+class CacheImportCommand(FetchyCommandBase):
+    """
+    Import debian packages into the cache, to build images offline.
+
+    import
+      {paths?* : The package files, or directories with package files, to import,
+              by default /var/cache/apt/archives}
+    """
+
+    def handle(self):
+        paths = self.argument("paths") or [APT_ARCHIVES]
+        imported = PackageImporter().import_paths(paths)
+        self.line(f"Imported {imported} packages")
+
+
+class CacheCommand(FetchyCommandBase):
+    """
+    Manage the cache of Fetchy.
+
+    cache
+    """
+
+    commands = [CacheStatsCommand(), CachePruneCommand(), CacheImportCommand()]
+
+    def handle(self):
+        return self.call("help", self._config.name)
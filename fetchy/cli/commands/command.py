@@ -5,3 +5,19 @@ class FetchyCommandBase(Command):
     @property
     def fetchy(self):
         return self.application.fetchy
+
+    def blueprint_options(self):
+        """
+        The options of this command that are passed on to a BluePrint.
+        """
+        jobs = self.option("jobs")
+        downloads = self.option("downloads")
+        spread = self.option("spread")
+        return {
+            "refresh": self.option("refresh"),
+            "offline": self.option("offline"),
+            "jobs": int(jobs) if jobs is not None else None,
+            "downloads": int(downloads) if downloads is not None else None,
+            "spread": int(spread) if spread is not None else None,
+            "codec": self.option("codec"),
+        }
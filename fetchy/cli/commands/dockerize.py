@@ -29,6 +29,14 @@ class DockerizeCommand(FetchyCommandBase):
       {--p|ppa=*         : If set, either name(s) or URL(s) pointing to Personal Package Archive(s).}
       {--e|exclude=*     : If set, either name(s) or path(s) of packages to exclude. If a path is given a file is given
               then the extension if this file should be .txt and contain, on each line, a package to exclude.}
+      {--r|refresh       : If set, check the mirrors for updated package indices}
+      {--offline         : If set, never use the network, only cached packages and local mirrors}
+      {--resolver=       : If set, the resolver to use for dependencies, either `simple`, `minimal` or `constraint`}
+      {--j|jobs=         : If set, the number of processes to use for parsing package indices}
+      {--downloads=      : If set, the number of packages to download concurrently}
+      {--m|mirror=*      : If set, url(s) of mirrors of the distribution to consider next to the default mirrors}
+      {--spread=         : If set, the number of fastest mirrors to spread downloads over}
+      {--codec=          : If set, the compression of image tars, either `none`, `gzip` or `zstd`}
     """
 
     def get_or_default(self, name, default):
@@ -49,6 +57,8 @@ class DockerizeCommand(FetchyCommandBase):
                 "fetch": self.argument("packages"),
                 "exclude": options["exclude"],
                 "ppa": options["ppa"],
+                "resolver": self.get_or_default("resolver", "simple"),
+                "mirrors": options["mirror"],
             },
         }
 
@@ -58,7 +68,9 @@ class DockerizeCommand(FetchyCommandBase):
             with open("blueprint.yml", "w") as file:
                 yaml.dump(configuration, file)
 
-        result = self.fetchy.blueprint_from_dict(configuration).dockerize()
+        result = self.fetchy.blueprint_from_dict(
+            configuration, self.blueprint_options()
+        ).dockerize()
 
         self.line(f"Successfully built {result['tag']}")
 
@@ -0,0 +1,239 @@
+import os
+import zlib
+import struct
+import tarfile
+import collections
+import urllib.parse
+
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Tars imported by a Docker daemon on this machine are not compressed, the
+# daemon would only decompress them again. Tars sent over the network to a
+# remote daemon are compressed.
+IMPORT_CODEC = "none"
+EXPORT_CODEC = "gzip"
+
+# The size of the blocks of data compressed independently by the gzip codec
+BLOCK_SIZE = 1024 * 1024
+
+# The size of the deflate window, the end of every block is used as the
+# dictionary of the next block
+DICTIONARY_SIZE = 32 * 1024
+
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+# An empty, final deflate block, ending the stream
+DEFLATE_END = b"\x03\x00"
+
+LOCAL_HOSTS = ("localhost", "localnpipe", "127.0.0.1", "::1")
+
+
+def _deflate(block, dictionary, level):
+    if dictionary:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+class ParallelGzipWriter(object):
+    def __init__(self, file, level, workers, block_size=BLOCK_SIZE):
+        """
+        The ParallelGzipWriter compresses the data written to it into a
+        single gzip stream, as pigz does.
+
+        Data is split into blocks that are deflated by a pool of threads,
+        every block is flushed to a byte boundary and primed with the end
+        of the previous block, so the blocks can simply be concatenated.
+
+        Parameters
+        ----------
+        file : the binary file to write the gzip stream to.
+
+        level : the compression level, from 1 to 9.
+
+        workers : the number of threads compressing blocks.
+
+        block_size : the size of the blocks.
+        """
+        self.file = file
+        self.level = level
+        self.block_size = block_size
+        self.executor = ThreadPoolExecutor(workers)
+        self.max_pending = 2 * workers
+        self.pending = collections.deque()
+        self.buffer = bytearray()
+        self.dictionary = b""
+        self.crc = 0
+        self.size = 0
+
+        self.file.write(GZIP_HEADER)
+
+    def _submit(self, block):
+        self.pending.append(
+            self.executor.submit(_deflate, block, self.dictionary, self.level)
+        )
+        self.dictionary = block[-DICTIONARY_SIZE:]
+        while len(self.pending) > self.max_pending:
+            self.file.write(self.pending.popleft().result())
+
+    def write(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[: self.block_size]))
+            del self.buffer[: self.block_size]
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def close(self):
+        """
+        Compresses the remaining data and ends the gzip stream, the file
+        is not closed.
+        """
+        try:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self.file.write(self.pending.popleft().result())
+            self.file.write(DEFLATE_END)
+            self.file.write(struct.pack("<II", self.crc, self.size & 0xFFFFFFFF))
+        finally:
+            self.executor.shutdown()
+
+
+class Codec(object):
+    name = None
+
+    def open(self, path):
+        """
+        Returns a context manager of a binary file object, the data
+        written to it is compressed into the file at `path`.
+        """
+        raise NotImplementedError()
+
+    @contextmanager
+    def open_tar(self, path):
+        """
+        Returns a context manager of a TarFile writing a tar compressed
+        with this Codec to `path`.
+        """
+        with self.open(path) as fileobj:
+            with tarfile.open(fileobj=fileobj, mode="w") as tar:
+                yield tar
+
+
+class NoCodec(Codec):
+    name = "none"
+
+    def open(self, path):
+        return open(path, "wb")
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+
+    def __init__(self, level=6, workers=None, block_size=BLOCK_SIZE):
+        """
+        The GzipCodec compresses with gzip, using a thread per processor.
+
+        Parameters
+        ----------
+        level : the compression level, from 1 to 9.
+
+        workers : the number of threads compressing, by default the
+            number of processors.
+
+        block_size : the size of the blocks compressed by a thread.
+        """
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+        self.block_size = block_size
+
+    @contextmanager
+    def open(self, path):
+        with open(path, "wb") as file:
+            writer = ParallelGzipWriter(
+                file, self.level, self.workers, self.block_size
+            )
+            try:
+                yield writer
+            finally:
+                writer.close()
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+
+    def __init__(self, level=3, workers=None):
+        """
+        The ZstdCodec compresses with zstd, using a thread per processor.
+        It requires the optional `zstandard` package.
+
+        Parameters
+        ----------
+        level : the compression level, from 1 to 22.
+
+        workers : the number of threads compressing, by default the
+            number of processors.
+        """
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+
+    @contextmanager
+    def open(self, path):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(
+                "The zstd codec requires the zstandard package, "
+                "install it with `pip install fetchy[zstd]`"
+            )
+
+        compressor = zstandard.ZstdCompressor(level=self.level, threads=self.workers)
+        with open(path, "wb") as file:
+            writer = compressor.stream_writer(file)
+            try:
+                yield writer
+            finally:
+                writer.flush(zstandard.FLUSH_FRAME)
+
+
+CODECS = {codec.name: codec for codec in (NoCodec, GzipCodec, ZstdCodec)}
+
+
+def is_local_daemon(client):
+    """
+    Returns whether a Docker client talks to a daemon on this machine.
+    """
+    host = urllib.parse.urlparse(client.api.base_url).hostname
+    return host in LOCAL_HOSTS
+
+
+def get_codec(name=None, local=True):
+    """
+    Returns the Codec with the given name. If no name is given, tars
+    for a local Docker daemon are not compressed while tars for a remote
+    daemon are compressed with gzip.
+
+    Parameters
+    ----------
+    name : the name of the codec, one of `none`, `gzip` or `zstd`.
+
+    local : whether the tar is imported by a Docker daemon on this
+        machine.
+    """
+    if name is None:
+        name = IMPORT_CODEC if local else EXPORT_CODEC
+    if name not in CODECS:
+        raise ValueError(
+            f"Unknown codec {name}, use one of {', '.join(sorted(CODECS))}"
+        )
+    return CODECS[name]()
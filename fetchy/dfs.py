@@ -12,16 +12,20 @@ from elftools.elf.elffile import ELFFile
 from elftools.elf.dynamic import DynamicSection
 
 from tempfile import TemporaryDirectory
+from .codec import get_codec, is_local_daemon
 
 logger = logging.getLogger(__name__)
 
 
 class DockerFileSystem(object):
-    def __init__(self, from_image, image, client: docker.DockerClient):
+    def __init__(self, from_image, image, client: docker.DockerClient, codec=None):
+        if codec is None:
+            codec = get_codec(local=is_local_daemon(client))
         self.from_image = from_image
         self.loaded_layers = {}
         self.image = image
         self.client = client
+        self.codec = codec
 
     def _extract_image_in(self, directory):
         image = self.client.api.get_image(self.from_image)
@@ -131,8 +135,8 @@ class DockerFileSystem(object):
         count = sum([len(layer.getnames()) for layer in self.loaded_layers.values()])
         
         with tqdm(total=count, desc="Slimming down image") as t:
-            with tarfile.open(
-                os.path.join(directory, "image.tar"), "w:gz"
+            with self.codec.open_tar(
+                os.path.join(directory, "image.tar")
             ) as image_tar:
                 for layer in reversed(self.layers[-idx:]):
                     with tarfile.open(
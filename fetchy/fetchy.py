@@ -14,10 +14,16 @@ class Fetchy(object):
     def register_plugin(self, hook, plugin):
         self.plugins[hook] = plugin
 
-    def blueprint_from_yaml(self, file):
-        return self.blueprint_from_dict(self._load_yaml(file))
+    def blueprint_from_yaml(self, file, options=None):
+        return self.blueprint_from_dict(self._load_yaml(file), options)
 
-    def blueprint_from_dict(self, data):
+    def blueprint_from_dict(self, data, options=None):
+        """
+        Create a BluePrint from a dictionary.
+
+        Options are settings for a single run that are not part of
+        the blueprint itself, such as `refresh`.
+        """
         if "tag" not in data:
             raise ValueError("Tag must be supplied in blueprint.")
         if "distribution" not in data:
@@ -44,6 +50,7 @@ class Fetchy(object):
             data["tag"],
             data.get("base", "scratch"),
             active_plugins,
+            options,
         )
 
     def _load_yaml(self, file):
@@ -1,19 +1,100 @@
 import os
 import io
+import queue
 import hashlib
 import tarfile
+import tempfile
 import shutil
 
+from concurrent.futures import ThreadPoolExecutor
+from fetchy.cache import get_cache_manager
+from fetchy.codec import get_codec
 from fetchy.utils import get_cache_dir
 from tarfile import TarInfo, TarFile
 import unix_ar as arfile
 
 from pathlib import Path
+from tempfile import TemporaryDirectory
+
+
+# The number of downloaded packages that may wait to be unpacked
+UNPACK_QUEUE_SIZE = 16
+
+# The name of the member holding the status stanza of a fragment
+FRAGMENT_STATUS = "status"
+
+
+class TarWriter(object):
+    def __init__(self, tar):
+        """
+        The TarWriter appends members to a tar, skipping members with a
+        path that has already been written. The written paths are kept
+        in a set, so checking for duplicates does not depend on the size
+        of the tar.
+
+        The paths of members written on behalf of a package are recorded
+        per package as well, to create the dpkg file list of the package.
+
+        Parameters
+        ----------
+        tar : the TarFile to write to.
+        """
+        self.tar = tar
+        self.names = set(tar.getnames())
+        self.files = {}
+
+    def add(self, member, fileobj=None, package=None):
+        """
+        Writes a member to the tar, unless a member with the same path
+        has been written before. Returns whether the member was written.
+
+        Parameters
+        ----------
+        member : the TarInfo of the member.
+
+        fileobj : the contents of the member, if it is a regular file.
+
+        package : the name of the package the member belongs to, the
+            path of the member is recorded in its file list even if the
+            member itself is skipped.
+        """
+        if package is not None:
+            path = member.name.lstrip(".")
+            if path:
+                self.files.setdefault(package, []).append(path)
+        if member.name in self.names:
+            return False
+        self.names.add(member.name)
+        self.tar.addfile(member, fileobj)
+        return True
 
 
 class DpkgInstaller(object):
-    def __init__(self, downloader):
+    def __init__(self, downloader, workers=None, codec=None):
+        """
+        The DpkgInstaller builds the builder image, a tar of the packages
+        dpkg needs to install packages, unpacked as dpkg would.
+
+        The builder image is built by a pipeline: packages are unpacked
+        by a pool of threads as soon as they are downloaded, and the
+        unpacked packages are appended to the image in the order of their
+        dependencies while the remaining packages are still downloading.
+
+        Parameters
+        ----------
+        downloader : the Downloader used to download the packages.
+
+        workers : the number of threads unpacking packages, by default
+            the number of processors.
+
+        codec : the Codec to compress the builder image with, by default
+            the builder image is not compressed.
+        """
+        if codec is None:
+            codec = get_codec()
         self.downloader = downloader
+        self.workers = workers or os.cpu_count() or 1
+        self.codec = codec
         self.build_essential = [
             "base-passwd",
             "base-files",
@@ -35,13 +116,14 @@ class DpkgInstaller(object):
             "gzip",
         ]
 
-    def _download_files(self):
-        self.files = self.downloader.download_packages(self.build_essential)
+    def _gather_dependencies(self):
+        self.packages = self.downloader.gather_dependencies(self.build_essential, [])
 
     def _create_builder_hash(self):
         sha = hashlib.sha256()
-        for deb_file in self.files:
-            sha.update(deb_file.package.download_url().encode())
+        for package in self.packages.values():
+            sha.update(package.download_url().encode())
+        sha.update(self.codec.name.encode())
         return sha.hexdigest()[:32]
 
     def _builder_cache_file(self):
@@ -49,28 +131,131 @@ class DpkgInstaller(object):
         if not builder_path.exists():
             builder_path.mkdir()
 
-        return Path(builder_path, self._create_builder_hash())
+        return get_cache_manager().pin(Path(builder_path, self._create_builder_hash()))
 
     def _is_cached(self):
         return self._builder_cache_file().exists()
 
+    def _fragment_path(self, package):
+        """
+        Returns the path of the cached fragment of a package, or None if
+        the package has no digest to identify it by.
+        """
+        if package.sha256 is None:
+            return None
+        return get_cache_manager().pin(
+            Path(
+                get_cache_dir(),
+                "fragments",
+                package.sha256[:2],
+                f"{package.sha256}.tar",
+            )
+        )
+
+    def _download_files(self, packages, downloaded, unpacked):
+        """
+        The first stage of the pipeline, puts every package on the
+        `downloaded` queue once it has been downloaded.
+        """
+        try:
+            self.downloader.download_dependencies(packages, callback=downloaded.put)
+        except Exception as e:
+            unpacked.put((None, e))
+        finally:
+            for _ in range(self.workers):
+                downloaded.put(None)
+
+    def _unpack_file(self, deb_file, directory):
+        """
+        Unpacks a package into a fragment and returns its path. Fragments
+        of packages with a digest are cached, the fragments of other
+        packages are written to `directory`.
+        """
+        path = self._fragment_path(deb_file.package)
+        if path is None:
+            path = Path(directory, f"{deb_file.package.name}.tar")
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, suffix=".part", delete=False
+        ) as fragment:
+            try:
+                deb_file.unpack_into_fragment(fragment)
+            except BaseException:
+                os.unlink(fragment.name)
+                raise
+        os.replace(fragment.name, path)
+        return path
+
+    def _unpack_files(self, downloaded, unpacked, directory):
+        """
+        The second stage of the pipeline, unpacks the packages of the
+        `downloaded` queue into fragments and puts them on the `unpacked`
+        queue.
+        """
+        for deb_file in iter(downloaded.get, None):
+            try:
+                path = self._unpack_file(deb_file, directory)
+                unpacked.put((deb_file.package.name, path))
+            except Exception as e:
+                unpacked.put((deb_file.package.name, e))
+
+    def _append_fragment(self, writer, path, status_file):
+        with tarfile.open(path, mode="r|") as fragment_tar:
+            for member in fragment_tar:
+                if member.name == FRAGMENT_STATUS:
+                    status_file.write(fragment_tar.extractfile(member).read())
+                elif member.isreg():
+                    writer.add(member, fragment_tar.extractfile(member))
+                else:
+                    writer.add(member)
+
     def _build_image_tar(self, target_path):
-        with tarfile.open(target_path, "w:gz") as image_tar:
+        downloaded = queue.Queue(UNPACK_QUEUE_SIZE)
+        unpacked = queue.Queue()
+
+        # Packages with a cached fragment are neither downloaded nor
+        # unpacked again
+        fragments = {}
+        missing = {}
+        for (name, package) in self.packages.items():
+            path = self._fragment_path(package)
+            if path is not None and path.exists():
+                fragments[name] = path
+            else:
+                missing[name] = package
+
+        with TemporaryDirectory() as temp_dir, ThreadPoolExecutor(
+            self.workers + 1
+        ) as executor, self.codec.open_tar(target_path) as image_tar:
+            writer = TarWriter(image_tar)
+            executor.submit(self._download_files, missing, downloaded, unpacked)
+            for _ in range(self.workers):
+                executor.submit(self._unpack_files, downloaded, unpacked, temp_dir)
+
             for directory in [
                 ["./", "var", "lib", "dpkg", "info"],
                 ["./", "var", "log"],
             ]:
                 info = TarInfo("./" + Path(*directory).as_posix())
                 info.type = tarfile.DIRTYPE
-                image_tar.addfile(info)
+                writer.add(info)
 
             for file in [["var", "log", "dpkg.log"]]:
-                image_tar.addfile(TarInfo("./" + Path(*file).as_posix()))
+                writer.add(TarInfo("./" + Path(*file).as_posix()))
 
             status_file = io.BytesIO()
 
-            for deb_file in self.files:
-                deb_file.unpack_into_tar(image_tar, status_file)
+            # Packages are unpacked in the order they are downloaded, but
+            # appended in the order of their dependencies
+            for name in self.packages:
+                while name not in fragments:
+                    (unpacked_name, result) = unpacked.get()
+                    if isinstance(result, Exception):
+                        raise result
+                    fragments[unpacked_name] = result
+
+                self._append_fragment(writer, fragments.pop(name), status_file)
 
             status_info = TarInfo(
                 "./" + Path("var", "lib", "dpkg", "status").as_posix()
@@ -78,7 +263,7 @@ class DpkgInstaller(object):
             status_info.size = status_file.getbuffer().nbytes
             status_file.seek(0)
 
-            image_tar.addfile(status_info, status_file)
+            writer.add(status_info, status_file)
 
             status_file.close()
 
@@ -86,7 +271,7 @@ class DpkgInstaller(object):
         shutil.copyfile(target_path, self._builder_cache_file())
 
     def create_image_tar(self, target_path):
-        self._download_files()
+        self._gather_dependencies()
         if self._is_cached():
             shutil.copyfile(self._builder_cache_file(), target_path)
         else:
@@ -131,54 +316,71 @@ class DebianFile(object):
             )
         status_file.write(str.encode("\n".join(data) + "\n\n"))
 
-    def _unpack_info_file(self, tar: TarFile, member: TarInfo, fileobj: io.BytesIO):
+    def _unpack_info_file(
+        self, writer: TarWriter, member: TarInfo, fileobj: io.BytesIO
+    ):
         directory = Path("var", "lib", "dpkg", "info").as_posix()
         name = member.name.lstrip("./")
 
         member.name = f"./{directory}/{self.package.name}.{name}"
 
-        tar.addfile(member, fileobj)
+        writer.add(member, fileobj)
 
-    def _unpack_control_data(self, tar: TarFile, control_archive: TarFile):
+    def _unpack_control_data(self, writer: TarWriter, control_archive: TarFile):
         for member in (member for member in control_archive if member.isfile()):
             with control_archive.extractfile(member) as fileobj:
-                self._unpack_info_file(tar, member, fileobj)
-
-    def _unpack_data(self, tar: TarFile, data_archive: TarFile):
-        with io.BytesIO(
-            str.encode(
-                "\n".join(
-                    [
-                        member.name.lstrip(".")
-                        for member in data_archive
-                        if member.name.lstrip(".")
-                    ]
-                )
-                + "\n"
-            )
-        ) as fileobj:
-            info = TarInfo("list")
-            info.size = fileobj.getbuffer().nbytes
-            self._unpack_info_file(tar, info, fileobj)
-
-        names = tar.getnames()
+                self._unpack_info_file(writer, member, fileobj)
 
-        for member in (member for member in data_archive if member.name not in names):
-            if member.islnk() or member.issym() or member.isdir():
-                tar.addfile(member)
-            else:
+    def _unpack_data(self, writer: TarWriter, data_archive: TarFile):
+        for member in data_archive:
+            if member.isreg():
                 with data_archive.extractfile(member) as fileobj:
-                    tar.addfile(member, fileobj)
+                    writer.add(member, fileobj, self.package.name)
+            else:
+                writer.add(member, package=self.package.name)
 
-    def unpack_into_tar(self, tar, status_file):
+        files = writer.files.pop(self.package.name, [])
+        with io.BytesIO(str.encode("\n".join(files) + "\n")) as fileobj:
+            info = TarInfo("list")
+            info.size = fileobj.getbuffer().nbytes
+            self._unpack_info_file(writer, info, fileobj)
+
+    def unpack_into_tar(self, writer, status_file):
+        """
+        Unpacks this package into the tar of a TarWriter, in a single
+        pass over the archives of the package, and appends its status
+        stanza to `status_file`.
+        """
         debian_file_archive = arfile.open(self.deb_file)
         for info in debian_file_archive.infolist():
             with debian_file_archive.open(info.name.decode()) as content_archive:
                 if info.name.decode().startswith("control"):
-                    with tarfile.open(fileobj=content_archive) as control_archive:
-                        self._unpack_control_data(tar, control_archive)
+                    with tarfile.open(
+                        fileobj=content_archive, mode="r|*"
+                    ) as control_archive:
+                        self._unpack_control_data(writer, control_archive)
                 if info.name.decode().startswith("data"):
-                    with tarfile.open(fileobj=content_archive) as data_archive:
-                        self._unpack_data(tar, data_archive)
+                    with tarfile.open(
+                        fileobj=content_archive, mode="r|*"
+                    ) as data_archive:
+                        self._unpack_data(writer, data_archive)
         self._append_to_status(status_file)
         debian_file_archive.close()
+
+    def unpack_into_fragment(self, fragment):
+        """
+        Unpacks this package into a fragment, an uncompressed tar of its
+        files and dpkg info files, followed by its status stanza as the
+        member FRAGMENT_STATUS.
+
+        Parameters
+        ----------
+        fragment : the file object to write the fragment to.
+        """
+        with tarfile.open(fileobj=fragment, mode="w") as fragment_tar:
+            with io.BytesIO() as status_file:
+                self.unpack_into_tar(TarWriter(fragment_tar), status_file)
+                info = TarInfo(FRAGMENT_STATUS)
+                info.size = status_file.tell()
+                status_file.seek(0)
+                fragment_tar.addfile(info, status_file)
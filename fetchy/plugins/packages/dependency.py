@@ -1,6 +1,11 @@
+import sys
+
+from functools import lru_cache
+
 from .version import version_from_string
 
 
+@lru_cache(maxsize=8192)
 def relationship_from_string(string):
     """Function for parsing a single relationship
 
@@ -9,6 +14,9 @@ def relationship_from_string(string):
 
     Relationships are specified as following:
     (<relationship> <version>)
+
+    Relationships are immutable, so equal relationships parsed
+    from different packages share a single object.
     """
     relationship, version = string.lstrip("( ").rstrip(" )").split(" ")
     return DependencyRelationship(relationship, version_from_string(version))
@@ -72,6 +80,8 @@ def dependencies_from_string(kind, string):
 
 
 class DependencyRelationship(object):
+    __slots__ = ("relationship", "version")
+
     def __init__(self, relationship, version):
         """A Relationship Object
 
@@ -85,14 +95,44 @@ class DependencyRelationship(object):
         - `>=`, later or equal
         - `>>`, strictly later
         """
-        self.relationship = relationship
+        self.relationship = sys.intern(relationship)
         self.version = version
 
+    def satisfied_by(self, version):
+        """
+        Returns whether the given Version object satisfies
+        this relationship.
+        """
+        key = version.key
+        other = self.version.key
+        if self.relationship == "<<":
+            return key < other
+        if self.relationship in ("<=", "<"):
+            return key <= other
+        if self.relationship == "=":
+            return key == other
+        if self.relationship in (">=", ">"):
+            return key >= other
+        if self.relationship == ">>":
+            return key > other
+        raise ValueError(f"Unknown version relationship {self.relationship}")
+
     def __str__(self):
         return f"({self.relationship} {self.version})"
 
 
+def architecture_matches(pattern, architecture):
+    """Function for matching an architecture against a pattern
+
+    Patterns are either an architecture, `any` or a wildcard
+    such as `linux-any` or `any-amd64`.
+    """
+    return pattern in (architecture, "any", "linux-any", f"any-{architecture}")
+
+
 class Dependency(object):
+    __slots__ = ("kind",)
+
     def __init__(self, kind):
         """A Dependency Object
 
@@ -108,7 +148,7 @@ class Dependency(object):
         possible is when a dependency is constructed
         through the or (`|`) operator.
         """
-        self.kind = kind
+        self.kind = sys.intern(kind)
 
     def resolve(self):
         """Resolve Dependency
@@ -121,8 +161,19 @@ class Dependency(object):
             "The base dependency class does not resolve to anything!"
         )
 
+    def alternatives(self):
+        """
+        Returns the SimpleDependency objects that can each be
+        used to satisfy this dependency, in order of preference.
+        """
+        raise NotImplementedError(
+            "The base dependency class does not have any alternatives!"
+        )
+
 
 class SimpleDependency(Dependency):
+    __slots__ = ("name", "relationship", "condition")
+
     def __init__(self, kind, name, relationship, condition):
         """
         A Simple Depency Object is a combination of a name and optionally
@@ -151,13 +202,41 @@ class SimpleDependency(Dependency):
             must or must not be used.
         """
         super().__init__(kind)
-        self.name = name
+        self.name = sys.intern(name)
         self.relationship = relationship
         self.condition = condition
 
     def resolve(self):
         return [self.name]
 
+    def alternatives(self):
+        return [self]
+
+    def applies_to(self, architecture):
+        """
+        Returns whether this dependency applies to the given architecture,
+        according to its architecture qualifiers (e.g. `[amd64 i386]`
+        or `[!armel]`). Dependencies without qualifiers always apply.
+        """
+        if not self.condition or architecture is None:
+            return True
+        patterns = self.condition.split()
+        if all(pattern.startswith("!") for pattern in patterns):
+            return not any(
+                architecture_matches(pattern[1:], architecture) for pattern in patterns
+            )
+        return any(architecture_matches(pattern, architecture) for pattern in patterns)
+
+    def satisfied_by(self, package):
+        """
+        Returns whether the given package satisfies this dependency
+        through its name and version.
+        """
+        return package.name == self.name and (
+            self.relationship is None
+            or self.relationship.satisfied_by(package.version)
+        )
+
     def __str__(self):
         if self.relationship:
             return f"{self.name} {self.relationship}"
@@ -165,6 +244,8 @@ class SimpleDependency(Dependency):
 
 
 class EitherDependency(Dependency):
+    __slots__ = ("dependencies",)
+
     def __init__(self, kind, dependencies):
         """
         An EitherDependency contains a sequence of multiple dependencies.
@@ -185,5 +266,8 @@ class EitherDependency(Dependency):
     def resolve(self):
         return [dependency.name for dependency in self.dependencies]
 
+    def alternatives(self):
+        return self.dependencies
+
     def __str__(self):
         return " | ".join(map(str, self.dependencies))
@@ -1,20 +1,27 @@
 import os
-import shutil
 import logging
-import urllib.request
-import hashlib
 
-from pathlib import Path
-from collections import OrderedDict
-from tqdm import tqdm
 from .debian import DebianFile
-from fetchy.utils import get_cache_dir
+from .resolver import Resolver
+from .mirror import is_local_url
+from .store import PackageStore
+from .transfer import Download, OfflineError, download_files
 
 logger = logging.getLogger(__name__)
 
 
 class Downloader(object):
-    def __init__(self, packages, out_dir="./out"):
+    def __init__(
+        self,
+        packages,
+        out_dir="./out",
+        resolver=None,
+        concurrency=None,
+        pool=None,
+        store=None,
+        selector=None,
+        offline=False,
+    ):
         """
         The Downloader class is responsible for downloading packages and it's dependencies.
 
@@ -25,9 +32,38 @@ class Downloader(object):
 
         out_dir : the output directory this Downloader will download packages
             into.
+
+        resolver : the Resolver used to gather the dependencies of packages,
+            by default a Resolver over `packages`.
+
+        concurrency : the maximum number of packages to download at once.
+
+        pool : the ConnectionPool to download packages with, so kept-alive
+            connections can be shared between Downloaders.
+
+        store : the PackageStore caching downloaded packages, by default
+            the store in the cache directory.
+
+        selector : a MirrorSelector, if given packages are downloaded from
+            the ranked mirrors of their archive, failing over to the next
+            mirror if one fails.
+
+        offline : if True, packages are only downloaded from `file://`
+            mirrors, an OfflineError is raised before anything is
+            downloaded if other packages are not in the store.
         """
+        if resolver is None:
+            resolver = Resolver(packages)
+        if store is None:
+            store = PackageStore()
         self.packages = packages
         self.out_dir = out_dir
+        self.resolver = resolver
+        self.concurrency = concurrency
+        self.pool = pool
+        self.store = store
+        self.selector = selector
+        self.offline = offline
 
     def download_packages(
         self, package_names, dependencies_to_exclude=[], version=None
@@ -38,9 +74,16 @@ class Downloader(object):
         Before downloading any package, the dependencies of the given
         package are first gathered into a list of dependencies.
 
-        Then, once all dependencies are determined, each dependency
-        is downloaded into the folder this Downloader has been configured
-        to use as an output directory.
+        Then, once all dependencies are determined, the dependencies
+        are downloaded concurrently into the folder this Downloader has
+        been configured to use as an output directory.
+
+        Downloaded packages are verified against the SHA256 digest of
+        the package index and kept in a content-addressed store, from
+        which they are hardlinked (or reflinked, or copied) into the
+        output directory. Packages without a digest are not cached.
+        Interrupted downloads of packages with a digest are resumed
+        the next time they are downloaded.
 
         Parameters
         ----------
@@ -54,125 +97,124 @@ class Downloader(object):
         downloaded_files : a list of package files that have been
             downloaded
         """
+        logger.info(f"Gathering dependencies for {package_names}")
+
+        return self.download_dependencies(
+            self.gather_dependencies(package_names, dependencies_to_exclude)
+        )
+
+    def download_dependencies(self, dependencies, callback=None):
+        """
+        Downloads packages whose dependencies have already been gathered.
+
+        Parameters
+        ----------
+        dependencies : an ordered dictionary of packages keyed by name, as
+            returned by `gather_dependencies`.
+
+        callback : a function called with the DebianFile of every package
+            as soon as its file is in place, packages that are in the
+            store are passed before anything is downloaded. It is called
+            from the thread calling this method.
+
+        Returns
+        -------
+        downloaded_files : a list of package files that have been
+            downloaded, in the order of `dependencies`.
+        """
         if not os.path.isdir(self.out_dir):
             logger.info(f"Creating output directory {self.out_dir}")
             os.mkdir(self.out_dir)
 
-        logger.info(f"Gathering dependencies for {package_names}")
-
         downloaded_packages = []
-
-        for (name, package) in self.gather_dependencies(
-            package_names, dependencies_to_exclude
-        ).items():
+        downloads = []
+        # The files waiting for a download, keyed by the download
+        waiting = {}
+        pending = {}
+        stored = []
+        unavailable = []
+
+        for (name, package) in dependencies.items():
             package_file = os.path.join(
                 self.out_dir, os.path.basename(package.file_name())
             )
-            package_url = package.download_url()
-
-            logger.info(f"Downloading package {name} at {package_url}")
-
-            with tqdm(
-                unit="B",
-                unit_scale=True,
-                unit_divisor=1024,
-                miniters=1,
-                desc=f"Downloading {name}",
-            ) as t:
-
-                def hook(b=1, bsize=1, tsize=None):
-                    if tsize is not None:
-                        t.total = tsize
-                    t.update(b * bsize - t.n)
-
-                if self._has_cache_entry(package_url):
-                    with self._retreive_from_cache(package_url) as pkg_file:
-                        with open(package_file, "wb") as dst_file:
-                            shutil.copyfileobj(pkg_file, dst_file)
-                else:
-                    urllib.request.urlretrieve(package_url, package_file, hook)
-                    self._store_in_cache(package_url, package_file)
-
-                downloaded_packages.append(DebianFile(package, package_file))
-
-        return downloaded_packages
-
-    def _get_cache_path(self, package_url):
-        package_cache_dir = Path(get_cache_dir(), "packages")
-        if not package_cache_dir.exists():
-            package_cache_dir.mkdir()
-
-        sha = hashlib.sha256()
-        sha.update(package_url.encode())
-        return Path(get_cache_dir(), "packages", f"{sha.hexdigest()[:32]}.deb")
-
-    def _store_in_cache(self, package_url, source):
-        shutil.copyfile(source, self._get_cache_path(package_url))
-
-    def _retreive_from_cache(self, package_url):
-        if self._has_cache_entry(package_url):
-            return open(self._get_cache_path(package_url), "rb")
-
-    def _has_cache_entry(self, package_url):
-        return self._get_cache_path(package_url).exists()
-
-    def gather_dependencies(self, names, excludes):
-        visited = []
-        items = {}
-
-        for name in names:
-            self.gather_dependency_tree(name, items, visited, excludes)
-        return items
-
-    def gather_dependency_tree(self, name, to_install, visited, excludes):
-        if name in visited:
-            return
-
-        visited.append(name)
-
-        if name in excludes:
-            return
-
-        if not name:
-            return
-
-        if name not in self.packages:
-            return
-
-        package = self.packages[name]
-
-        for pre_dependency in package.pre_dependencies:
-            self.gather_dependency_tree(
-                self.find_best_candidate(pre_dependency.resolve()),
-                to_install,
-                visited,
-                excludes,
+            debian_file = DebianFile(package, package_file)
+            downloaded_packages.append(debian_file)
+            sha256 = package.sha256
+            if sha256 is not None:
+                if sha256 in self.store:
+                    stored.append(debian_file)
+                    continue
+                if sha256 in pending:
+                    waiting[pending[sha256]].append(debian_file)
+                    continue
+
+            urls = self._urls(package.download_url(), len(downloads))
+            if not urls:
+                unavailable.append(name)
+                continue
+
+            (url, *mirrors) = urls
+            logger.info(f"Downloading package {name} at {url}")
+            if sha256 is None:
+                download = Download(
+                    url, package_file, size=package.size, mirrors=mirrors
+                )
+            else:
+                target = self.store.path(sha256)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                download = Download(
+                    url,
+                    target,
+                    sha256,
+                    package.size,
+                    self.store.partial_path(sha256),
+                    mirrors,
+                )
+                pending[sha256] = download
+            downloads.append(download)
+            waiting[download] = [debian_file]
+
+        if unavailable:
+            raise OfflineError(
+                f"Unable to download {', '.join(unavailable)} while offline, "
+                "import the packages with `fetchy cache import`"
             )
 
-        for dependency in package.dependencies:
-            self.gather_dependency_tree(
-                self.find_best_candidate(dependency.resolve()),
-                to_install,
-                visited,
-                excludes,
-            )
+        def place(debian_files):
+            for debian_file in debian_files:
+                if debian_file.package.sha256 is not None:
+                    self.store.materialize(
+                        debian_file.package.sha256, debian_file.deb_file
+                    )
+                if callback is not None:
+                    callback(debian_file)
+
+        def downloaded(download):
+            if download.sha256 is not None:
+                self.store.add(download.path, download.sha256)
+            place(waiting[download])
+
+        place(stored)
+        download_files(
+            downloads,
+            self.concurrency,
+            self.pool,
+            desc=f"Downloading {len(downloads)} packages",
+            callback=downloaded,
+        )
 
-        to_install[name] = package
+        return downloaded_packages
 
-    def find_best_candidate(self, names):
+    def _urls(self, url, index):
         """
-        Find the best dependency to install based on a selection of names.
-
-        Here we optimize for package size.
+        Returns the urls to download a package from, only `file://`
+        urls are returned when offline.
         """
-        to_consider = []
-        for name in names:
-            if name in self.packages:
-                to_consider.append(name)
-
-        if not to_consider:
-            return None
+        urls = [url] if self.selector is None else self.selector.urls(url, index)
+        if self.offline:
+            urls = [url for url in urls if is_local_url(url)]
+        return urls
 
-        return sorted(
-            to_consider, key=lambda package: self.packages[package].installed_size
-        )[0]
+    def gather_dependencies(self, names, excludes):
+        return self.resolver.gather_dependencies(names, excludes)
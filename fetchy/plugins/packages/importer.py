@@ -0,0 +1,197 @@
+import io
+import os
+import json
+import tarfile
+import hashlib
+import logging
+import unix_ar as arfile
+
+from pathlib import Path
+from fetchy.cache import get_cache_manager
+from fetchy.utils import get_cache_dir
+
+from .index import PackageIndex, write_index
+from .parser import DEFAULT_FIELDS, iter_stanzas
+from .repository import Repository
+from .store import PackageStore
+
+logger = logging.getLogger(__name__)
+
+# The directory apt keeps the packages it downloaded in
+APT_ARCHIVES = "/var/cache/apt/archives"
+
+
+def read_control(path):
+    """Function for reading the control file of a debian package
+
+    Returns the fields of the control file as a dictionary.
+    """
+    package_file = arfile.open(str(path))
+    try:
+        for info in package_file.infolist():
+            if not info.name.decode().startswith("control.tar"):
+                continue
+            with package_file.open(info.name.decode()) as content:
+                with tarfile.open(fileobj=content) as control_archive:
+                    for member in control_archive:
+                        if member.name.lstrip("./") == "control":
+                            data = control_archive.extractfile(member).read()
+                            return next(iter_stanzas(io.BytesIO(data)))
+    finally:
+        package_file.close()
+    raise ValueError(f"{path} has no control file")
+
+
+def _sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as package_file:
+        for chunk in iter(lambda: package_file.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class PackageImporter(object):
+    def __init__(self, store=None, directory=None):
+        """
+        The PackageImporter ingests debian package files from disk, for
+        example from `/var/cache/apt/archives` or a local repository,
+        into the PackageStore.
+
+        Imported packages are described by the fields of their control
+        file in an index per architecture, pointing into the store, so
+        they can be installed without any mirror at all.
+
+        Parameters
+        ----------
+        store : the PackageStore to import packages into, by default
+            the store in the cache directory.
+
+        directory : the directory to keep the indices of imported
+            packages in, by default the `imported` directory in the
+            cache directory.
+        """
+        if store is None:
+            store = PackageStore()
+        if directory is None:
+            directory = Path(get_cache_dir(), "imported")
+        self.store = store
+        self.directory = Path(directory)
+
+    def _origin(self):
+        return Path(self.store.directory).resolve().as_uri() + "/"
+
+    def _packages_path(self):
+        return Path(self.directory, "packages.json")
+
+    def _load(self):
+        path = get_cache_manager().pin(self._packages_path())
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text())
+
+    def import_file(self, path):
+        """
+        Imports a single package file, returns the stanza describing it.
+        """
+        control = read_control(path)
+        sha256 = _sha256(path)
+        if sha256 not in self.store:
+            self.store.copy(path, sha256)
+
+        stanza = {
+            field: control[field]
+            for field in DEFAULT_FIELDS
+            if field in control and field not in ("SHA256", "Size")
+        }
+        stanza["Filename"] = self.store.path(sha256).relative_to(
+            self.store.directory
+        ).as_posix()
+        stanza["SHA256"] = sha256
+        stanza["Size"] = str(os.path.getsize(path))
+        return stanza
+
+    def import_paths(self, paths):
+        """
+        Imports the package files at the given paths, directories are
+        searched for `.deb` files. Returns the number of packages that
+        were imported.
+        """
+        files = []
+        for path in map(Path, paths):
+            if path.is_dir():
+                files += sorted(path.rglob("*.deb"))
+            else:
+                files.append(path)
+
+        packages = self._load()
+        imported = 0
+        for path in files:
+            try:
+                stanza = self.import_file(path)
+            except (OSError, ValueError, tarfile.TarError) as e:
+                logger.warning(f"Unable to import {path}: {e}")
+                continue
+            packages[stanza["SHA256"]] = stanza
+            imported += 1
+
+        self._store(packages)
+        return imported
+
+    def _store(self, packages):
+        """
+        Writes the imported packages and an index per architecture, that
+        also holds the packages for all architectures.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._packages_path()
+        path.with_suffix(".tmp").write_text(json.dumps(packages))
+        os.replace(path.with_suffix(".tmp"), path)
+
+        stanzas = list(packages.values())
+        architectures = {stanza.get("Architecture", "all") for stanza in stanzas}
+        architectures.add("all")
+        for path in self.directory.glob("*.idx"):
+            if path.stem not in architectures:
+                path.unlink()
+        for architecture in architectures:
+            write_index(
+                self._index_path(architecture),
+                [
+                    stanza
+                    for stanza in stanzas
+                    if stanza.get("Architecture", "all") in (architecture, "all")
+                ],
+                self._origin(),
+            )
+
+    def _index_path(self, architecture):
+        return Path(self.directory, f"{architecture}.idx")
+
+    def _forget_evicted(self):
+        """
+        Drops the imported packages whose file has been evicted from the
+        store, so they are never resolved while their file is gone.
+        """
+        packages = self._load()
+        kept = {
+            sha256: stanza
+            for (sha256, stanza) in packages.items()
+            if sha256 in self.store
+        }
+        if len(kept) < len(packages):
+            logger.warning(
+                f"{len(packages) - len(kept)} imported packages have been evicted "
+                "from the cache, import them again to build offline with them"
+            )
+            self._store(kept)
+
+    def repository(self, architecture):
+        """
+        Returns a Repository of the imported packages for an architecture,
+        or None if no packages have been imported.
+        """
+        self._forget_evicted()
+        for path in (self._index_path(architecture), self._index_path("all")):
+            if get_cache_manager().pin(path).exists():
+                return Repository(indices=[PackageIndex(path)])
+        return None
@@ -0,0 +1,210 @@
+import os
+import mmap
+import struct
+import hashlib
+
+from .package import package_from_dict, provided_names
+
+
+MAGIC = b"FETCHY04"
+
+# magic, number of names, number of provided names, length of the origin
+HEADER = struct.Struct("<8sIII")
+
+# name offset, name length, record offset, record length
+ENTRY = struct.Struct("<IIII")
+
+# Separators used inside a record, neither may occur in a control field.
+STANZA_SEPARATOR = b"\x1e"
+FIELD_SEPARATOR = b"\x1f"
+
+
+def _encode_stanza(stanza):
+    return FIELD_SEPARATOR.join(
+        part.encode("utf-8") for item in stanza.items() for part in item
+    )
+
+
+def _decode_stanza(data):
+    parts = data.decode("utf-8").split(FIELD_SEPARATOR.decode())
+    return dict(zip(parts[0::2], parts[1::2]))
+
+
+def _write_table(records, offset):
+    """
+    Build a table of entries sorted by name, and the blob the entries
+    point into, for a dictionary of records keyed by name.
+    """
+    table = []
+    blob = []
+    for name in sorted(records):
+        record = records[name]
+        table.append(ENTRY.pack(offset, len(name), offset + len(name), len(record)))
+        blob += [name, record]
+        offset += len(name) + len(record)
+    return (table, blob, offset)
+
+
+def write_index(path, stanzas, origin):
+    """Function for writing a package index file
+
+    The index file consists of a header, a table of fixed size
+    entries sorted by package name and a blob holding the names
+    and the records. A record holds every stanza for a single
+    package name.
+
+    A second table maps every name that is provided by a package
+    (through its `Provides` field) to the names of its providers,
+    so virtual packages can be resolved without decoding packages.
+
+    The file is written next to the destination and then moved
+    in place, so readers never observe a partially written index.
+
+    Parameters
+    ----------
+    path : the path of the index file to write.
+
+    stanzas : an iterable of stanzas (dictionaries of fields) as
+        produced by the parser.
+
+    origin : the url of the mirror the stanzas originate from.
+    """
+    records = {}
+    providers = {}
+    for stanza in stanzas:
+        name = stanza["Package"].encode("utf-8")
+        records.setdefault(name, []).append(_encode_stanza(stanza))
+        for provided in provided_names(stanza.get("Provides", "")):
+            names = providers.setdefault(provided.encode("utf-8"), [])
+            if name not in names:
+                names.append(name)
+
+    records = {
+        name: STANZA_SEPARATOR.join(record) for (name, record) in records.items()
+    }
+    providers = {
+        name: FIELD_SEPARATOR.join(names) for (name, names) in providers.items()
+    }
+    origin = origin.encode("utf-8")
+
+    offset = HEADER.size + len(origin)
+    offset += ENTRY.size * (len(records) + len(providers))
+    (table, blob, offset) = _write_table(records, offset)
+    (providers_table, providers_blob, _) = _write_table(providers, offset)
+
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as index_file:
+        index_file.write(
+            HEADER.pack(MAGIC, len(records), len(providers), len(origin))
+        )
+        index_file.write(origin)
+        index_file.writelines(table)
+        index_file.writelines(providers_table)
+        index_file.writelines(blob)
+        index_file.writelines(providers_blob)
+    os.replace(temporary_path, path)
+
+
+class PackageIndex(object):
+    def __init__(self, path):
+        """
+        A PackageIndex is a read-only view on an index file
+        written by `write_index`.
+
+        The file is memory mapped, names are looked up through
+        a binary search on the sorted table and packages are only
+        decoded when they are requested.
+
+        Parameters
+        ----------
+        path : the path of the index file.
+        """
+        with open(path, "rb") as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = HEADER.unpack_from(self._map, 0)
+        (magic, self._count, self._providers_count, origin_length) = header
+        if magic != MAGIC:
+            raise RuntimeError(f"{path} is not a package index file!")
+
+        self.origin = self._map[HEADER.size : HEADER.size + origin_length].decode()
+        self._table = HEADER.size + origin_length
+        self._providers_table = self._table + self._count * ENTRY.size
+        self._digest = None
+
+    def _entry(self, table, idx):
+        return ENTRY.unpack_from(self._map, table + idx * ENTRY.size)
+
+    def _name(self, table, idx):
+        (name_offset, name_length, _, _) = self._entry(table, idx)
+        return self._map[name_offset : name_offset + name_length]
+
+    def _find(self, table, count, name):
+        name = name.encode("utf-8")
+        (low, high) = (0, count)
+        while low < high:
+            middle = (low + high) // 2
+            if self._name(table, middle) < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < count and self._name(table, low) == name:
+            return low
+        return -1
+
+    def _record(self, table, count, name):
+        idx = self._find(table, count, name)
+        if idx == -1:
+            return None
+
+        (_, _, record_offset, record_length) = self._entry(table, idx)
+        return self._map[record_offset : record_offset + record_length]
+
+    def stanzas(self, name):
+        """
+        Returns the stanzas stored for the given package name,
+        an empty list if this index does not contain the name.
+        """
+        record = self._record(self._table, self._count, name)
+        if record is None:
+            return []
+        return [_decode_stanza(data) for data in record.split(STANZA_SEPARATOR)]
+
+    def providers(self, name):
+        """
+        Returns the names of the packages that provide the given name.
+        """
+        record = self._record(self._providers_table, self._providers_count, name)
+        if record is None:
+            return []
+        return record.decode("utf-8").split(FIELD_SEPARATOR.decode())
+
+    def packages(self, name):
+        """
+        Returns the packages stored for the given package name.
+        """
+        return [package_from_dict(stanza, self.origin) for stanza in self.stanzas(name)]
+
+    def names(self):
+        """
+        Yields every package name in this index in sorted order.
+        """
+        for idx in range(self._count):
+            yield self._name(self._table, idx).decode("utf-8")
+
+    def digest(self):
+        """
+        Returns the sha256 digest of the contents of this index.
+        """
+        if self._digest is None:
+            self._digest = hashlib.sha256(self._map).hexdigest()
+        return self._digest
+
+    def close(self):
+        self._map.close()
+
+    def __contains__(self, name):
+        return self._find(self._table, self._count, name) != -1
+
+    def __len__(self):
+        return self._count
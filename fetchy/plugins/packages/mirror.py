@@ -1,9 +1,47 @@
+import os
 import locale
 import validators
+import urllib.error
+import urllib.parse
+
+from pathlib import Path
+from collections import OrderedDict
+
+
+def mirror_url(url_or_path):
+    """Function for normalizing the url of a mirror
+
+    Mirrors may be given as a url or as a local directory, directories
+    are turned into `file://` urls. The url always ends with a slash.
+    """
+    url = url_or_path
+    if "://" not in url and os.path.isdir(url):
+        url = Path(url).resolve().as_uri()
+    return url if url.endswith("/") else url + "/"
+
+
+def is_local_url(url):
+    """
+    Returns whether a url refers to a file on this machine.
+    """
+    return urllib.parse.urlsplit(url).scheme == "file"
+
+
+def is_missing_file(error):
+    """
+    Returns whether a request failed with `error` because the mirror does
+    not serve the file, either with a 404 or because the file is missing
+    from a `file://` mirror.
+    """
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code == 404
+    return isinstance(error, urllib.error.URLError) and isinstance(
+        error.reason, FileNotFoundError
+    )
 
 
 class Mirror(object):
-    def __init__(self, locale):
+    def __init__(self, locale, mirrors=None):
         """
         A Mirror is an abstraction over a simple URL. A Mirror object
         should handle some other logic involved, such as finding an
@@ -13,8 +51,13 @@ class Mirror(object):
         ----------
         locale : a locale to use for finding an appropriate mirror, for example:
             the locale `nl` is used for the Netherlands.
+
+        mirrors : a list of urls of mirrors of the same archive configured
+            by the user, these are candidates next to the mirrors of the
+            locale and the global mirrors.
         """
         self._locale = locale
+        self._mirrors = [mirror_url(url) for url in mirrors or []]
 
     @property
     def locale(self):
@@ -49,6 +92,22 @@ class Mirror(object):
         """
         raise NotImplementedError()
 
+    def global_urls(self):
+        """
+        The base urls of the global mirrors of this archive.
+        """
+        return [self.url()]
+
+    def candidates(self):
+        """
+        The base urls of all mirrors that serve this archive, the mirrors
+        configured by the user first, then the mirror of the locale and
+        the global mirrors. The url of this mirror is always included,
+        packages and indices are cached by it.
+        """
+        candidates = self._mirrors + [self.url_with_locale()] + self.global_urls()
+        return list(OrderedDict.fromkeys(url for url in candidates if url))
+
 
 class DirectMirror(Mirror):
     def __init__(self, url):
@@ -57,17 +116,16 @@ class DirectMirror(Mirror):
         supported for this particular mirror as we have no knowledge of
         this structure of the URL.
 
-        This does however, allow the user to use any mirror they want.
+        This does however, allow the user to use any mirror they want,
+        including `file://` urls and local directories.
 
         Parameters
         ----------
-        url : a url directly pointing to a mirror for a package manager
+        url : a url directly pointing to a mirror for a package manager,
+            or the path of a directory holding a mirror
         """
         super(DirectMirror, self).__init__(None)
-        self._url = url
-
-        if not _url.endswith("/"):
-            _url = url + "/"
+        self._url = mirror_url(url)
 
     def url(self):
         return self._url
@@ -77,7 +135,7 @@ class DirectMirror(Mirror):
 
 
 class UbuntuMirror(Mirror):
-    def __init__(self, locale=None):
+    def __init__(self, locale=None, mirrors=None):
         """
         A UbuntuMirror is, as the class name may suggest, a mirror for ubuntu packages.
 
@@ -88,8 +146,10 @@ class UbuntuMirror(Mirror):
         ----------
         locale : a locale to use for finding an appropriate mirror, for example:
             the locale `nl` is used for the Netherlands.
+
+        mirrors : a list of urls of other mirrors of the ubuntu archive.
         """
-        super(UbuntuMirror, self).__init__(locale)
+        super(UbuntuMirror, self).__init__(locale, mirrors)
 
     def url(self):
         return "http://archive.ubuntu.com/ubuntu/"
@@ -101,7 +161,7 @@ class UbuntuMirror(Mirror):
 
 
 class DebianMirror(Mirror):
-    def __init__(self, locale=None):
+    def __init__(self, locale=None, mirrors=None):
         """
         A DebianMirror is, as the class name may suggest, a mirror for debian packages.
 
@@ -112,8 +172,10 @@ class DebianMirror(Mirror):
         ----------
         locale : a locale to use for finding an appropriate mirror, for example:
             the locale `nl` is used for the Netherlands.
+
+        mirrors : a list of urls of other mirrors of the debian archive.
         """
-        super(DebianMirror, self).__init__(locale)
+        super(DebianMirror, self).__init__(locale, mirrors)
 
     def url(self):
         return "http://ftp.debian.org/debian/"
@@ -123,6 +185,9 @@ class DebianMirror(Mirror):
             return f"http://ftp.{self.locale}.debian.org/debian/"
         return None
 
+    def global_urls(self):
+        return ["http://deb.debian.org/debian/", self.url()]
+
 
 class PersonalPackageArchiveMirror(Mirror):
     def __init__(self, url_or_name):
@@ -142,12 +207,11 @@ class PersonalPackageArchiveMirror(Mirror):
         self.url_or_name = url_or_name
 
     def url(self):
-        if validators.url(self.url_or_name):
-            if not self.url_or_name.endswith("/"):
-                return self.url_or_name + "/"
-            return self.url_or_name
+        if validators.url(self.url_or_name) or os.path.isdir(self.url_or_name):
+            return mirror_url(self.url_or_name)
 
         return f"http://ppa.launchpad.net/{self.url_or_name}/ubuntu/"
 
     def url_with_locale(self):
         return None
+
@@ -18,22 +18,74 @@ def package_from_dict(dictionary, origin):
         dictionary["Architecture"],
         origin,
         int(dictionary.get("Installed-Size", sys.maxsize)),
-        list(map(lambda x: x.strip(), dictionary.get("Provides", "").split(","))),
-        dependencies_from_string("Depends", dictionary.get("Depends")),
-        dependencies_from_string("Pre-Depends", dictionary.get("Pre-Depends")),
+        dictionary.get("Provides", ""),
+        dictionary.get("Depends"),
+        dictionary.get("Pre-Depends"),
         dictionary.get("Filename"),
+        dictionary.get("Breaks"),
+        dictionary.get("Conflicts"),
+        dictionary.get("SHA256"),
+        int(dictionary["Size"]) if "Size" in dictionary else None,
     )
 
 
+def provided_names(string):
+    """Function for parsing a Provides field
+
+    Returns the names provided by a package, a provided
+    name may carry a version (`name (= version)`) which
+    is dropped.
+    """
+    return [
+        sys.intern(provided.split("(")[0].strip())
+        for provided in string.split(",")
+        if provided.strip()
+    ]
+
+
+def provided_versions(string):
+    """Function for parsing the versions of a Provides field
+
+    Returns a dictionary of the names that are provided at a
+    version (`name (= version)`) to that Version, names that
+    are provided without a version are left out.
+    """
+    versions = {}
+    for provided in string.split(","):
+        if "(" not in provided:
+            continue
+        (name, version) = provided.split("(")
+        version = version.strip().rstrip(")").lstrip("=").strip()
+        versions[sys.intern(name.strip())] = version_from_string(version)
+    return versions
+
+
 def unify(left, right):
     if left.name == right.name:
-        if left.version.is_greater(right.version):
+        if left.version > right.version:
             return left
         else:
             return right
 
 
 class Package(object):
+    __slots__ = (
+        "name",
+        "version",
+        "arch",
+        "origin",
+        "installed_size",
+        "_dependencies",
+        "_pre_dependencies",
+        "_provides",
+        "_provided_versions",
+        "_file_name",
+        "_breaks",
+        "_conflicts",
+        "sha256",
+        "size",
+    )
+
     def __init__(
         self,
         name,
@@ -45,6 +97,10 @@ class Package(object):
         dependencies=[],
         pre_dependencies=[],
         filename=None,
+        breaks=None,
+        conflicts=None,
+        sha256=None,
+        size=None,
     ):
         """A Package Object
         
@@ -58,17 +114,78 @@ class Package(object):
         - Architecture
         - Dependencies
         - Pre-Dependencies
+        - Breaks and Conflicts
         - Filename
+        - SHA256 and Size of the package file
+
+        Provides, dependencies, pre-dependencies, breaks and conflicts
+        may also be given as the raw strings of their fields, in which case they are
+        only parsed the first time they are accessed.
+
+        Names, architectures and origins are interned, as they are
+        shared by many packages.
         """
-        self.name = name
+        self.name = sys.intern(name)
         self.version = version
-        self.arch = arch
-        self.origin = origin
-        self.dependencies = dependencies
-        self.pre_dependencies = pre_dependencies
-        self.provides = provides
+        self.arch = sys.intern(arch)
+        self.origin = sys.intern(origin)
+        self._dependencies = dependencies
+        self._pre_dependencies = pre_dependencies
+        self._provides = provides
+        self._provided_versions = None
         self.installed_size = installed_size
         self._file_name = filename
+        self._breaks = breaks
+        self._conflicts = conflicts
+        self.sha256 = sha256
+        self.size = size
+
+    @property
+    def dependencies(self):
+        if self._dependencies is None or isinstance(self._dependencies, str):
+            self._dependencies = dependencies_from_string(
+                "Depends", self._dependencies
+            )
+        return self._dependencies
+
+    @property
+    def pre_dependencies(self):
+        if self._pre_dependencies is None or isinstance(self._pre_dependencies, str):
+            self._pre_dependencies = dependencies_from_string(
+                "Pre-Depends", self._pre_dependencies
+            )
+        return self._pre_dependencies
+
+    @property
+    def breaks(self):
+        if self._breaks is None or isinstance(self._breaks, str):
+            self._breaks = dependencies_from_string("Breaks", self._breaks)
+        return self._breaks
+
+    @property
+    def conflicts(self):
+        if self._conflicts is None or isinstance(self._conflicts, str):
+            self._conflicts = dependencies_from_string("Conflicts", self._conflicts)
+        return self._conflicts
+
+    @property
+    def provides(self):
+        if isinstance(self._provides, str):
+            if "(" in self._provides:
+                self._provided_versions = provided_versions(self._provides)
+            self._provides = provided_names(self._provides)
+        return self._provides
+
+    def provided_version(self, name):
+        """
+        Returns the Version this package provides `name` at, None if
+        it provides `name` without a version.
+        """
+        if self._provided_versions is None:
+            self.provides
+        if self._provided_versions is None:
+            return None
+        return self._provided_versions.get(name)
 
     def download_url(self):
         return f"{self.origin}{self.file_name()}"
@@ -5,12 +5,17 @@ import tempfile
 import tarfile
 
 from fetchy.plugins import BasePlugin
+from fetchy.codec import CODECS, get_codec, is_local_daemon
 
 from .source import DefaultUbuntuSource, DefaultDebianSource, DefaultPPASource
-from .repository import Repository
 from .downloader import Downloader
+from .resolver import Resolver, MinimalResolver, ClosureCache
+from .solver import ConstraintResolver
+from .transfer import ConnectionPool
+from .selection import MirrorSelector
+from .importer import PackageImporter
 from .debian import DpkgInstaller
-from .parser import Parser
+from .parser import parse_sources
 
 from pathlib import Path
 from tempfile import TemporaryDirectory
@@ -29,6 +34,8 @@ class PackagesPlugin(BasePlugin):
         self.exclude = data.get("exclude", [])
         self.ppa = data.get("ppa", [])
         self.fetch = data["fetch"]
+        self.resolver = data.get("resolver", "simple")
+        self.mirrors = data.get("mirrors", [])
 
     def validate(self):
         if not self.fetch:
@@ -37,21 +44,36 @@ class PackagesPlugin(BasePlugin):
         if not isinstance(self.fetch, list):
             logger.error("Packages module expects field `fetch` to be a list.")
             return False
+        if self.resolver not in ["simple", "minimal", "constraint"]:
+            logger.error(
+                "Packages module expects field `resolver` to be either "
+                "`simple`, `minimal` or `constraint`."
+            )
+            return False
+        if not isinstance(self.mirrors, list):
+            logger.error("Packages module expects field `mirrors` to be a list.")
+            return False
+        codec = self.blueprint.options.get("codec")
+        if codec is not None and codec not in CODECS:
+            logger.error(
+                f"Unknown codec `{codec}`, use one of {', '.join(sorted(CODECS))}."
+            )
+            return False
         return True
 
-    def _build_repository(self):
+    def _build_repository(self, selector):
         sources = []
 
         if self.blueprint.distribution == "ubuntu":
             sources.append(
                 DefaultUbuntuSource(
-                    self.blueprint.codename, self.blueprint.architecture
+                    self.blueprint.codename, self.blueprint.architecture, self.mirrors
                 )
             )
         elif self.blueprint.distribution == "debian":
             sources.append(
                 DefaultDebianSource(
-                    self.blueprint.codename, self.blueprint.architecture
+                    self.blueprint.codename, self.blueprint.architecture, self.mirrors
                 )
             )
         for ppa in self.ppa:
@@ -61,9 +83,18 @@ class PackagesPlugin(BasePlugin):
                 )
             )
 
-        repository = Repository()
-        for source in sources:
-            repository.merge(Parser(source).parse())
+        offline = self.blueprint.options.get("offline")
+        repository = parse_sources(
+            sources,
+            refresh=self.blueprint.options.get("refresh"),
+            jobs=self.blueprint.options.get("jobs"),
+            selector=selector,
+            offline=offline,
+        )
+        if offline:
+            imported = PackageImporter().repository(self.blueprint.architecture)
+            if imported is not None:
+                repository.merge(imported)
         return repository
 
     def _gather_exclusions(self):
@@ -89,22 +120,59 @@ class PackagesPlugin(BasePlugin):
     def _download_and_extract(self, context):
         os.mkdir(self._dir_in_context(context))
 
-        repository = self._build_repository()
+        offline = self.blueprint.options.get("offline")
+        selector = None
+        if not offline:
+            selector = MirrorSelector(spread=self.blueprint.options.get("spread"))
+        repository = self._build_repository(selector)
+        if self.resolver == "constraint":
+            resolver = ConstraintResolver(
+                repository, ClosureCache(), self.blueprint.architecture
+            )
+        elif self.resolver == "minimal":
+            resolver = MinimalResolver(repository, ClosureCache())
+        else:
+            resolver = Resolver(repository, ClosureCache())
 
         for package in self.fetch:
             if package not in repository:
                 logger.error(f"{package} not found in packages.")
                 sys.exit(1)
 
-        tar_file_path = Path(context.directory, "image.tar")
-        with TemporaryDirectory() as temp_dir:
-            DpkgInstaller(Downloader(repository, temp_dir)).create_image_tar(
-                tar_file_path
-            )
+        pool = ConnectionPool(offline=offline)
+        concurrency = self.blueprint.options.get("downloads")
+        codec = get_codec(
+            self.blueprint.options.get("codec"),
+            is_local_daemon(context.dockerfile.client),
+        )
 
-        Downloader(
-            repository, os.path.join(self._dir_in_context(context), "deb")
-        ).download_packages(self.fetch, self._gather_exclusions())
+        try:
+            tar_file_path = Path(context.directory, "image.tar")
+            with TemporaryDirectory() as temp_dir:
+                DpkgInstaller(
+                    Downloader(
+                        repository,
+                        temp_dir,
+                        resolver,
+                        concurrency,
+                        pool,
+                        selector=selector,
+                        offline=offline,
+                    ),
+                    codec=codec,
+                ).create_image_tar(tar_file_path)
+
+            Downloader(
+                repository,
+                os.path.join(self._dir_in_context(context), "deb"),
+                resolver,
+                concurrency,
+                pool,
+                selector=selector,
+                offline=offline,
+            ).download_packages(self.fetch, self._gather_exclusions())
+        finally:
+            pool.close()
 
         context.dockerfile.env(
             "PATH", ":".join(["/usr/bin/", "/bin/", "/sbin/", "/usr/sbin/"])
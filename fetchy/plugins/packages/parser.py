@@ -1,14 +1,224 @@
-import pickle
+import io
+import os
+import sys
+import hashlib
+import logging
+import multiprocessing
 
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+from collections import OrderedDict
+from fetchy.cache import get_cache_manager
 from fetchy.utils import get_cache_dir
 
 from .repository import Repository
-from .package import package_from_dict
+from .index import MAGIC, PackageIndex, write_index
+from .release import fetch_release, load_release
+from .source import open_package_index
+from .selection import failover
+from .mirror import is_local_url
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_FIELDS = [
+    "Package",
+    "Version",
+    "Depends",
+    "Pre-Depends",
+    "Filename",
+    "Architecture",
+    "Installed-Size",
+    "Provides",
+    "Breaks",
+    "Conflicts",
+    "SHA256",
+    "Size",
+]
+
+
+def iter_stanzas(stream, fields=None):
+    """Function for splitting an index into stanzas
+
+    This function will read a binary package index line
+    by line and yield a dictionary for every stanza in it.
+
+    Stanzas are separated by blank lines, fields are looked
+    up by the text before the colon and continuation lines
+    (lines starting with whitespace) are appended to the
+    field they belong to. Only the values of the requested
+    fields are decoded.
+
+    Parameters
+    ----------
+    stream : a binary file-like object, or any iterable of
+        lines as bytes.
+
+    fields : the names of the fields that should be kept, if
+        None all fields are kept.
+    """
+    if fields is None:
+        wanted = None
+    else:
+        wanted = {field.encode(): field for field in fields}
+
+    stanza = {}
+    field = None
+
+    for line in stream:
+        first = line[:1]
+        if first == b" " or first == b"\t":
+            # Continuation of the previous field, unless the
+            # line is blank in which case it ends the stanza.
+            if not line.isspace():
+                if field is not None:
+                    stanza[field] += "\n" + line.strip().decode("utf-8")
+                continue
+        elif first != b"\n" and first != b"\r":
+            (key, _, value) = line.partition(b":")
+            if wanted is None:
+                field = key.decode("utf-8")
+            else:
+                field = wanted.get(key)
+
+            if field is not None:
+                stanza[field] = value.strip().decode("utf-8")
+            continue
+
+        if stanza:
+            yield stanza
+            stanza = {}
+        field = None
+
+    if stanza:
+        yield stanza
+
+
+# Size of the blocks a package index is split into for parallel parsing.
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def iter_chunks(stream, size=CHUNK_SIZE):
+    """Function for splitting an index into chunks
+
+    This function will read a binary package index in blocks
+    of roughly `size` bytes and yield chunks that end on a
+    stanza boundary, so every chunk can be parsed on its own.
+    """
+    remainder = b""
+    while True:
+        block = stream.read(size)
+        if not block:
+            break
+
+        data = remainder + block
+        end = max(data.rfind(b"\n\n"), data.rfind(b"\n\r\n"))
+        if end == -1:
+            remainder = data
+            continue
+
+        yield data[: end + 1]
+        remainder = data[end + 1 :]
+
+    if remainder:
+        yield remainder
+
+
+def _parse_chunk(chunk, fields):
+    return list(iter_stanzas(io.BytesIO(chunk), fields))
+
+
+def _ready():
+    pass
+
+
+def _start_processes(workers):
+    """
+    Returns a pool of processes that is safe to use from threads doing
+    network I/O. Workers are started by a fork server where available,
+    otherwise all workers are started right away, before any thread
+    can hold a lock a forked worker would inherit.
+    """
+    if sys.version_info >= (3, 7) and (
+        "forkserver" in multiprocessing.get_all_start_methods()
+    ):
+        return ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("forkserver")
+        )
+
+    processes = ProcessPoolExecutor(workers)
+    for future in [processes.submit(_ready) for _ in range(workers)]:
+        future.result()
+    return processes
+
+
+def parse_sources(
+    sources, refresh=False, jobs=None, fields=None, selector=None, offline=False
+):
+    """Function for parsing multiple sources
+
+    This function will download and parse the stale package indices
+    of every source and return a single Repository assembled from
+    the shards of all sources.
+
+    Package indices are downloaded concurrently and are split into
+    chunks on stanza boundaries, which are parsed by a pool of
+    processes.
+
+    Parameters
+    ----------
+    sources : a list of Source objects.
+
+    refresh : if True, check the Release files of the mirrors for
+        package indices that changed since they were downloaded.
+
+    jobs : the number of processes used for parsing, defaults to
+        the number of CPUs. If 1, everything is parsed in this process.
+
+    fields : the fields to keep, see `Parser`.
+
+    selector : a MirrorSelector ranking the mirrors of the sources,
+        requests fail over to the next mirror if given.
+
+    offline : if True, only sources with a `file://` mirror are read,
+        the cached indices of other sources are used as they are.
+    """
+    if selector is not None:
+        for source in sources:
+            source.select_mirrors(selector, refresh)
+    parsers = [Parser(source, fields, selector, offline) for source in sources]
+
+    stale = OrderedDict()
+    for parser in parsers:
+        for (index_url, digest) in parser._collect_stale_indices(refresh):
+            stale.setdefault(index_url, (parser, digest))
+
+    with tqdm(total=len(stale), desc="Downloading archive indices") as t:
+        if jobs == 1:
+            for (index_url, (parser, digest)) in stale.items():
+                parser._parse_index(index_url, digest)
+                t.update(1)
+        elif stale:
+            workers = jobs or os.cpu_count() or 1
+            with _start_processes(workers) as processes:
+                with ThreadPoolExecutor(min(len(stale), workers)) as threads:
+                    futures = [
+                        threads.submit(parser._parse_index, index_url, digest, processes)
+                        for (index_url, (parser, digest)) in stale.items()
+                    ]
+                    for future in as_completed(futures):
+                        future.result()
+                        t.update(1)
+
+    repository = Repository()
+    for parser in parsers:
+        repository.merge(parser._load_shards())
+    return repository
 
 
 class Parser(object):
-    def __init__(self, source, fields=None):
+    def __init__(self, source, fields=None, selector=None, offline=False):
         """
         The Control File Parser will parse package archive
         index files into a Repository object.
@@ -20,54 +230,191 @@ class Parser(object):
         ----------
         source : the source this parser will consume, an instance
             of a Source object
+
+        selector : a MirrorSelector, if given the Release files and
+            indices are requested from the ranked mirrors of the source.
+
+        offline : if True, indices are only read from `file://` mirrors,
+            indices of other mirrors that are not cached are skipped.
         """
         if fields is None:
-            fields = [
-                "Package",
-                "Version",
-                "Depends",
-                "Pre-Depends",
-                "Filename",
-                "Architecture",
-                "Installed-Size",
-                "Provides",
-            ]
+            fields = DEFAULT_FIELDS
         self.source = source
         self.fields = fields
+        self.selector = selector
+        self.offline = offline
+
+    def _urls(self, url):
+        if self.selector is None:
+            return [url]
+        return self.selector.urls(url)
+
+    def _get_cache_dir(self):
+        cache_dir = Path(get_cache_dir(), "indices")
+        if not cache_dir.exists():
+            cache_dir.mkdir(parents=True)
+        return cache_dir
+
+    def _get_cache_path(self, *keys, extension):
+        sha = hashlib.sha256()
+        sha.update("\n".join(keys).encode())
+        return Path(self._get_cache_dir(), sha.hexdigest()[:32] + extension)
+
+    def _cached_digest(self, index_url):
+        """
+        Returns the digest of the shard currently in use for the given
+        package index, an empty string if the digest is unknown and None
+        if the index has not been downloaded at all.
+        """
+        digest_path = self._get_cache_path(index_url, extension=".sha256")
+        if not get_cache_manager().pin(digest_path).exists():
+            return None
+        return digest_path.read_text().strip()
+
+    def _get_shard_path(self, index_url, digest=None):
+        """
+        Shards are keyed by the url of the package index, its digest and
+        the version of the index format, the shard of the digest currently
+        in use is returned if none is given.
+        """
+        if digest is None:
+            digest = self._cached_digest(index_url)
+        if digest is None:
+            return None
+        return self._get_cache_path(
+            index_url, digest, MAGIC.decode(), extension=".idx"
+        )
+
+    def _has_shard(self, index_url):
+        shard_path = self._get_shard_path(index_url)
+        return (
+            shard_path is not None and get_cache_manager().pin(shard_path).exists()
+        )
+
+    def _fetch_release(self, release_url, refresh):
+        """
+        Returns the Release for the given url, the mirror is only
+        contacted if there is no cached Release or if a refresh
+        is requested.
+        """
+        release_path = self._get_cache_path(release_url, extension=".release")
+        cached = load_release(release_path)
+        if cached is not None and not refresh:
+            return cached
+
+        release = failover(
+            self._urls(release_url), lambda url: fetch_release(url, cached)
+        )
+        if release is not None and release is not cached:
+            release.store(release_path)
+        return release
+
+    def _read_index(self, index_url, executor=None):
+        """
+        Download and parse a single package index into a list of stanzas,
+        the chunks of the index are parsed by the executor if one is given.
+        The index is read from the next mirror if a mirror fails.
+        """
+        return failover(
+            self._urls(index_url), lambda url: self._read_index_from(url, executor)
+        )
+
+    def _read_index_from(self, url, executor):
+        with open_package_index(url) as stream:
+            if executor is None:
+                return list(iter_stanzas(stream, self.fields))
 
-    def _get_cache_path(self):
-        return Path(get_cache_dir(), self.source._create_hash() + ".pkl")
+            futures = [
+                executor.submit(_parse_chunk, chunk, self.fields)
+                for chunk in iter_chunks(stream)
+            ]
+        return [stanza for future in futures for stanza in future.result()]
 
-    def _load_from_cache(self):
-        if self._get_cache_path().exists():
-            with open(self._get_cache_path(), "rb") as pkl_file:
-                return pickle.load(pkl_file)
+    def _parse_index(self, index_url, digest, executor=None):
+        """
+        Download and parse a single package index into a shard, recording
+        the digest the Release file listed for it as the one in use.
 
-    def parse(self):
+        The shard that was previously in use for the index is removed,
+        processes that still have it mapped are not affected.
+        """
+        if digest is None:
+            digest = ""
+
+        stanzas = self._read_index(index_url, executor)
+
+        previous_shard_path = self._get_shard_path(index_url)
+        shard_path = self._get_shard_path(index_url, digest)
+
+        write_index(shard_path, stanzas, self.source.mirror.url())
+        self._get_cache_path(index_url, extension=".sha256").write_text(digest)
+
+        if previous_shard_path not in (None, shard_path):
+            if previous_shard_path.exists():
+                previous_shard_path.unlink()
+
+    def _collect_stale_indices(self, refresh):
+        """
+        Collects the package indices that must be downloaded, together
+        with the digest of their current version.
+
+        Indices that have not been downloaded yet are always stale, when
+        refreshing an index is only stale if the checksum in the Release
+        file differs from the checksum it was downloaded with. When offline
+        only indices of `file://` mirrors can be stale.
+        """
+        stale = []
+        for (release_url, entries) in self.source.collect_releases().items():
+            if self.offline and not is_local_url(release_url):
+                for (index_url, _) in entries:
+                    if not self._has_shard(index_url):
+                        logger.warning(f"Skipping {index_url}, Fetchy is offline")
+                continue
+
+            entries = [
+                (index_url, path)
+                for (index_url, path) in entries
+                if refresh or not self._has_shard(index_url)
+            ]
+            if not entries:
+                continue
+
+            release = self._fetch_release(release_url, refresh)
+            for (index_url, path) in entries:
+                digest = release.digest(path) if release is not None else None
+                if (
+                    digest is None
+                    or digest != self._cached_digest(index_url)
+                    or not self._has_shard(index_url)
+                ):
+                    stale.append((index_url, digest))
+        return stale
+
+    def _load_shards(self):
+        indices = []
+        for index_url in self.source.collect_package_indices():
+            # Indices are only missing if they were skipped while offline
+            if self._has_shard(index_url):
+                indices.append(PackageIndex(self._get_shard_path(index_url)))
+        return Repository(indices=indices)
+
+    def parse(self, refresh=False, jobs=1):
         """
         Consume the source package indices and add the packages to
         a repository file.
+
+        Every package index is cached as a separate shard keyed by its url
+        and checksum, shards are shared by every Source that includes the
+        package index. Only indices that are missing (or changed, when
+        refreshing) are downloaded and parsed.
+
+        Parameters
+        ----------
+        refresh : if True, check the Release files of the mirror for
+            package indices that changed since they were downloaded.
+
+        jobs : the number of processes used for parsing, see `parse_sources`.
         """
-        if self._get_cache_path().exists():
-            return self._load_from_cache()
-
-        repository = Repository()
-        with open(self.source.get_index_file(), "r", encoding="utf-8") as fp:
-            pkg = {}
-            for line in fp:
-                # New packages are introduced with whitespaces
-                if line.startswith("\r\n") or line.startswith("\n"):
-                    if pkg:
-                        repository.add(package_from_dict(pkg, self.source.mirror.url()))
-                        pkg = {}
-
-                for field in self.fields:
-                    if line.startswith(field):
-                        pkg[field] = line.rstrip()[(len(field) + 2) :]
-                        break
-
-        if not self._get_cache_path().exists():
-            with open(self._get_cache_path(), "wb") as pkl_file:
-                pickle.dump(repository, pkl_file)
-
-        return repository
+        return parse_sources(
+            [self.source], refresh, jobs, self.fields, self.selector, self.offline
+        )
@@ -0,0 +1,124 @@
+import json
+import urllib.error
+import urllib.request
+
+from pathlib import Path
+from .mirror import is_missing_file
+
+
+def release_from_bytes(data, etag=None, last_modified=None):
+    """Function for parsing a Release file
+
+    A Release file describes a single suite of an archive
+    (`dists/<suite>/Release`) and holds the checksums of every
+    index file in that suite.
+
+    Only the `SHA256` field is used, each of its lines is
+    formatted as `<digest> <size> <path>`.
+    """
+    checksums = {}
+    in_sha256 = False
+    for line in data.decode("utf-8").splitlines():
+        if not line[:1].isspace():
+            in_sha256 = line.startswith("SHA256:")
+            continue
+
+        parts = line.split()
+        if in_sha256 and len(parts) == 3:
+            (digest, _, path) = parts
+            checksums[path] = digest
+
+    return Release(checksums, etag, last_modified)
+
+
+def fetch_release(url, cached=None):
+    """Function for fetching a Release file
+
+    If a cached Release is given the request is made conditional
+    with `If-None-Match` and `If-Modified-Since`, when the mirror
+    answers that the file has not been modified the cached Release
+    is returned.
+
+    Returns None if the mirror does not serve a Release file.
+    """
+    request = urllib.request.Request(url)
+    if cached is not None:
+        if cached.etag:
+            request.add_header("If-None-Match", cached.etag)
+        if cached.last_modified:
+            request.add_header("If-Modified-Since", cached.last_modified)
+
+    try:
+        with urllib.request.urlopen(request) as response:
+            return release_from_bytes(
+                response.read(),
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
+    except urllib.error.URLError as e:
+        # Only HTTP errors have a status code
+        if getattr(e, "code", None) == 304 and cached is not None:
+            return cached
+        if is_missing_file(e):
+            return None
+        raise
+
+
+def load_release(path):
+    """
+    Load a Release previously stored with `Release.store`,
+    returns None if there is none.
+    """
+    if not Path(path).exists():
+        return None
+
+    with open(path, "r") as release_file:
+        data = json.load(release_file)
+    return Release(data["checksums"], data["etag"], data["last_modified"])
+
+
+class Release(object):
+    def __init__(self, checksums, etag=None, last_modified=None):
+        """
+        A Release object holds the checksums of the index files
+        in a suite, along with the validators of the HTTP response
+        it was read from.
+
+        Parameters
+        ----------
+        checksums : a dictionary mapping paths, relative to the suite,
+            to their SHA256 digest.
+
+        etag : the `ETag` header of the response, if any.
+
+        last_modified : the `Last-Modified` header of the response, if any.
+        """
+        self.checksums = checksums
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def digest(self, path):
+        """
+        Returns the digest of a package index, the digest of the
+        uncompressed index is preferred over its compressed variants.
+
+        Parameters
+        ----------
+        path : the path of the index without a compression extension,
+            relative to the suite, for example `main/binary-amd64/Packages`.
+        """
+        for extension in ["", ".xz", ".gz"]:
+            if path + extension in self.checksums:
+                return self.checksums[path + extension]
+        return None
+
+    def store(self, path):
+        with open(path, "w") as release_file:
+            json.dump(
+                {
+                    "checksums": self.checksums,
+                    "etag": self.etag,
+                    "last_modified": self.last_modified,
+                },
+                release_file,
+            )
@@ -1,25 +1,89 @@
+import hashlib
+
+from bisect import bisect_left, bisect_right
+
+
 class Repository(object):
-    def __init__(self, pkgs=None):
+    def __init__(self, pkgs=None, indices=None):
         """
         A Repository object stores and manages packages
         this way, we can use multiple package indices at once.
+
+        Every version of a package is kept, the versions of a
+        package are stored in a list ordered by their dpkg sort
+        keys (see `Version`) so version constraints can be looked
+        up by bisection.
+
+        Packages are either added directly or read lazily from
+        package index files, a package stored in an index is
+        only decoded the first time it is looked up.
+
+        A reverse index maps names provided by packages (virtual
+        packages) to the names of the packages providing them.
+
+        Parameters
+        ----------
+        pkgs : a dictionary of packages keyed by name.
+
+        indices : a list of PackageIndex objects backing this
+            Repository.
         """
-        if pkgs is None:
-            pkgs = {}
-        self.pkgs = pkgs
+        self._reset(indices)
+        self._modified = False
+
+        if pkgs:
+            for pkg in pkgs.values():
+                self.add(pkg)
+
+    def _reset(self, indices=None):
+        """
+        Drops every package of this Repository, including the packages
+        decoded from its indices, and the indices themselves.
+        """
+        if indices is None:
+            indices = []
+        self.pkgs = {}
+        self.indices = indices
+        self._keys = {}
+        self._providers = {}
+        self._loaded = set()
+
+    def _load(self, name):
+        """
+        Decode the packages named `name` from the backing indices,
+        this is done at most once per name.
+        """
+        if name in self._loaded:
+            return
+        self._loaded.add(name)
+        for index in self.indices:
+            for pkg in index.packages(name):
+                self._insert(pkg)
 
     def add(self, pkg):
         """
-        Add a single package to this Repository, if it already
-        exists, then overwrite it.
+        Add a single package to this Repository, if the same
+        version of the package already exists, then overwrite it.
         """
-        if pkg.name in self.pkgs:
-            if (
-                pkg.version.upstream_version
-                < self.pkgs[pkg.name].version.upstream_version
-            ):
-                return
-        self.pkgs[pkg.name] = pkg
+        self._modified = True
+        self._insert(pkg)
+
+    def _insert(self, pkg):
+        key = pkg.version.key
+        keys = self._keys.setdefault(pkg.name, [])
+        versions = self.pkgs.setdefault(pkg.name, [])
+
+        idx = bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            versions[idx] = pkg
+        else:
+            keys.insert(idx, key)
+            versions.insert(idx, pkg)
+
+        for provided in pkg.provides:
+            providers = self._providers.setdefault(provided, [])
+            if pkg.name not in providers:
+                providers.append(pkg.name)
 
     def update(self, pkgs):
         """
@@ -29,7 +93,8 @@ class Repository(object):
         """
         if pkgs:
             return self.merge(Repository(pkgs))
-        self.pkgs = pkgs
+        self._reset()
+        self._modified = True
         return self
 
     def merge(self, other):
@@ -37,20 +102,103 @@ class Repository(object):
         Merge this repository with another repository, for now
         let's overwrite the packages in this repository with
         the packages in the other repository if they alreadu exist.
+
+        Indices backing the other repository are not decoded, they
+        are added to the indices backing this repository instead.
         """
         if not other.is_empty():
-            for pkg in other.pkgs.values():
-                self.add(pkg)
+            for index in other.indices:
+                self.indices.append(index)
+                for name in self._loaded:
+                    for pkg in index.packages(name):
+                        self._insert(pkg)
+            for versions in other.pkgs.values():
+                for pkg in versions:
+                    self._insert(pkg)
+            self._modified = self._modified or other._modified
         return self
 
     def is_empty(self):
         """
         Return true if this repository has no packages.
         """
-        return not bool(self.pkgs)
+        return not self.pkgs and not any(len(index) for index in self.indices)
+
+    def digest(self):
+        """
+        Returns a digest of the contents of this repository, derived
+        from the digests of its indices.
+
+        Packages that were added directly are not covered by the
+        digest, None is returned if any package was added directly.
+        """
+        if self._modified:
+            return None
+        sha = hashlib.sha256()
+        for index in self.indices:
+            sha.update(index.digest().encode())
+        return sha.hexdigest()
+
+    def versions(self, name):
+        """
+        Returns every version of the package named `name`,
+        ordered from the earliest to the latest version.
+        """
+        self._load(name)
+        return self.pkgs.get(name, [])
+
+    def candidates(self, name, relationship=None):
+        """
+        Returns the versions of the package named `name` that satisfy
+        a version relationship, ordered from earliest to latest.
+
+        Parameters
+        ----------
+        name : the name of the package.
+
+        relationship : a DependencyRelationship object, if None every
+            version of the package is a candidate.
+        """
+        versions = self.versions(name)
+        if relationship is None or not versions:
+            return versions
+
+        keys = self._keys[name]
+        key = relationship.version.key
+        operator = relationship.relationship
+
+        if operator == "<<":
+            return versions[: bisect_left(keys, key)]
+        if operator in ("<=", "<"):
+            return versions[: bisect_right(keys, key)]
+        if operator == "=":
+            return versions[bisect_left(keys, key) : bisect_right(keys, key)]
+        if operator in (">=", ">"):
+            return versions[bisect_left(keys, key) :]
+        if operator == ">>":
+            return versions[bisect_right(keys, key) :]
+        raise ValueError(f"Unknown version relationship {operator}")
+
+    def providers(self, name):
+        """
+        Returns the names of the packages that provide `name`,
+        both from packages in this repository and its indices.
+        """
+        providers = list(self._providers.get(name, []))
+        for index in self.indices:
+            for provider in index.providers(name):
+                if provider not in providers:
+                    providers.append(provider)
+        return providers
 
     def __getitem__(self, key):
-        return self.pkgs.get(key, None)
+        """
+        Returns the latest version of the package named `key`.
+        """
+        versions = self.versions(key)
+        if not versions:
+            return None
+        return versions[-1]
 
     def __contains__(self, key):
-        return key in self.pkgs
+        return key in self.pkgs or any(key in index for index in self.indices)
@@ -0,0 +1,181 @@
+import json
+import math
+import time
+import hashlib
+import logging
+import http.client
+import urllib.error
+import urllib.request
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from fetchy.cache import get_cache_manager
+from fetchy.utils import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Rankings of mirrors are probed again once they are older than this
+RANKING_TTL = 24 * 60 * 60
+
+PROBE_TIMEOUT = 5
+
+# The number of bytes read from a mirror to measure its throughput
+PROBE_SIZE = 256 * 1024
+
+# Mirrors are ranked by the time they would take to serve a file of
+# this size, the size of a typical package
+REFERENCE_SIZE = 1024 * 1024
+
+# Errors after which a request is made to the next mirror
+MIRROR_ERRORS = (urllib.error.URLError, http.client.HTTPException, OSError)
+
+
+def probe_mirror(url, timeout=PROBE_TIMEOUT):
+    """Function for probing the latency and throughput of a mirror
+
+    The latency is the time until the response of the mirror arrives,
+    the throughput is measured by reading up to PROBE_SIZE bytes.
+
+    Returns a `(latency, throughput)` tuple, with the throughput in
+    bytes per second.
+    """
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        latency = time.perf_counter() - start
+        received = len(response.read(PROBE_SIZE))
+    elapsed = time.perf_counter() - start - latency
+    throughput = received / elapsed if elapsed > 0 else math.inf
+    return (latency, throughput)
+
+
+def failover(urls, request):
+    """Function for making a request to the first mirror that serves it
+
+    The request is made for every url in order until it succeeds, the
+    error of the last url is raised if it fails for all of them.
+
+    Parameters
+    ----------
+    urls : the urls of the same file on different mirrors.
+
+    request : a function making the request for a single url.
+    """
+    for (i, url) in enumerate(urls):
+        try:
+            return request(url)
+        except MIRROR_ERRORS as e:
+            if i == len(urls) - 1:
+                raise
+            logger.warning(f"Request for {url} failed ({e}), trying the next mirror")
+
+
+class MirrorSelector(object):
+    def __init__(self, ttl=RANKING_TTL, timeout=PROBE_TIMEOUT, spread=None):
+        """
+        The MirrorSelector ranks the candidate mirrors of an archive by
+        probing their latency and throughput, and translates urls of
+        the archive to the urls of the same file on the ranked mirrors
+        so requests can fail over to the next mirror.
+
+        Packages and indices are still identified by the url of the
+        mirror of their Source, so a different ranking never invalidates
+        the cache.
+
+        Rankings are cached in the `mirrors` directory of the cache
+        directory.
+
+        Parameters
+        ----------
+        ttl : the number of seconds a ranking is used before the mirrors
+            are probed again.
+
+        timeout : the timeout in seconds of a probe, mirrors that time
+            out are ranked last.
+
+        spread : the number of best ranked mirrors to spread downloads
+            over, by default all downloads use the best mirror.
+        """
+        self.ttl = ttl
+        self.timeout = timeout
+        self.spread = spread
+        self._rankings = {}
+
+    def _get_cache_path(self, candidates, probe):
+        sha = hashlib.sha256()
+        sha.update("\n".join(candidates + [probe]).encode())
+        directory = Path(get_cache_dir(), "mirrors")
+        directory.mkdir(parents=True, exist_ok=True)
+        return get_cache_manager().pin(
+            Path(directory, sha.hexdigest()[:32] + ".json")
+        )
+
+    def _probe(self, url):
+        try:
+            (latency, throughput) = probe_mirror(url, self.timeout)
+        except MIRROR_ERRORS as e:
+            logger.warning(f"Unable to probe mirror {url} ({e})")
+            return math.inf
+        logger.debug(f"Probed {url}: {latency:.3f}s, {throughput:.0f}B/s")
+        if throughput <= 0:
+            # The mirror answered without serving the file
+            logger.warning(f"Unable to probe mirror {url} (empty response)")
+            return math.inf
+        return latency + REFERENCE_SIZE / throughput
+
+    def _rank(self, candidates, probe):
+        """
+        Probes the candidates concurrently and orders them from fastest
+        to slowest, mirrors that fail keep their order at the end.
+        """
+        with ThreadPoolExecutor(len(candidates)) as executor:
+            scores = list(
+                executor.map(self._probe, [url + probe for url in candidates])
+            )
+        order = sorted(range(len(candidates)), key=lambda i: (scores[i], i))
+        return [candidates[i] for i in order]
+
+    def select(self, mirror, probe, refresh=False):
+        """
+        Ranks the candidates of a mirror and uses the ranking for urls
+        of the mirror from then on, returns the ranking.
+
+        Parameters
+        ----------
+        mirror : the Mirror to rank the candidates of.
+
+        probe : the path of a small file every candidate serves, relative
+            to the base url of the mirrors, used to probe them.
+
+        refresh : if True, the candidates are probed even if there is a
+            ranking that has not expired yet.
+        """
+        candidates = mirror.candidates()
+        ranking = candidates
+        if len(candidates) > 1:
+            path = self._get_cache_path(candidates, probe)
+            cached = json.loads(path.read_text()) if path.exists() else None
+            if cached and not refresh and time.time() - cached["time"] < self.ttl:
+                ranking = cached["ranking"]
+            else:
+                ranking = self._rank(candidates, probe)
+                path.write_text(json.dumps({"time": time.time(), "ranking": ranking}))
+
+        self._rankings[mirror.url()] = ranking
+        return ranking
+
+    def urls(self, url, index=0):
+        """
+        Returns the urls of the same file on the ranked mirrors, in the
+        order they should be tried. If downloads are spread, the `index`
+        of a download decides which of the best mirrors comes first.
+        """
+        for (base, ranking) in self._rankings.items():
+            if url.startswith(base):
+                path = url[len(base) :]
+                urls = [mirror + path for mirror in ranking]
+                if self.spread:
+                    spread = min(self.spread, len(urls))
+                    first = index % spread
+                    urls = urls[first:spread] + urls[:first] + urls[spread:]
+                return urls
+        return [url]
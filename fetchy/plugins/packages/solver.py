@@ -0,0 +1,385 @@
+import logging
+
+from itertools import chain, islice
+from collections import OrderedDict
+
+from .dependency import dependency_from_string
+from .resolver import Resolver
+
+logger = logging.getLogger(__name__)
+
+
+class ResolutionError(RuntimeError):
+    pass
+
+
+class _Decision(object):
+    __slots__ = ("trail", "clauses", "checked", "open", "head", "candidates")
+
+    def __init__(self, state, candidates):
+        """
+        A _Decision records the state of the solver before a choice
+        was made, so it can be restored to try the next candidate.
+
+        Clauses and open clauses are only ever appended to between
+        decisions, so recording their lengths is enough to restore them.
+        """
+        self.trail = len(state.trail)
+        self.clauses = len(state.clauses)
+        self.checked = state.checked
+        self.open = len(state.open)
+        self.head = state.head
+        self.candidates = iter(candidates)
+
+
+class _State(object):
+    def __init__(self, excludes):
+        """
+        The state of a single run of the ConstraintResolver.
+
+        Parameters
+        ----------
+        excludes : the set of names that must not be installed.
+        """
+        self.excludes = excludes
+        self.selected = {}
+        self.trail = []
+        self.clauses = []
+        self.checked = 0
+        self.open = []
+        self.head = 0
+        self.decisions = []
+        self.broken = {}
+        self.provided = {}
+
+
+class ConstraintResolver(Resolver):
+    def __init__(self, packages, cache=None, architecture=None):
+        """
+        The ConstraintResolver class resolves the closure of dependencies
+        of a set of packages while honouring version relationships,
+        Breaks and Conflicts and architecture qualifiers.
+
+        Every dependency of an installed package is a clause that must be
+        satisfied by one of its candidates, at most one version of a
+        package is installed and packages that break or conflict with each
+        other are never installed together.
+
+        Clauses with a single candidate left are satisfied right away
+        (unit propagation), clauses with more candidates are left open.
+        Open clauses are revisited in order once no clause is left to
+        propagate, and are decided on if they still have more than one
+        candidate, trying its candidates in order of preference: the
+        alternatives in the order they are listed, the latest version of
+        a package first and packages providing a virtual package by size.
+        If a clause can not be satisfied, the solver backtracks to the
+        last decision and tries its next candidate.
+
+        Dependencies on packages that are not in the repository at all
+        are ignored, as they would be by the Resolver.
+
+        Parameters
+        ----------
+        packages : a Repository containing a collection of packages this
+            Resolver may use to satisfy dependencies.
+
+        cache : a ClosureCache to look up and store resolved closures.
+
+        architecture : the architecture to install packages for, only
+            packages of this architecture (or `all`) are installed and
+            architecture qualifiers are evaluated against it.
+        """
+        super().__init__(packages, cache)
+        self.architecture = architecture
+        self._satisfiers = {}
+        self._candidates_of = {}
+        self._conflicts_of = {}
+        self._missing = set()
+
+    def _engine(self):
+        return f"constraint {self.architecture}"
+
+    def _walk(self, names, excludes):
+        state = _State(excludes)
+        roots = [dependency_from_string("Depends", name) for name in names]
+        state.clauses = [(None, root) for root in roots]
+
+        while True:
+            conflict = self._propagate(state)
+            if conflict is None:
+                decision = self._next_open(state)
+                if decision is None:
+                    break
+                conflict = self._decide(state, *decision)
+            if conflict is not None:
+                self._backtrack(state, conflict)
+
+        return self._order(state, roots)
+
+    def _installable(self, package):
+        return self.architecture is None or package.arch in (self.architecture, "all")
+
+    def _provides(self, package, name, relationship):
+        """
+        Returns whether a package provides `name` at a version that
+        satisfies a version relationship, unversioned Provides only
+        satisfy unversioned dependencies.
+        """
+        if relationship is None:
+            return True
+        version = package.provided_version(name)
+        return version is not None and relationship.satisfied_by(version)
+
+    def _satisfiers_of(self, dependency):
+        """
+        Returns the packages that satisfy a SimpleDependency, real
+        packages from latest to earliest version followed by the
+        packages that provide it. A versioned dependency is only
+        satisfied by packages that provide it at a matching version.
+        """
+        key = (dependency.name, dependency.relationship)
+        satisfiers = self._satisfiers.get(key)
+        if satisfiers is not None:
+            return satisfiers
+
+        name = dependency.name.split(":")[0]
+        versions = self.packages.candidates(name, dependency.relationship)
+        satisfiers = [
+            package for package in reversed(versions) if self._installable(package)
+        ]
+        providers = []
+        for provider in self.packages.providers(name):
+            providers += [
+                package
+                for package in reversed(self.packages.versions(provider))
+                if name in package.provides
+                and self._installable(package)
+                and self._provides(package, name, dependency.relationship)
+            ]
+        providers.sort(key=lambda package: package.installed_size)
+        satisfiers += providers
+
+        self._satisfiers[key] = satisfiers
+        return satisfiers
+
+    def _clause_candidates(self, dependency):
+        """
+        Returns the names of the alternatives of a dependency that apply
+        to the architecture and the packages satisfying them.
+        """
+        candidates = self._candidates_of.get(dependency)
+        if candidates is not None:
+            return candidates
+
+        names = []
+        packages = []
+        seen = set()
+        for alternative in dependency.alternatives():
+            if not alternative.applies_to(self.architecture):
+                continue
+            names.append(alternative.name.split(":")[0])
+            for package in self._satisfiers_of(alternative):
+                if package not in seen:
+                    seen.add(package)
+                    packages.append(package)
+
+        candidates = self._candidates_of[dependency] = (names, packages)
+        return candidates
+
+    def _conflicts(self, package):
+        conflicts = self._conflicts_of.get(package)
+        if conflicts is None:
+            conflicts = self._conflicts_of[package] = [
+                conflict
+                for dependency in chain(package.breaks, package.conflicts)
+                for conflict in dependency.alternatives()
+                if conflict.applies_to(self.architecture)
+            ]
+        return conflicts
+
+    def _compatible(self, state, package):
+        """
+        Returns whether a package can be installed next to the packages
+        that have been selected so far.
+        """
+        for (conflict, owner) in state.broken.get(package.name, ()):
+            if owner.name != package.name and conflict.satisfied_by(package):
+                return False
+        for provided in package.provides:
+            for (conflict, owner) in state.broken.get(provided, ()):
+                if owner.name != package.name and conflict.relationship is None:
+                    return False
+        for conflict in self._conflicts(package):
+            other = state.selected.get(conflict.name)
+            if other is not None and other.name != package.name:
+                if conflict.satisfied_by(other):
+                    return False
+            if conflict.relationship is None:
+                for other in state.provided.get(conflict.name, ()):
+                    if other.name != package.name:
+                        return False
+        return True
+
+    def _iter_viable(self, state, packages):
+        for package in packages:
+            if package.name not in state.selected and self._compatible(state, package):
+                yield package
+
+    def _viable(self, state, clause):
+        """
+        Returns up to two candidates that can still satisfy a clause,
+        which is enough to tell whether the clause is a unit clause, or
+        None if the clause is already satisfied.
+        """
+        (_, dependency) = clause
+        (names, packages) = self._clause_candidates(dependency)
+        if not names or any(name in state.excludes for name in names):
+            return None
+
+        if not packages:
+            if not any(name in self.packages for name in names):
+                if dependency not in self._missing:
+                    self._missing.add(dependency)
+                    logger.warning(f"Unable to find {dependency}, ignoring it")
+                return None
+            return []
+
+        for package in packages:
+            if state.selected.get(package.name) is package:
+                return None
+
+        return list(islice(self._iter_viable(state, packages), 2))
+
+    def _select(self, state, package):
+        state.selected[package.name] = package
+        state.trail.append(package)
+        for conflict in self._conflicts(package):
+            state.broken.setdefault(conflict.name, []).append((conflict, package))
+        for provided in package.provides:
+            state.provided.setdefault(provided, []).append(package)
+        for dependency in chain(package.pre_dependencies, package.dependencies):
+            state.clauses.append((package, dependency))
+
+    def _unselect(self, state):
+        package = state.trail.pop()
+        for provided in reversed(package.provides):
+            state.provided[provided].pop()
+        for conflict in reversed(self._conflicts(package)):
+            state.broken[conflict.name].pop()
+        del state.selected[package.name]
+
+    def _propagate(self, state):
+        """
+        Satisfies the clauses added since the last propagation that have
+        a single candidate left, returns a clause that can not be
+        satisfied or None.
+        """
+        while state.checked < len(state.clauses):
+            clause = state.clauses[state.checked]
+            state.checked += 1
+            viable = self._viable(state, clause)
+            if viable is None:
+                continue
+            if not viable:
+                return clause
+            if len(viable) == 1:
+                self._select(state, viable[0])
+            else:
+                state.open.append(clause)
+        return None
+
+    def _next_open(self, state):
+        """
+        Returns the next open clause that is not satisfied yet and its
+        candidates, or None.
+        """
+        while state.head < len(state.open):
+            clause = state.open[state.head]
+            viable = self._viable(state, clause)
+            if viable is not None:
+                return (clause, viable)
+            state.head += 1
+        return None
+
+    def _decide(self, state, clause, viable):
+        """
+        Satisfies an open clause with its first candidate, recording a
+        decision if there are other candidates left. Returns the clause
+        if it can not be satisfied.
+        """
+        if not viable:
+            return clause
+        if len(viable) > 1:
+            # The remaining candidates are only checked once the state
+            # is restored to this decision, when they are tried.
+            (_, packages) = self._clause_candidates(clause[1])
+            remaining = islice(self._iter_viable(state, packages), 1, None)
+            state.decisions.append(_Decision(state, remaining))
+        state.head += 1
+        self._select(state, viable[0])
+        return None
+
+    def _backtrack(self, state, conflict):
+        """
+        Restores the state of the last decision that has candidates
+        left and selects its next candidate.
+        """
+        while state.decisions:
+            decision = state.decisions[-1]
+            while len(state.trail) > decision.trail:
+                self._unselect(state)
+            del state.clauses[decision.clauses :]
+            del state.open[decision.open :]
+            state.checked = decision.checked
+            state.head = decision.head + 1
+
+            for package in decision.candidates:
+                self._select(state, package)
+                return
+            state.decisions.pop()
+
+        (owner, dependency) = conflict
+        if owner is None:
+            raise ResolutionError(f"Unable to satisfy {dependency}")
+        raise ResolutionError(
+            f"Unable to satisfy {dependency} of {owner.name} {owner.version}"
+        )
+
+    def _selected(self, state, dependency):
+        (_, packages) = self._clause_candidates(dependency)
+        for package in packages:
+            if state.selected.get(package.name) is package:
+                return package
+        return None
+
+    def _order(self, state, roots):
+        """
+        Orders the selected packages, every package comes after its
+        (pre-)dependencies, like the packages gathered by the Resolver.
+        """
+        visited = set()
+        to_install = OrderedDict()
+
+        def dependencies(package):
+            for dependency in chain(package.pre_dependencies, package.dependencies):
+                yield self._selected(state, dependency)
+
+        for root in roots:
+            package = self._selected(state, root)
+            if package is None or package.name in visited:
+                continue
+            visited.add(package.name)
+
+            stack = [(package, dependencies(package))]
+            while stack:
+                (package, candidates) = stack[-1]
+                for dependency in candidates:
+                    if dependency is not None and dependency.name not in visited:
+                        visited.add(dependency.name)
+                        stack.append((dependency, dependencies(dependency)))
+                        break
+                else:
+                    stack.pop()
+                    to_install[package.name] = package
+
+        return to_install
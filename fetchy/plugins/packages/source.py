@@ -1,14 +1,51 @@
-import os
-import urllib
 import gzip
-import shutil
-import hashlib
-
-from fetchy.utils import get_cache_dir
-
-from .mirror import PersonalPackageArchiveMirror, UbuntuMirror, DebianMirror
-from pathlib import Path
-from tqdm import tqdm
+import lzma
+import urllib.error
+import urllib.request
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .mirror import (
+    PersonalPackageArchiveMirror,
+    UbuntuMirror,
+    DebianMirror,
+    is_missing_file,
+)
+
+
+# Compressions mirrors may serve package indices in, ordered by preference.
+COMPRESSIONS = [
+    (".xz", lambda fileobj: lzma.LZMAFile(fileobj, "rb")),
+    (".gz", lambda fileobj: gzip.GzipFile(fileobj=fileobj, mode="rb")),
+]
+
+
+@contextmanager
+def open_package_index(url):
+    """
+    Open a remote (or `file://`) package index and decompress it while it
+    is being read.
+
+    The compressed variants of the index are tried in order of preference,
+    the first one the mirror serves is used. Nothing is written to disk.
+
+    Parameters
+    ----------
+    url : the url of the package index without a compression extension,
+        for example `.../binary-amd64/Packages`.
+    """
+    for (extension, decompressor) in COMPRESSIONS:
+        try:
+            response = urllib.request.urlopen(url + extension)
+        except urllib.error.URLError as e:
+            if is_missing_file(e):
+                continue
+            raise
+        with response, decompressor(response) as stream:
+            yield stream
+        return
+    raise FileNotFoundError(f"No package index could be found at {url}")
 
 
 class Source(object):
@@ -22,47 +59,19 @@ class Source(object):
     def collect_package_indices(self):
         raise NotImplementedError()
 
-    def _download_files(self):
-        if not os.path.exists(self._get_sources_dir()):
-            os.makedirs(self._get_sources_dir())
-
-        package_index_files = self.collect_package_indices()
-        package_file_path = self._get_file_name()
-
-        with tqdm(
-            total=len(package_index_files), desc="Downloading archive indices"
-        ) as t:
-            with open(package_file_path, "wb") as package_file:
-                for package_index_url in package_index_files:
-                    (package_index_file, _) = urllib.request.urlretrieve(
-                        package_index_url
-                    )
-                    with gzip.open(package_index_file) as package_index_data:
-                        shutil.copyfileobj(package_index_data, package_file)
-                        t.update(1)
-
-    def _get_sources_dir(self):
-        return get_cache_dir()
-
-    def _create_hash(self):
+    def collect_releases(self):
         """
-        Creates a hash based on the configuration of this Source.
-        
-        The hash should uniquely identify a source configuration,
-        without having to store a massive string.
+        Collects the Release files of this Source, mapping the url of every
+        Release file to a list of `(index_url, path)` tuples for the package
+        indices it describes, where `path` is relative to the suite.
         """
-        sha = hashlib.sha256()
-        for index in self.collect_package_indices():
-            sha.update(index.encode())
-        return sha.hexdigest()[:32]
-
-    def _get_file_name(self):
-        return os.path.join(self._get_sources_dir(), str(self._create_hash()))
+        raise NotImplementedError()
 
-    def get_index_file(self):
-        if not os.path.isfile(self._get_file_name()):
-            self._download_files()
-        return self._get_file_name()
+    def select_mirrors(self, selector, refresh=False):
+        """
+        Ranks the mirrors of this Source with a MirrorSelector.
+        """
+        pass
 
 
 class DebianBasedSource(Source):
@@ -87,23 +96,43 @@ class DebianBasedSource(Source):
         self.repositories = repositories
         self.updates = updates
 
+    def _suites_and_repositories(self):
+        for repository in self.repositories:
+            yield (self.codename, repository)
+            for update in self.updates:
+                yield (f"{self.codename}-{update}", repository)
+
     def collect_package_indices(self):
         """
         Collects a list of urls that point to package indices which must be
         downloaded to represent this Source object.
+
+        The urls do not include a compression extension, see `open_package_index`.
         """
+        return [
+            index_url
+            for (_, index_url, _) in self._collect_package_index_entries()
+        ]
+
+    def collect_releases(self):
+        releases = OrderedDict()
+        for (release_url, index_url, path) in self._collect_package_index_entries():
+            releases.setdefault(release_url, []).append((index_url, path))
+        return releases
+
+    def select_mirrors(self, selector, refresh=False):
+        selector.select(self.mirror, f"dists/{self.codename}/Release", refresh)
+
+    def _collect_package_index_entries(self):
         mirror_url = self.mirror.url()
 
-        urls = []
-        for repository in self.repositories:
-            urls.append(
-                f"{mirror_url}dists/{self.codename}/{repository}/binary-{self.architecture}/Packages.gz"
+        for (suite, repository) in self._suites_and_repositories():
+            path = f"{repository}/binary-{self.architecture}/Packages"
+            yield (
+                f"{mirror_url}dists/{suite}/Release",
+                f"{mirror_url}dists/{suite}/{path}",
+                path,
             )
-            for update in self.updates:
-                urls.append(
-                    f"{mirror_url}dists/{self.codename}-{update}/{repository}/binary-{self.architecture}/Packages.gz"
-                )
-        return urls
 
 
 class PersonalPackageArchiveSource(DebianBasedSource):
@@ -114,16 +143,20 @@ class PersonalPackageArchiveSource(DebianBasedSource):
 
 
 class DefaultDebianSource(DebianBasedSource):
-    def __init__(self, codename, architecture):
+    def __init__(self, codename, architecture, mirrors=None):
         super(DefaultDebianSource, self).__init__(
-            DebianMirror(), codename, architecture, ["main"], ["updates"]
+            DebianMirror(mirrors=mirrors),
+            codename,
+            architecture,
+            ["main"],
+            ["updates"],
         )
 
 
 class DefaultUbuntuSource(DebianBasedSource):
-    def __init__(self, codename, architecture):
+    def __init__(self, codename, architecture, mirrors=None):
         super(DefaultUbuntuSource, self).__init__(
-            UbuntuMirror(),
+            UbuntuMirror(mirrors=mirrors),
             codename,
             architecture,
             ["main", "universe"],
@@ -0,0 +1,133 @@
+import os
+import errno
+import shutil
+import logging
+
+from pathlib import Path
+from fetchy.cache import get_cache_manager
+from fetchy.utils import get_cache_dir
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ioctl request cloning a file (a reflink) on Linux, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+
+def _reflink(source, target):
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, "Reflinks are not supported")
+    with open(source, "rb") as source_file:
+        with open(target, "wb") as target_file:
+            fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+
+
+def materialize(source, target):
+    """Function for materializing a file at another path
+
+    The file is hardlinked if possible, otherwise it is reflinked
+    (a copy-on-write clone) if the file system supports it and only
+    then its contents are copied.
+
+    Parameters
+    ----------
+    source : the path of the file to materialize.
+
+    target : the path to materialize the file at, an existing file
+        at this path is replaced.
+    """
+    if os.path.lexists(target):
+        os.unlink(target)
+
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+
+    try:
+        _reflink(source, target)
+        return "reflink"
+    except OSError:
+        if os.path.lexists(target):
+            os.unlink(target)
+
+    shutil.copyfile(source, target)
+    return "copy"
+
+
+class PackageStore(object):
+    def __init__(self, directory=None):
+        """
+        A PackageStore is a content-addressed cache of debian package
+        files, keyed by the SHA256 digest listed in the package index.
+
+        Packages are only added after their digest has been verified,
+        and are made read-only as they are shared through hardlinks.
+        Packages that are looked up are pinned in the cache, so they
+        are not evicted while they are in use.
+
+        Parameters
+        ----------
+        directory : the directory of the store, by default the `debs`
+            directory in the cache directory.
+        """
+        if directory is None:
+            directory = Path(get_cache_dir(), "debs")
+        self.directory = Path(directory)
+
+    def path(self, sha256):
+        """
+        Returns the path of the package with the given digest.
+        """
+        return Path(self.directory, sha256[:2], f"{sha256}.deb")
+
+    def partial_path(self, sha256):
+        """
+        Returns the path to download the package with the given digest
+        to, before it is added to this store. Partial downloads are kept
+        across runs, so they can be resumed, and are locked while they
+        are downloaded, so concurrent builds never write to them at once.
+        """
+        path = Path(self.directory, "partial", f"{sha256}.part")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return get_cache_manager().pin(path)
+
+    def add(self, path, sha256):
+        """
+        Moves a verified package file into this store, a file that has
+        been downloaded into place is only made read-only.
+        """
+        target = self.path(sha256)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(path, 0o444)
+        if Path(path) != target:
+            os.replace(path, target)
+        return get_cache_manager().pin(target)
+
+    def copy(self, path, sha256):
+        """
+        Copies a verified package file into this store, reflinking it if
+        possible. The file itself is left untouched.
+        """
+        partial = self.partial_path(sha256)
+        try:
+            _reflink(path, partial)
+        except OSError:
+            shutil.copyfile(path, partial)
+        return self.add(partial, sha256)
+
+    def materialize(self, sha256, target):
+        """
+        Materializes the package with the given digest at `target`.
+        """
+        method = materialize(self.path(sha256), target)
+        logger.debug(f"Materialized {sha256} at {target} ({method})")
+
+    def __contains__(self, sha256):
+        return get_cache_manager().pin(self.path(sha256)).exists()
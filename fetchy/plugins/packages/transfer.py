@@ -0,0 +1,545 @@
+import os
+import time
+import hashlib
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+
+try:
+    import fcntl
+except ImportError:
+    # Without file locks, concurrent downloads of the same partial file
+    # are not serialized
+    fcntl = None
+
+DEFAULT_CONCURRENCY = 8
+
+CHUNK_SIZE = 64 * 1024
+
+REDIRECTS = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+# Failed downloads are retried RETRIES times, waiting BACKOFF seconds
+# before the first retry and twice as long before every next retry
+RETRIES = 5
+BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+
+class OfflineError(RuntimeError):
+    pass
+
+
+class FileResponse(object):
+    def __init__(self, path, offset=0):
+        """
+        A FileResponse mimics the HTTP response for a local file, so
+        files of `file://` mirrors are downloaded like any other file.
+
+        Parameters
+        ----------
+        path : the path of the file.
+
+        offset : the offset to start reading at, the response is a
+            partial response (206) if the offset is not 0.
+        """
+        self._file = open(path, "rb")
+        self._file.seek(offset)
+        self.status = 206 if offset else 200
+        self._length = os.fstat(self._file.fileno()).st_size - offset
+
+    def getheader(self, name, default=None):
+        if name.lower() == "content-length":
+            return str(self._length)
+        return default
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+
+class ConnectionPool(object):
+    def __init__(self, timeout=60, offline=False):
+        """
+        A ConnectionPool keeps HTTP(S) connections alive per mirror host,
+        so consecutive requests to the same host reuse a connection
+        instead of opening a new one every time.
+
+        Connections are safe to use from multiple threads, every
+        connection is handed out to a single thread at a time.
+
+        Proxies configured in the environment (`http_proxy`,
+        `https_proxy` and `no_proxy`) are honoured, `file://` urls are
+        read from disk.
+
+        Parameters
+        ----------
+        timeout : the timeout in seconds for connecting and reading.
+
+        offline : if True, an OfflineError is raised for every url that
+            is not a `file://` url instead of making a request.
+        """
+        self.timeout = timeout
+        self.offline = offline
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, scheme, netloc):
+        """
+        Opens a new connection, returns the connection and whether
+        requests should use the absolute url (for plain http proxies),
+        connections are kept in the pool as such a tuple.
+        """
+        proxy = urllib.request.getproxies().get(scheme)
+        if proxy and urllib.request.proxy_bypass(netloc.split(":")[0]):
+            proxy = None
+
+        if proxy is None:
+            if scheme == "https":
+                connection = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            return (connection, False)
+
+        proxy = urllib.parse.urlsplit(proxy)
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(
+                proxy.netloc, timeout=self.timeout
+            )
+            connection.set_tunnel(netloc)
+            return (connection, False)
+        return (http.client.HTTPConnection(proxy.netloc, timeout=self.timeout), True)
+
+    def _acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return (idle.pop(), True)
+        return (self._connect(*key), False)
+
+    def _release(self, key, connection):
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+    def _request(self, url, headers):
+        """
+        Sends a GET request, retrying once on a fresh connection if a
+        kept-alive connection turns out to be closed by the server.
+        """
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported url {url}")
+
+        key = (parts.scheme, parts.netloc)
+        target = urllib.parse.urlunsplit(("", "", parts.path, parts.query, ""))
+        while True:
+            (connection, reused) = self._acquire(key)
+            (http_connection, absolute) = connection
+            try:
+                http_connection.request(
+                    "GET", url if absolute else target or "/", headers=headers
+                )
+                return (key, connection, http_connection.getresponse())
+            except (http.client.HTTPException, OSError):
+                http_connection.close()
+                if not reused:
+                    raise
+
+    @contextmanager
+    def open(self, url, headers=None):
+        """
+        Opens a url, following redirects. The connection is returned
+        to the pool once the response has been read completely.
+
+        Raises an urllib.error.HTTPError for unsuccessful responses.
+
+        Parameters
+        ----------
+        url : the url to open.
+
+        headers : a dictionary of additional request headers.
+        """
+        headers = dict(headers or {})
+        if urllib.parse.urlsplit(url).scheme == "file":
+            with self._open_file(url, headers) as response:
+                yield response
+            return
+        if self.offline:
+            raise OfflineError(f"Unable to download {url} while offline")
+
+        for _ in range(MAX_REDIRECTS + 1):
+            (key, connection, response) = self._request(url, headers)
+            if response.status in REDIRECTS or response.status >= 400:
+                response.read()
+                self._done(key, connection, response)
+                if response.status in REDIRECTS:
+                    url = urllib.parse.urljoin(url, response.getheader("Location"))
+                    continue
+                raise urllib.error.HTTPError(
+                    url, response.status, response.reason, response.headers, None
+                )
+
+            try:
+                yield response
+            except BaseException:
+                connection[0].close()
+                raise
+            self._done(key, connection, response)
+            return
+
+        raise urllib.error.HTTPError(
+            url, response.status, "Too many redirects", response.headers, None
+        )
+
+    @contextmanager
+    def _open_file(self, url, headers):
+        path = urllib.request.url2pathname(urllib.parse.urlsplit(url).path)
+        if not os.path.isfile(path):
+            raise urllib.error.HTTPError(url, 404, "Not Found", {}, None)
+
+        offset = 0
+        ranges = headers.get("Range")
+        if ranges is not None:
+            offset = int(ranges[len("bytes=") :].split("-")[0])
+            if offset >= os.path.getsize(path):
+                raise urllib.error.HTTPError(
+                    url, 416, "Range Not Satisfiable", {}, None
+                )
+
+        response = FileResponse(path, offset)
+        try:
+            yield response
+        finally:
+            response.close()
+
+    def _done(self, key, connection, response):
+        if response.isclosed() and not response.will_close:
+            self._release(key, connection)
+        else:
+            connection[0].close()
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for (connection, _) in connections:
+                    connection.close()
+            self._idle.clear()
+
+
+class ChecksumError(RuntimeError):
+    pass
+
+
+class Download(object):
+    __slots__ = ("url", "path", "sha256", "size", "partial", "mirrors")
+
+    def __init__(self, url, path, sha256=None, size=None, partial=None, mirrors=()):
+        """
+        A Download describes a single file to download.
+
+        Parameters
+        ----------
+        url : the url to download the file from.
+
+        path : the path to download the file to.
+
+        sha256 : the expected SHA256 digest of the file, if given the
+            digest of the downloaded file is verified.
+
+        size : the expected size of the file in bytes, used to show
+            progress before the download has started.
+
+        partial : the path the file is downloaded to until it is complete,
+            by default `path` with a `.part` suffix. A partially downloaded
+            file with a digest is kept if the download fails, so it can be
+            resumed later.
+
+        mirrors : the urls of the same file on other mirrors, which are
+            tried in order if downloading from `url` fails.
+        """
+        self.url = url
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.partial = partial or f"{path}.part"
+        self.mirrors = mirrors
+
+
+class Progress(object):
+    def __init__(self, progress):
+        """
+        A thread safe wrapper of a tqdm progress bar counting bytes,
+        the total grows as the sizes of downloads become known.
+        """
+        self._progress = progress
+        self._lock = threading.Lock()
+
+    def expect(self, size):
+        with self._lock:
+            self._progress.total = (self._progress.total or 0) + size
+            self._progress.refresh()
+
+    def update(self, size):
+        with self._lock:
+            self._progress.update(size)
+
+
+def _retryable(error):
+    return error.code >= 500 or error.code == 429
+
+
+def _hash_file(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha
+
+
+def _restart(download, progress):
+    """
+    Discards a partially downloaded file, its bytes are downloaded again.
+    """
+    progress.expect(os.path.getsize(download.partial))
+    open(download.partial, "wb").close()
+
+
+def _transfer(pool, url, download, progress, expected):
+    """
+    Downloads the remainder of a partially downloaded file, or the whole
+    file if nothing has been downloaded yet or the server does not
+    support ranges. Returns the digest of the complete file and whether
+    the download was resumed.
+    """
+    offset = os.path.getsize(download.partial)
+    headers = {"Range": f"bytes={offset}-"} if offset else None
+    with pool.open(url, headers) as response:
+        resumed = offset > 0 and response.status == 206
+        if resumed:
+            sha = _hash_file(download.partial)
+        else:
+            if offset:
+                _restart(download, progress)
+            (offset, sha) = (0, hashlib.sha256())
+
+        length = response.getheader("Content-Length")
+        length = int(length) if length is not None else None
+        if not expected:
+            if length is not None:
+                progress.expect(offset + length)
+            expected.append(True)
+
+        received = 0
+        with open(download.partial, "ab") as target:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                target.write(chunk)
+                sha.update(chunk)
+                received += len(chunk)
+                progress.update(len(chunk))
+
+        # Reading a response in chunks ends silently if the connection
+        # is closed early
+        if length is not None and received < length:
+            raise http.client.IncompleteRead(b"", length - received)
+    return (sha, resumed)
+
+
+def _downloaded(download):
+    """
+    Returns whether a file has already been downloaded to its path.
+    """
+    if download.sha256 is None or not os.path.exists(download.path):
+        return False
+    return _hash_file(download.path).hexdigest() == download.sha256
+
+
+def _lock_partial(download):
+    """
+    Opens the partial file of a download and holds an exclusive lock on
+    it, waiting for other processes downloading the same file. Returns
+    None if another process downloaded the file while waiting.
+    """
+    waited = False
+    while True:
+        partial = open(download.partial, "ab")
+        if fcntl is None:
+            return partial
+        try:
+            fcntl.flock(partial, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fcntl.flock(partial, fcntl.LOCK_EX)
+            waited = True
+        try:
+            current = os.stat(download.partial)
+        except FileNotFoundError:
+            current = None
+        if current is None or not os.path.samestat(
+            os.fstat(partial.fileno()), current
+        ):
+            # The partial file was moved into place or removed by the
+            # process holding the lock, lock the current partial file
+            partial.close()
+            waited = True
+            continue
+        if waited and _downloaded(download):
+            os.unlink(download.partial)
+            partial.close()
+            return None
+        return partial
+
+
+def download_file(pool, download, progress):
+    """Function for downloading a single file
+
+    The file is streamed from its url into its partial path through a
+    connection of the pool and hashed along the way, and only moved to
+    its path once it has been downloaded completely and matches its
+    digest.
+
+    Interrupted downloads are resumed with a Range request, from the
+    next mirror if the download has mirrors, and are retried with
+    exponential backoff once every mirror failed. Partially downloaded
+    files with a digest are kept when a download fails, and are resumed
+    by the next download of the file, other partially downloaded files
+    are removed.
+
+    The partial file is locked for the whole download, so processes
+    downloading the same file wait for each other, and the file is not
+    downloaded again if it was downloaded in the meantime.
+    """
+    partial = _lock_partial(download)
+    if partial is None:
+        size = os.path.getsize(download.path)
+        if download.size is None:
+            progress.expect(size)
+        progress.update(size)
+        return
+    with partial:
+        _download(pool, download, progress)
+
+
+def _download(pool, download, progress):
+    if download.sha256 is None or not os.path.exists(download.partial):
+        open(download.partial, "wb").close()
+    else:
+        progress.update(os.path.getsize(download.partial))
+
+    expected = [] if download.size is None else [True]
+    urls = [download.url] + list(download.mirrors)
+    current = 0
+    attempt = 0
+    restarted = False
+    try:
+        while True:
+            url = urls[current]
+            try:
+                (sha, resumed) = _transfer(pool, url, download, progress, expected)
+            except urllib.error.HTTPError as e:
+                if e.code == 416 and not restarted:
+                    # The partial file is larger than the file, start over
+                    restarted = True
+                    _restart(download, progress)
+                    continue
+                if not _retryable(e):
+                    if len(urls) == 1:
+                        raise
+                    # This mirror does not serve the file, try the others
+                    del urls[current]
+                    current %= len(urls)
+                    continue
+                error = e
+            except (http.client.HTTPException, OSError) as e:
+                error = e
+            else:
+                if download.sha256 is None or sha.hexdigest() == download.sha256:
+                    break
+                if not resumed or restarted:
+                    os.unlink(download.partial)
+                    raise ChecksumError(
+                        f"{url} has digest {sha.hexdigest()}, "
+                        f"expected {download.sha256}"
+                    )
+                # The partial file may have been downloaded from another
+                # version of the file, start over once
+                restarted = True
+                _restart(download, progress)
+                continue
+
+            # Fail over to the next mirror right away, and back off once
+            # every mirror failed
+            current = (current + 1) % len(urls)
+            if current == 0:
+                if attempt >= RETRIES:
+                    raise error
+                time.sleep(min(BACKOFF * 2 ** attempt, MAX_BACKOFF))
+                attempt += 1
+        os.replace(download.partial, download.path)
+    except BaseException:
+        if download.sha256 is None and os.path.exists(download.partial):
+            os.unlink(download.partial)
+        raise
+
+
+def download_files(
+    downloads, concurrency=None, pool=None, desc="Downloading", callback=None
+):
+    """Function for downloading files concurrently
+
+    Files are downloaded by a pool of threads, reusing kept-alive
+    connections per host, while a single progress bar shows the
+    progress of all downloads.
+
+    Parameters
+    ----------
+    downloads : a list of Download objects.
+
+    concurrency : the maximum number of concurrent downloads, by
+        default DEFAULT_CONCURRENCY.
+
+    pool : the ConnectionPool to use, a new pool is used and closed
+        afterwards if None.
+
+    desc : the description of the progress bar.
+
+    callback : a function called with every Download once it has
+        completed, from the calling thread.
+    """
+    if not downloads:
+        return
+
+    owned = pool is None
+    if owned:
+        pool = ConnectionPool()
+
+    workers = min(concurrency or DEFAULT_CONCURRENCY, len(downloads))
+    try:
+        with tqdm(
+            unit="B", unit_scale=True, unit_divisor=1024, miniters=1, desc=desc
+        ) as t:
+            progress = Progress(t)
+            progress.expect(sum(download.size or 0 for download in downloads))
+            with ThreadPoolExecutor(workers) as executor:
+                futures = {
+                    executor.submit(download_file, pool, download, progress): download
+                    for download in downloads
+                }
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                        if callback is not None:
+                            callback(futures[future])
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+    finally:
+        if owned:
+            pool.close()
@@ -1,3 +1,64 @@
+import sys
+
+from functools import lru_cache, total_ordering
+from string import ascii_letters, digits
+
+
+def _order(character):
+    """
+    The weight of a character in the non-digit part of a version,
+    a tilde sorts before anything, even the end of a part, letters
+    sort before all other characters.
+    """
+    if character == "~":
+        return -1
+    if character in ascii_letters:
+        return ord(character)
+    return ord(character) + 256
+
+
+@lru_cache(maxsize=65536)
+def _string_key(string):
+    """
+    Split a version string into alternating non-digit and digit parts,
+    non-digit parts become tuples of character weights terminated by
+    the weight of the end of the part (0), digit parts become integers.
+
+    The key ends with the weight of the end of a part, so a longer
+    string compares as dpkg would against a shorter one.
+
+    Upstream versions and revisions are shared by many packages,
+    so keys are cached and equal strings share a single key.
+    """
+    key = []
+    idx = 0
+    while idx < len(string):
+        start = idx
+        while idx < len(string) and string[idx] not in digits:
+            idx += 1
+        key.append(tuple(map(_order, string[start:idx])) + (0,))
+
+        start = idx
+        while idx < len(string) and string[idx] in digits:
+            idx += 1
+        key.append(int(string[start:idx] or 0))
+    key.append((0,))
+    return tuple(key)
+
+
+@lru_cache(maxsize=65536)
+def compare_versions(left, right):
+    """Function for comparing two version strings
+
+    Compares two versions the way `dpkg --compare-versions` does,
+    returning a negative number if `left` is earlier than `right`,
+    zero if both are equal and a positive number otherwise.
+    """
+    (left, right) = (version_from_string(left), version_from_string(right))
+    return (left.key > right.key) - (left.key < right.key)
+
+
+@lru_cache(maxsize=65536)
 def version_from_string(string):
     """Function for parsing a Version Object
 
@@ -5,7 +66,8 @@ def version_from_string(string):
     `[epoch:]upstream_version[-debian_revision]`.
 
     This function will attempt to parse such strings
-    into a Version Object.
+    into a Version Object. Versions are immutable, so
+    packages with the same version share one object.
     """
     left = string.find(":")
     if left == -1:
@@ -32,7 +94,10 @@ def version_from_string(string):
     return Version(upstream, debian, epoch)
 
 
+@total_ordering
 class Version(object):
+    __slots__ = ("upstream_version", "debian_revision", "epoch", "key")
+
     def __init__(self, upstream_version, debian_revision=None, epoch=None):
         """A Version Object
 
@@ -43,6 +108,10 @@ class Version(object):
         `[epoch:]upstream_version[-debian_revision]`.
 
         Both the epoch and debian version are optional.
+
+        Versions are immutable, the dpkg sort key of a version is
+        computed once, so comparing and sorting versions is a cheap
+        tuple comparison.
         """
         if debian_revision is None:
             debian_revision = "0"
@@ -50,8 +119,26 @@ class Version(object):
             epoch = 0
 
         self.upstream_version = upstream_version
-        self.debian_revision = debian_revision
+        self.debian_revision = sys.intern(debian_revision)
         self.epoch = epoch
+        self.key = (
+            epoch,
+            _string_key(upstream_version),
+            _string_key(self.debian_revision),
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key == other.key
+
+    def __lt__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key < other.key
+
+    def __hash__(self):
+        return hash(self.key)
 
     def __str__(self):
         return f"{self.epoch}:{self.upstream_version}-{self.debian_revision}"
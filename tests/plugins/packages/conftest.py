@@ -0,0 +1,281 @@
+import io
+import os
+import gzip
+import time
+import hashlib
+import tarfile
+import threading
+import socket
+import socketserver
+import pytest
+import unix_ar as arfile
+
+from fetchy.plugins.packages.package import package_from_dict
+from fetchy.plugins.packages.repository import Repository
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+
+class MirrorServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MirrorRequestHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def translate_path(self, path):
+        # Serve the directory of the mirror rather than the working directory
+        path = os.path.relpath(super().translate_path(path), os.getcwd())
+        return os.path.join(self.server.directory, path)
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.ranges.append(self.headers.get("Range"))
+        time.sleep(self.server.delay)
+
+        path = self.translate_path(self.path)
+        ranges = self.headers.get("Range")
+        if not os.path.isfile(path) or (ranges is None and not self.server.drops):
+            return super().do_GET()
+
+        with open(path, "rb") as source:
+            data = source.read()
+        start = 0
+        if ranges is not None and self.server.supports_ranges:
+            start = int(ranges[len("bytes=") :].split("-")[0])
+            if start >= len(data):
+                return self.send_error(416)
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+
+        if self.server.drops:
+            self.server.drops -= 1
+            self.wfile.write(data[start : start + self.server.drop_after])
+            self.close_connection = True
+            return
+        self.wfile.write(data[start:])
+
+
+class LocalMirror(object):
+    def __init__(self, directory):
+        """
+        A LocalMirror serves a directory over HTTP on localhost
+        and records the paths of the requests it receives and the
+        number of connections made to it.
+
+        Connections are kept alive, and every request can be delayed
+        by setting `delay` to simulate latency. Range requests are
+        supported unless `supports_ranges` is unset, and the next `drops`
+        responses are cut off after `drop_after` bytes by closing the
+        connection.
+        """
+        self.directory = directory
+        self.server = MirrorServer(("127.0.0.1", 0), MirrorRequestHandler)
+        self.server.directory = str(directory)
+        self.server.requests = []
+        self.server.ranges = []
+        self.server.connections = 0
+        self.server.delay = 0
+        self.server.supports_ranges = True
+        self.server.drops = 0
+        self.server.drop_after = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/"
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    @property
+    def connections(self):
+        return self.server.connections
+
+    @property
+    def ranges(self):
+        return self.server.ranges
+
+    @property
+    def delay(self):
+        return self.server.delay
+
+    @delay.setter
+    def delay(self, delay):
+        self.server.delay = delay
+
+    def drop(self, count, after):
+        """
+        Cuts off the next `count` responses after `after` bytes.
+        """
+        self.server.drops = count
+        self.server.drop_after = after
+
+    def index_requests(self):
+        """
+        Returns and clears the requests made for package indices.
+        """
+        requests = [path for path in self.requests if "Packages" in path]
+        self.requests.clear()
+        return requests
+
+    def publish(self, suite, components, mtime=1500000000):
+        """
+        Publish a suite with gzipped package indices and a Release file.
+
+        Parameters
+        ----------
+        suite : the name of the suite, for example `bionic-updates`.
+
+        components : a dictionary mapping components to a list of
+            `(name, version)` tuples, or to a list of stanzas.
+
+        mtime : the modification time of the Release file, publish again
+            with a later time to let If-Modified-Since observe the change.
+        """
+        sha256 = []
+        for (component, packages) in components.items():
+            data = "".join(
+                f"Package: {package[0]}\nVersion: {package[1]}\nArchitecture: all\n\n"
+                if isinstance(package, tuple)
+                else package + "\n\n"
+                for package in packages
+            ).encode()
+            path = f"{component}/binary-amd64/Packages"
+            index = self.directory / "dists" / suite / f"{path}.gz"
+            index.parent.mkdir(parents=True, exist_ok=True)
+            index.write_bytes(gzip.compress(data))
+            sha256.append(f" {hashlib.sha256(data).hexdigest()} {len(data)} {path}")
+
+        release = self.directory / "dists" / suite / "Release"
+        release.write_text(f"Suite: {suite}\nSHA256:\n" + "\n".join(sha256) + "\n")
+        os.utime(release, (mtime, mtime))
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def unreachable_url():
+    """
+    Returns the url of a port on localhost nothing listens on.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/"
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache" / "fetchy"
+
+
+@pytest.fixture
+def local_mirror(tmp_path):
+    directory = tmp_path / "mirror"
+    directory.mkdir()
+    with LocalMirror(directory) as mirror:
+        yield mirror
+
+
+@pytest.fixture
+def local_mirrors(tmp_path):
+    """
+    Returns a function starting another LocalMirror, the mirrors are
+    stopped afterwards.
+    """
+    mirrors = []
+
+    def start():
+        directory = tmp_path / f"mirror{len(mirrors)}"
+        directory.mkdir()
+        mirror = LocalMirror(directory).__enter__()
+        mirrors.append(mirror)
+        return mirror
+
+    yield start
+    for mirror in mirrors:
+        mirror.__exit__(None, None, None)
+
+
+def _tar(files):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as tar:
+        for (name, content) in files.items():
+            info = tarfile.TarInfo(name)
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                tar.addfile(info)
+            else:
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+    return data.getvalue()
+
+
+@pytest.fixture
+def build_deb():
+    """
+    Returns a function building a debian package in a directory, by
+    default the package holds a single script in `/usr/bin`.
+    """
+
+    def build(directory, name, version="1.0", arch="amd64", depends=None, files=None):
+        control = f"Package: {name}\nVersion: {version}\nArchitecture: {arch}\n"
+        if depends:
+            control += f"Depends: {depends}\n"
+        if files is None:
+            files = {f"./usr/bin/{name}": b"#!/bin/sh\n"}
+        members = {
+            "debian-binary": b"2.0\n",
+            "control.tar.gz": _tar({"./control": control.encode()}),
+            "data.tar.gz": _tar(files),
+        }
+        path = directory / f"{name}_{version}_{arch}.deb"
+        package_file = arfile.open(str(path), "w")
+        for (member, content) in members.items():
+            (directory / member).write_bytes(content)
+            package_file.add(str(directory / member), arcname=member)
+            (directory / member).unlink()
+        package_file.close()
+        return path
+
+    return build
+
+
+@pytest.fixture
+def make_repository():
+    """
+    Returns a function creating a Repository of packages from stanzas,
+    packages are version 1 for amd64 unless given otherwise.
+    """
+
+    def make(*stanzas):
+        repository = Repository()
+        for stanza in stanzas:
+            stanza = dict({"Version": "1", "Architecture": "amd64"}, **stanza)
+            repository.add(
+                package_from_dict(stanza, "http://archive.ubuntu.com/ubuntu/")
+            )
+        return repository
+
+    return make
@@ -0,0 +1,141 @@
+import io
+import tarfile
+import pytest
+
+from fetchy.plugins.packages.debian import DebianFile, DpkgInstaller, TarWriter
+from fetchy.plugins.packages.downloader import Downloader
+from fetchy.plugins.packages.importer import PackageImporter
+from fetchy.plugins.packages.transfer import ConnectionPool
+
+
+@pytest.fixture
+def installer(cache_dir, tmp_path, build_deb):
+    archives = tmp_path / "archives"
+    archives.mkdir()
+    build_deb(archives, "libc", files={"./lib": None, "./lib/libc.so": b"libc"})
+    build_deb(archives, "sed", depends="libc")
+    build_deb(
+        archives,
+        "bash",
+        depends="libc, sed",
+        files={"./lib": None, "./bin/bash": b"bash", "./lib/libc.so": b"other"},
+    )
+    importer = PackageImporter()
+    importer.import_paths([archives])
+
+    downloader = Downloader(
+        importer.repository("amd64"),
+        str(tmp_path / "out"),
+        pool=ConnectionPool(offline=True),
+        offline=True,
+    )
+    installer = DpkgInstaller(downloader, workers=2)
+    installer.build_essential = ["bash"]
+    return installer
+
+
+def read_tar(path):
+    with tarfile.open(path) as tar:
+        return {
+            member.name: tar.extractfile(member).read() if member.isreg() else None
+            for member in tar
+        }
+
+
+def test_build_image_tar(installer, tmp_path):
+    path = tmp_path / "image.tar"
+
+    installer.create_image_tar(path)
+
+    members = read_tar(path)
+    assert members["./lib/libc.so"] == b"libc"
+    assert members["./bin/bash"] == b"bash"
+    assert members["./var/lib/dpkg/info/sed.list"] == b"/usr/bin/sed\n"
+    bash_list = members["./var/lib/dpkg/info/bash.list"]
+    assert bash_list == b"/lib\n/bin/bash\n/lib/libc.so\n"
+    assert b"Package: sed" in members["./var/lib/dpkg/info/sed.control"]
+    packages = [
+        line
+        for line in members["./var/lib/dpkg/status"].decode().splitlines()
+        if line.startswith("Package: ")
+    ]
+    assert packages == ["Package: libc", "Package: sed", "Package: bash"]
+
+
+def test_tar_writer_skips_written_paths():
+    with tarfile.open(fileobj=io.BytesIO(), mode="w") as tar:
+        writer = TarWriter(tar)
+
+        assert writer.add(tarfile.TarInfo("./a"), package="x")
+        assert not writer.add(tarfile.TarInfo("./a"), package="y")
+        assert writer.add(tarfile.TarInfo("./b"), package="y")
+
+        assert tar.getnames() == ["./a", "./b"]
+        assert writer.files == {"x": ["/a"], "y": ["/a", "/b"]}
+
+
+def test_build_image_tar_is_deterministic(installer, tmp_path):
+    installer._gather_dependencies()
+    names = []
+    for workers in (1, 4):
+        installer.workers = workers
+        installer._build_image_tar(tmp_path / f"{workers}.tar")
+        with tarfile.open(tmp_path / f"{workers}.tar") as tar:
+            names.append(tar.getnames())
+
+    assert names[0] == names[1]
+
+
+def test_build_image_tar_fails_if_unpacking_fails(installer, tmp_path, monkeypatch):
+    def unpack_into_fragment(self, fragment):
+        raise ValueError(f"Unable to unpack {self.package.name}")
+
+    monkeypatch.setattr(DebianFile, "unpack_into_fragment", unpack_into_fragment)
+
+    with pytest.raises(ValueError, match="Unable to unpack"):
+        installer.create_image_tar(tmp_path / "image.tar")
+
+
+def test_cached_builder_is_not_downloaded(installer, tmp_path, monkeypatch):
+    installer.create_image_tar(tmp_path / "first.tar")
+
+    def download_dependencies(*args, **kwargs):
+        raise AssertionError("downloaded a cached builder")
+
+    monkeypatch.setattr(
+        installer.downloader, "download_dependencies", download_dependencies
+    )
+    installer.create_image_tar(tmp_path / "second.tar")
+
+    assert (tmp_path / "second.tar").read_bytes() == (
+        tmp_path / "first.tar"
+    ).read_bytes()
+
+
+def test_builder_is_assembled_from_cached_fragments(
+    installer, cache_dir, tmp_path, monkeypatch
+):
+    installer.create_image_tar(tmp_path / "first.tar")
+    fragments = sorted((cache_dir / "fragments").glob("*/*.tar"))
+    assert len(fragments) == 3
+
+    # A new version of libc changes the builder, only libc is converted
+    libc = installer.packages["libc"]
+    libc_fragment = cache_dir / "fragments" / libc.sha256[:2] / f"{libc.sha256}.tar"
+    libc_fragment.unlink()
+    for builder in (cache_dir / "builder").iterdir():
+        builder.unlink()
+
+    download_dependencies = installer.downloader.download_dependencies
+    downloaded = []
+
+    def record(packages, callback=None):
+        downloaded.extend(packages)
+        return download_dependencies(packages, callback)
+
+    monkeypatch.setattr(installer.downloader, "download_dependencies", record)
+    installer.create_image_tar(tmp_path / "second.tar")
+
+    assert downloaded == ["libc"]
+    assert libc_fragment.exists()
+    assert read_tar(tmp_path / "second.tar") == read_tar(tmp_path / "first.tar")
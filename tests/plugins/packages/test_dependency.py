@@ -1,6 +1,7 @@
 import pytest
 
 from fetchy.plugins.packages.dependency import relationship_from_string, dependency_from_string, EitherDependency
+from fetchy.plugins.packages.version import version_from_string
 
 
 @pytest.mark.parametrize(
@@ -46,3 +47,38 @@ def test_dependency_either(input, names):
     assert isinstance(result, EitherDependency)
     assert result.dependencies[0].name in names
     assert result.dependencies[1].name in names
+
+
+@pytest.mark.parametrize(
+    "input,architecture,applies",
+    [
+        ("python3", "amd64", True),
+        ("python3 [amd64]", "amd64", True),
+        ("python3 [i386 armhf]", "amd64", False),
+        ("python3 [!amd64]", "amd64", False),
+        ("python3 [!i386 !armhf]", "amd64", True),
+        ("python3 [linux-any]", "amd64", True),
+        ("python3 [i386]", None, True),
+    ],
+)
+def test_dependency_applies_to(input, architecture, applies):
+    result = dependency_from_string("", input)
+
+    assert result.applies_to(architecture) == applies
+
+
+@pytest.mark.parametrize(
+    "relationship,version,satisfied",
+    [
+        ("(>= 3.6)", "3.6", True),
+        ("(>= 3.6)", "3.6~rc1", False),
+        ("(>> 3.6)", "3.6", False),
+        ("(<< 3.6)", "3.5", True),
+        ("(<= 3.6)", "3.6-1", False),
+        ("(= 1:3.6)", "1:3.6", True),
+    ],
+)
+def test_relationship_satisfied_by(relationship, version, satisfied):
+    result = relationship_from_string(relationship)
+
+    assert result.satisfied_by(version_from_string(version)) == satisfied
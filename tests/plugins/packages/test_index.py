@@ -0,0 +1,67 @@
+from fetchy.plugins.packages.index import PackageIndex, write_index
+from fetchy.plugins.packages.repository import Repository
+
+
+STANZAS = [
+    {"Package": "python3", "Version": "3.6.7-1", "Architecture": "amd64"},
+    {"Package": "dash", "Version": "0.5.8-2", "Architecture": "amd64"},
+    {"Package": "awk", "Version": "1", "Architecture": "all", "Provides": ""},
+    {"Package": "dash", "Version": "0.5.9-1", "Architecture": "amd64"},
+]
+
+
+def _index(tmp_path):
+    path = tmp_path / "packages.idx"
+    write_index(path, STANZAS, "http://archive.ubuntu.com/ubuntu/")
+    return PackageIndex(path)
+
+
+def test_index_lookup(tmp_path):
+    index = _index(tmp_path)
+
+    assert len(index) == 3
+    assert list(index.names()) == ["awk", "dash", "python3"]
+    assert index.origin == "http://archive.ubuntu.com/ubuntu/"
+    assert index.stanzas("awk") == [STANZAS[2]]
+    assert index.stanzas("dash") == [STANZAS[1], STANZAS[3]]
+    assert "python3" in index
+    assert "python" not in index
+    assert index.stanzas("zsh") == []
+
+
+def test_repository_decodes_lazily(tmp_path):
+    repository = Repository(indices=[_index(tmp_path)])
+
+    assert not repository.is_empty()
+    assert "dash" in repository
+    assert not repository.pkgs
+
+    assert repository["dash"].version.upstream_version == "0.5.9"
+    assert list(repository.pkgs) == ["dash"]
+    assert repository["python"] is None
+
+
+def test_repository_merge_keeps_indices(tmp_path):
+    repository = Repository()
+    repository.merge(Repository(indices=[_index(tmp_path)]))
+
+    assert repository["python3"].download_url().startswith("http://archive")
+
+
+def test_index_providers(tmp_path):
+    path = tmp_path / "packages.idx"
+    write_index(
+        path,
+        [
+            {"Package": "gawk", "Version": "1", "Provides": "awk"},
+            {"Package": "mawk", "Version": "1", "Provides": "awk (= 1.3)"},
+            {"Package": "postfix", "Version": "3", "Provides": "mail-transport-agent"},
+        ],
+        "http://archive.ubuntu.com/ubuntu/",
+    )
+    repository = Repository(indices=[PackageIndex(path)])
+
+    assert repository.providers("awk") == ["gawk", "mawk"]
+    assert repository.providers("mail-transport-agent") == ["postfix"]
+    assert repository.providers("gawk") == []
+    assert "awk" not in repository
@@ -0,0 +1,164 @@
+import os
+import gzip
+import hashlib
+import pytest
+
+from fetchy.cache import get_cache_manager
+from fetchy.plugins.packages.downloader import Downloader
+from fetchy.plugins.packages.importer import PackageImporter, read_control
+from fetchy.plugins.packages.mirror import DirectMirror
+from fetchy.plugins.packages.parser import Parser, parse_sources
+from fetchy.plugins.packages.source import DebianBasedSource
+from fetchy.plugins.packages.transfer import ConnectionPool, OfflineError
+
+
+def test_directory_mirror(cache_dir, tmp_path, build_deb):
+    mirror = tmp_path / "mirror"
+    pool = mirror / "pool" / "main"
+    pool.mkdir(parents=True)
+    deb = build_deb(pool, "hello")
+    data = deb.read_bytes()
+    stanza = (
+        f"Package: hello\nVersion: 1.0\nArchitecture: amd64\n"
+        f"Filename: pool/main/{deb.name}\nSize: {len(data)}\n"
+        f"SHA256: {hashlib.sha256(data).hexdigest()}"
+    )
+    index = mirror / "dists" / "bionic" / "main" / "binary-amd64" / "Packages.gz"
+    index.parent.mkdir(parents=True)
+    index.write_bytes(gzip.compress(stanza.encode()))
+
+    source = DebianBasedSource(
+        DirectMirror(str(mirror)), "bionic", "amd64", ["main"], []
+    )
+    repository = parse_sources([source], jobs=1, offline=True)
+    assert repository["hello"].download_url().startswith("file://")
+
+    out = tmp_path / "out"
+    Downloader(
+        repository, str(out), pool=ConnectionPool(offline=True), offline=True
+    ).download_packages(["hello"])
+
+    assert (out / deb.name).read_bytes() == data
+
+
+def test_offline_skips_uncached_indices(cache_dir, caplog, unreachable_url):
+    source = DebianBasedSource(
+        DirectMirror(unreachable_url), "bionic", "amd64", ["main"], []
+    )
+
+    repository = parse_sources([source], jobs=1, offline=True)
+
+    assert repository.is_empty()
+    assert "offline" in caplog.text
+
+
+def test_offline_parser(cache_dir, unreachable_url):
+    source = DebianBasedSource(
+        DirectMirror(unreachable_url), "bionic", "amd64", ["main"], []
+    )
+
+    assert Parser(source, offline=True).parse().is_empty()
+
+
+def test_offline_downloader_fails_fast(cache_dir, local_mirror, tmp_path):
+    local_mirror.publish(
+        "bionic",
+        {"main": ["Package: a\nVersion: 1\nArchitecture: all\nFilename: pool/a.deb"]},
+    )
+    source = DebianBasedSource(
+        DirectMirror(local_mirror.url), "bionic", "amd64", ["main"], []
+    )
+    repository = parse_sources([source], jobs=1)
+    local_mirror.requests.clear()
+
+    downloader = Downloader(repository, str(tmp_path / "out"), offline=True)
+    with pytest.raises(OfflineError, match="Unable to download a while offline"):
+        downloader.download_packages(["a"])
+    assert local_mirror.requests == []
+
+
+def test_offline_pool_refuses_network(tmp_path, unreachable_url):
+    with pytest.raises(OfflineError):
+        with ConnectionPool(offline=True).open(unreachable_url):
+            pass
+
+
+def test_read_control(tmp_path, build_deb):
+    deb = build_deb(tmp_path, "hello", depends="libc6")
+
+    control = read_control(deb)
+
+    assert control["Package"] == "hello"
+    assert control["Depends"] == "libc6"
+
+
+def test_import_packages(cache_dir, tmp_path, build_deb):
+    archives = tmp_path / "archives"
+    archives.mkdir()
+    build_deb(archives, "hello", depends="libfoo")
+    build_deb(archives, "libfoo", arch="all")
+    build_deb(archives, "other", arch="arm64")
+    (archives / "broken.deb").write_bytes(b"not a package")
+    mode = os.stat(archives / "hello_1.0_amd64.deb").st_mode
+
+    importer = PackageImporter()
+    assert importer.import_paths([archives]) == 3
+
+    repository = importer.repository("amd64")
+    assert "hello" in repository
+    assert "libfoo" in repository
+    assert "other" not in repository
+    assert os.stat(archives / "hello_1.0_amd64.deb").st_mode == mode
+
+    out = tmp_path / "out"
+    files = Downloader(
+        repository, str(out), pool=ConnectionPool(offline=True), offline=True
+    ).download_packages(["hello"])
+
+    assert [file.package.name for file in files] == ["libfoo", "hello"]
+    with open(files[1].deb_file, "rb") as package_file:
+        assert package_file.read() == (archives / "hello_1.0_amd64.deb").read_bytes()
+
+
+def test_offline_build_after_prune(cache_dir, local_mirror, tmp_path, build_deb):
+    deb = build_deb(local_mirror.directory, "hello")
+    data = deb.read_bytes()
+    sha256 = hashlib.sha256(data).hexdigest()
+    local_mirror.publish(
+        "bionic",
+        {
+            "main": [
+                f"Package: hello\nVersion: 1.0\nArchitecture: amd64\n"
+                f"Filename: {deb.name}\nSize: {len(data)}\nSHA256: {sha256}"
+            ]
+        },
+    )
+    source = DebianBasedSource(
+        DirectMirror(local_mirror.url), "bionic", "amd64", ["main"], []
+    )
+    parse_sources([source], jobs=1)
+    PackageImporter().import_paths([deb])
+
+    def build():
+        repository = parse_sources([source], jobs=1, offline=True)
+        repository.merge(PackageImporter().repository("amd64"))
+        return Downloader(
+            repository,
+            str(tmp_path / "out"),
+            pool=ConnectionPool(offline=True),
+            offline=True,
+        ).download_packages(["hello"])
+
+    assert [file.package.name for file in build()] == ["hello"]
+
+    # Evict the imported package, but not the cached index of the mirror
+    manager = get_cache_manager()
+    manager.release()
+    stored = next(cache_dir.glob(f"debs/*/{sha256}.deb"))
+    os.utime(stored, (1000, 1000))
+    manager.prune(sum(entry.size for entry in manager.entries()) - len(data))
+
+    assert not stored.exists()
+    assert (cache_dir / "imported" / "amd64.idx").exists()
+    with pytest.raises(OfflineError, match="Unable to download hello"):
+        build()
@@ -0,0 +1,42 @@
+from fetchy.plugins.packages.package import package_from_dict
+
+
+def test_dependencies_are_parsed_on_first_access():
+    package = package_from_dict(
+        {
+            "Package": "python3",
+            "Version": "3.6.7-1~18.04",
+            "Architecture": "amd64",
+            "Depends": "python3.6 (>= 3.6.7-1~), python3-minimal",
+            "Provides": "python3-profiler",
+        },
+        "http://archive.ubuntu.com/ubuntu/",
+    )
+
+    assert package._dependencies == "python3.6 (>= 3.6.7-1~), python3-minimal"
+
+    dependencies = package.dependencies
+
+    assert [str(dependency) for dependency in dependencies] == [
+        "python3.6 (>= 0:3.6.7-1~)",
+        "python3-minimal",
+    ]
+    assert package.dependencies is dependencies
+    assert package.pre_dependencies == []
+    assert package.provides == ["python3-profiler"]
+
+
+def test_versioned_provides():
+    package = package_from_dict(
+        {
+            "Package": "libjpeg-turbo8",
+            "Version": "1.5.2-0ubuntu5",
+            "Architecture": "amd64",
+            "Provides": "libjpeg8 (= 8c-2ubuntu8), libjpeg-dev",
+        },
+        "http://archive.ubuntu.com/ubuntu/",
+    )
+
+    assert package.provides == ["libjpeg8", "libjpeg-dev"]
+    assert package.provided_version("libjpeg8").upstream_version == "8c"
+    assert package.provided_version("libjpeg-dev") is None
@@ -0,0 +1,94 @@
+import io
+import pytest
+
+from fetchy.plugins.packages.mirror import DirectMirror
+from fetchy.plugins.packages.parser import Parser, iter_chunks, iter_stanzas, parse_sources
+from fetchy.plugins.packages.source import DebianBasedSource
+
+
+INDEX = b"""Package: python3
+Version: 3.6.7-1~18.04
+Depends: python3.6 (>= 3.6.7-1~),
+ libpython3-stdlib (= 3.6.7-1~18.04)
+Description: interactive high-level object-oriented language
+ Python, the high-level, interactive object oriented language,
+ .
+ includes an extensive class library.
+
+Package: dash
+Version: 0.5.8-2.10
+ 
+Package: awk
+Package-Type: udeb
+Version: 1
+"""
+
+
+def test_iter_stanzas_splits_on_blank_lines():
+    stanzas = list(iter_stanzas(io.BytesIO(INDEX), ["Package", "Version"]))
+
+    assert [stanza["Package"] for stanza in stanzas] == ["python3", "dash", "awk"]
+
+
+def test_iter_stanzas_handles_continuation_lines():
+    (python3, _, _) = iter_stanzas(io.BytesIO(INDEX), ["Package", "Depends"])
+
+    assert python3["Depends"] == (
+        "python3.6 (>= 3.6.7-1~),\nlibpython3-stdlib (= 3.6.7-1~18.04)"
+    )
+    assert "Description" not in python3
+
+
+@pytest.mark.parametrize("line_ending", [b"\n", b"\r\n"])
+def test_iter_stanzas_all_fields(line_ending):
+    index = INDEX.replace(b"\n", line_ending)
+    stanzas = list(iter_stanzas(io.BytesIO(index)))
+
+    assert stanzas[2] == {"Package": "awk", "Package-Type": "udeb", "Version": "1"}
+    assert stanzas[0]["Description"].endswith("includes an extensive class library.")
+
+
+def test_shards_are_shared_between_sources(cache_dir, local_mirror):
+    local_mirror.publish("bionic", {"main": [("dash", "1")], "universe": [("zsh", "1")]})
+    local_mirror.publish("bionic-updates", {"main": [("dash", "2")], "universe": []})
+    mirror = DirectMirror(local_mirror.url)
+
+    Parser(DebianBasedSource(mirror, "bionic", "amd64", ["main"], [])).parse()
+    assert len(local_mirror.index_requests()) == 2
+
+    repository = Parser(
+        DebianBasedSource(mirror, "bionic", "amd64", ["main", "universe"], ["updates"])
+    ).parse()
+
+    assert local_mirror.index_requests() == [
+        "/dists/bionic/universe/binary-amd64/Packages.xz",
+        "/dists/bionic/universe/binary-amd64/Packages.gz",
+        "/dists/bionic-updates/main/binary-amd64/Packages.xz",
+        "/dists/bionic-updates/main/binary-amd64/Packages.gz",
+        "/dists/bionic-updates/universe/binary-amd64/Packages.xz",
+        "/dists/bionic-updates/universe/binary-amd64/Packages.gz",
+    ]
+    assert len(repository.indices) == 4
+    assert str(repository["dash"].version) == "0:2-0"
+
+
+@pytest.mark.parametrize("size", [1, 16, 64, 1024])
+def test_iter_chunks_ends_on_stanza_boundaries(size):
+    chunks = list(iter_chunks(io.BytesIO(INDEX), size))
+
+    assert b"".join(chunks) == INDEX
+    stanzas = [stanza for chunk in chunks for stanza in iter_stanzas(io.BytesIO(chunk))]
+    assert stanzas == list(iter_stanzas(io.BytesIO(INDEX)))
+
+
+def test_parse_sources_in_parallel(cache_dir, local_mirror):
+    packages = [(f"package{i}", "1") for i in range(100)]
+    local_mirror.publish("bionic", {"main": packages[:50], "universe": packages[50:]})
+    source = DebianBasedSource(
+        DirectMirror(local_mirror.url), "bionic", "amd64", ["main", "universe"], []
+    )
+
+    repository = parse_sources([source], jobs=2)
+
+    assert all(name in repository for (name, _) in packages)
+    assert repository["package99"].download_url().startswith(local_mirror.url)
@@ -0,0 +1,64 @@
+import pytest
+
+from fetchy.plugins.packages.mirror import DirectMirror
+from fetchy.plugins.packages.parser import Parser
+from fetchy.plugins.packages.release import fetch_release, release_from_bytes
+from fetchy.plugins.packages.source import DebianBasedSource, open_package_index
+
+
+def test_release_from_bytes():
+    release = release_from_bytes(
+        b"Origin: Ubuntu\n"
+        b"MD5Sum:\n"
+        b" 0123 10 main/binary-amd64/Packages\n"
+        b"SHA256:\n"
+        b" abcd 10 main/binary-amd64/Packages\n"
+        b" ef01 5 main/binary-amd64/Packages.gz\n"
+        b" 2345 7 universe/binary-amd64/Packages.xz\n"
+    )
+
+    assert release.digest("main/binary-amd64/Packages") == "abcd"
+    assert release.digest("universe/binary-amd64/Packages") == "2345"
+    assert release.digest("restricted/binary-amd64/Packages") is None
+
+
+@pytest.mark.parametrize("mirror", ["http", "file"])
+def test_missing_files(mirror, local_mirror):
+    url = local_mirror.url if mirror == "http" else local_mirror.directory.as_uri()
+    url = url.rstrip("/") + "/dists/bionic/"
+
+    assert fetch_release(url + "Release") is None
+    with pytest.raises(FileNotFoundError, match="No package index"):
+        with open_package_index(url + "main/binary-amd64/Packages"):
+            pass
+
+
+def test_refresh_only_downloads_changed_components(cache_dir, local_mirror):
+    local_mirror.publish(
+        "bionic", {"main": [("dash", "1")], "universe": [("zsh", "1")]}, 1500000000
+    )
+    source = DebianBasedSource(
+        DirectMirror(local_mirror.url), "bionic", "amd64", ["main", "universe"], []
+    )
+
+    repository = Parser(source).parse()
+    assert str(repository["dash"].version) == "0:1-0"
+    assert len(local_mirror.index_requests()) == 4
+
+    Parser(source).parse()
+    assert local_mirror.requests == []
+
+    Parser(source).parse(refresh=True)
+    assert local_mirror.requests == ["/dists/bionic/Release"]
+    local_mirror.requests.clear()
+
+    local_mirror.publish(
+        "bionic", {"main": [("dash", "2")], "universe": [("zsh", "1")]}, 1600000000
+    )
+    repository = Parser(source).parse(refresh=True)
+
+    assert str(repository["dash"].version) == "0:2-0"
+    assert local_mirror.index_requests() == [
+        "/dists/bionic/main/binary-amd64/Packages.xz",
+        "/dists/bionic/main/binary-amd64/Packages.gz",
+    ]
@@ -0,0 +1,72 @@
+import pytest
+
+from fetchy.plugins.packages.dependency import relationship_from_string
+from fetchy.plugins.packages.index import PackageIndex, write_index
+from fetchy.plugins.packages.package import package_from_dict
+from fetchy.plugins.packages.repository import Repository
+
+
+def _package(name, version):
+    return package_from_dict(
+        {"Package": name, "Version": version, "Architecture": "amd64"},
+        "http://archive.ubuntu.com/ubuntu/",
+    )
+
+
+@pytest.fixture
+def repository():
+    repository = Repository()
+    for version in ["2.27-3ubuntu1.2", "2.27-3ubuntu1", "2.26-0ubuntu2", "2.27~rc1-1"]:
+        repository.add(_package("libc6", version))
+    return repository
+
+
+def test_repository_keeps_every_version_in_order(repository):
+    assert [str(package.version) for package in repository.versions("libc6")] == [
+        "0:2.26-0ubuntu2",
+        "0:2.27~rc1-1",
+        "0:2.27-3ubuntu1",
+        "0:2.27-3ubuntu1.2",
+    ]
+    assert str(repository["libc6"].version) == "0:2.27-3ubuntu1.2"
+
+
+@pytest.mark.parametrize(
+    "relationship,expected",
+    [
+        ("(<< 2.27)", ["2.26", "2.27~rc1"]),
+        ("(<= 2.27-3ubuntu1)", ["2.26", "2.27~rc1", "2.27"]),
+        ("(= 2.27-3ubuntu1)", ["2.27"]),
+        ("(>= 2.27)", ["2.27", "2.27"]),
+        ("(>> 2.27-3ubuntu1)", ["2.27"]),
+        ("(>> 3)", []),
+    ],
+)
+def test_repository_candidates(repository, relationship, expected):
+    candidates = repository.candidates("libc6", relationship_from_string(relationship))
+
+    assert [package.version.upstream_version for package in candidates] == expected
+
+
+def test_repository_overwrites_equal_versions(repository):
+    repository.add(_package("libc6", "2.27-3ubuntu1"))
+
+    assert len(repository.versions("libc6")) == 4
+    assert repository.candidates("python3") == []
+
+
+def test_update_with_no_packages_clears_indices(tmp_path):
+    path = tmp_path / "index.idx"
+    write_index(
+        path,
+        [{"Package": "dash", "Version": "1", "Architecture": "amd64"}],
+        "http://archive.ubuntu.com/ubuntu/",
+    )
+    repository = Repository(indices=[PackageIndex(path)])
+    assert repository["dash"] is not None
+
+    repository.update({})
+
+    assert repository.is_empty()
+    assert "dash" not in repository
+    assert repository["dash"] is None
@@ -0,0 +1,160 @@
+import pytest
+
+from fetchy.plugins.packages.index import PackageIndex, write_index
+from fetchy.plugins.packages.repository import Repository
+from fetchy.plugins.packages.resolver import Resolver, MinimalResolver, ClosureCache
+
+
+@pytest.fixture
+def repository(make_repository):
+    return make_repository(
+        {
+            "Package": "python3",
+            "Depends": "python3.6, mime-support",
+            "Pre-Depends": "dpkg",
+        },
+        {"Package": "python3.6", "Depends": "libc6, python3", "Installed-Size": "10"},
+        {"Package": "mime-support", "Depends": "mailcap | awk"},
+        {"Package": "dpkg", "Depends": "libc6"},
+        {"Package": "libc6"},
+        {"Package": "gawk", "Provides": "awk", "Installed-Size": "20"},
+        {"Package": "mawk", "Provides": "awk", "Installed-Size": "10"},
+    )
+
+
+def test_gather_dependencies_orders_dependencies_first(repository):
+    packages = Resolver(repository).gather_dependencies(["python3"])
+
+    assert list(packages) == [
+        "libc6",
+        "dpkg",
+        "python3.6",
+        "mawk",
+        "mime-support",
+        "python3",
+    ]
+
+
+def test_gather_dependencies_excludes(repository):
+    packages = Resolver(repository).gather_dependencies(
+        ["python3", "gawk"], ["dpkg", "mime-support"]
+    )
+
+    assert list(packages) == ["libc6", "python3.6", "python3", "gawk"]
+
+
+def test_gather_dependencies_deep_chain(make_repository):
+    depth = 5000
+    repository = make_repository(
+        *[{"Package": f"p{i}", "Depends": f"p{i + 1}"} for i in range(depth)]
+    )
+
+    packages = Resolver(repository).gather_dependencies(["p0"])
+
+    assert len(packages) == depth
+    assert list(packages)[-1] == "p0"
+
+
+def test_resolver_shares_candidates_between_calls(repository, monkeypatch):
+    resolver = Resolver(repository)
+    resolved = []
+    find_best_candidate = resolver.find_best_candidate
+
+    def record(names):
+        resolved.append(names)
+        return find_best_candidate(names)
+
+    monkeypatch.setattr(resolver, "find_best_candidate", record)
+
+    resolver.gather_dependencies(["mime-support"])
+    assert len(resolved) == 1
+
+    packages = resolver.gather_dependencies(["python3"])
+    assert len(resolved) == 7
+    assert resolved.count(["mailcap", "awk"]) == 1
+    assert list(packages)[-2:] == ["mime-support", "python3"]
+
+
+def test_closure_cache(tmp_path):
+    stanzas = [
+        {"Package": "python3", "Version": "3.6.7-1", "Depends": "libc6"},
+        {"Package": "libc6", "Version": "2.27-3ubuntu1"},
+        {"Package": "libc6", "Version": "2.26-0ubuntu2"},
+    ]
+    stanzas = [dict(stanza, Architecture="amd64") for stanza in stanzas]
+    write_index(tmp_path / "index.idx", stanzas, "http://archive.ubuntu.com/ubuntu/")
+    repository = Repository(indices=[PackageIndex(tmp_path / "index.idx")])
+    cache = ClosureCache(tmp_path / "closures")
+
+    packages = Resolver(repository, cache).gather_dependencies(["python3"])
+    assert len(list((tmp_path / "closures").iterdir())) == 1
+
+    resolver = Resolver(repository, cache)
+    resolver._walk = None
+    cached = resolver.gather_dependencies(["python3"])
+
+    assert list(cached) == ["libc6", "python3"]
+    assert [str(pkg.version) for pkg in cached.values()] == [
+        str(pkg.version) for pkg in packages.values()
+    ]
+
+    assert cache.load(repository, ["python3"], ["libc6"]) is None
+
+
+def test_closure_cache_requires_digest(repository, tmp_path):
+    cache = ClosureCache(tmp_path)
+
+    Resolver(repository, cache).gather_dependencies(["python3"])
+
+    assert repository.digest() is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.fixture
+def awk_repository(make_repository):
+    return make_repository(
+        {"Package": "mime-support", "Depends": "mawk | gawk"},
+        {"Package": "app", "Depends": "libsigsegv, mime-support"},
+        {"Package": "mawk", "Depends": "libsigsegv", "Installed-Size": "10"},
+        {"Package": "gawk", "Installed-Size": "20"},
+        {"Package": "libsigsegv", "Installed-Size": "1000"},
+    )
+
+
+def test_minimal_resolver_minimizes_closure_size(awk_repository):
+    assert list(Resolver(awk_repository).gather_dependencies(["mime-support"])) == [
+        "libsigsegv",
+        "mawk",
+        "mime-support",
+    ]
+    assert list(
+        MinimalResolver(awk_repository).gather_dependencies(["mime-support"])
+    ) == ["gawk", "mime-support"]
+
+
+def test_minimal_resolver_minimizes_marginal_size(awk_repository):
+    packages = MinimalResolver(awk_repository).gather_dependencies(["app"])
+
+    assert list(packages) == ["libsigsegv", "mawk", "mime-support", "app"]
+
+
+def test_minimal_resolver_handles_cycles(make_repository):
+    repository = make_repository(
+        {"Package": "perl", "Depends": "perl-base", "Installed-Size": "10"},
+        {
+            "Package": "perl-base",
+            "Depends": "perl, libdb | libgdbm",
+            "Installed-Size": "10",
+        },
+        {"Package": "libdb", "Depends": "libssl", "Installed-Size": "5"},
+        {"Package": "libssl", "Installed-Size": "100"},
+        {"Package": "libgdbm", "Depends": "perl", "Installed-Size": "50"},
+    )
+    resolver = MinimalResolver(repository)
+
+    assert list(resolver.gather_dependencies(["perl"])) == [
+        "libgdbm",
+        "perl-base",
+        "perl",
+    ]
+    assert resolver._closure_sizes["perl"] == resolver._closure_sizes["perl-base"]
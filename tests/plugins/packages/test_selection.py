@@ -0,0 +1,139 @@
+import os
+import hashlib
+import pytest
+
+from fetchy.plugins.packages import transfer
+from fetchy.plugins.packages.mirror import Mirror
+from fetchy.plugins.packages.parser import parse_sources
+from fetchy.plugins.packages.selection import MirrorSelector, failover
+from fetchy.plugins.packages.source import DebianBasedSource
+from fetchy.plugins.packages.transfer import Download, download_files
+
+
+class StandInMirror(Mirror):
+    def __init__(self, url, mirrors):
+        super(StandInMirror, self).__init__(None, mirrors)
+        self._url = url
+
+    def url(self):
+        return self._url
+
+    def url_with_locale(self):
+        return None
+
+
+def _publish(mirrors, path, data):
+    for mirror in mirrors:
+        (mirror.directory / path).parent.mkdir(parents=True, exist_ok=True)
+        (mirror.directory / path).write_bytes(data)
+
+
+def test_select_ranks_mirrors_by_latency(cache_dir, local_mirrors):
+    (slow, fast) = (local_mirrors(), local_mirrors())
+    _publish([slow, fast], "dists/bionic/Release", os.urandom(10000))
+    slow.delay = 0.3
+    mirror = StandInMirror(slow.url, [fast.url])
+
+    assert MirrorSelector().select(mirror, "dists/bionic/Release") == [
+        fast.url,
+        slow.url,
+    ]
+
+
+def test_select_caches_ranking(cache_dir, local_mirrors):
+    (first, second) = (local_mirrors(), local_mirrors())
+    _publish([first, second], "dists/bionic/Release", b"Suite: bionic\n")
+    mirror = StandInMirror(first.url, [second.url])
+
+    ranking = MirrorSelector().select(mirror, "dists/bionic/Release")
+    assert MirrorSelector().select(mirror, "dists/bionic/Release") == ranking
+    assert len(first.requests) == 1
+
+    MirrorSelector(ttl=0).select(mirror, "dists/bionic/Release")
+    assert len(first.requests) == 2
+
+
+def test_select_ranks_failing_mirrors_last(cache_dir, local_mirror, unreachable_url):
+    _publish([local_mirror], "dists/bionic/Release", b"Suite: bionic\n")
+    mirror = StandInMirror(unreachable_url, [local_mirror.url])
+
+    selector = MirrorSelector()
+    assert selector.select(mirror, "dists/bionic/Release") == [
+        local_mirror.url,
+        unreachable_url,
+    ]
+    assert selector.urls(unreachable_url + "pool/a.deb") == [
+        local_mirror.url + "pool/a.deb",
+        unreachable_url + "pool/a.deb",
+    ]
+    assert selector.urls("http://elsewhere/pool/a.deb") == [
+        "http://elsewhere/pool/a.deb"
+    ]
+
+
+def test_select_ranks_empty_mirrors_last(cache_dir, local_mirrors):
+    (empty, working) = (local_mirrors(), local_mirrors())
+    _publish([empty], "dists/bionic/Release", b"")
+    _publish([working], "dists/bionic/Release", b"Suite: bionic\n")
+    mirror = StandInMirror(empty.url, [working.url])
+
+    assert MirrorSelector().select(mirror, "dists/bionic/Release") == [
+        working.url,
+        empty.url,
+    ]
+
+
+def test_urls_spreads_over_best_mirrors(cache_dir):
+    selector = MirrorSelector(spread=2)
+    selector._rankings["http://a/"] = ["http://b/", "http://c/", "http://a/"]
+
+    assert selector.urls("http://a/x", 0) == ["http://b/x", "http://c/x", "http://a/x"]
+    assert selector.urls("http://a/x", 1) == ["http://c/x", "http://b/x", "http://a/x"]
+    assert selector.urls("http://a/x", 2) == ["http://b/x", "http://c/x", "http://a/x"]
+
+
+def test_failover_raises_last_error(cache_dir):
+    def request(url):
+        raise ConnectionRefusedError(url)
+
+    with pytest.raises(ConnectionRefusedError, match="second"):
+        failover(["first", "second"], request)
+    assert failover(["first"], lambda url: url) == "first"
+
+
+def test_download_fails_over_to_next_mirror(local_mirrors, tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer, "BACKOFF", 0)
+    (broken, missing, working) = (local_mirrors(), local_mirrors(), local_mirrors())
+    data = os.urandom(100000)
+    _publish([broken, working], "pool/a.deb", data)
+    broken.drop(10, after=30000)
+
+    download = Download(
+        broken.url + "pool/a.deb",
+        tmp_path / "a.deb",
+        hashlib.sha256(data).hexdigest(),
+        mirrors=[missing.url + "pool/a.deb", working.url + "pool/a.deb"],
+    )
+    download_files([download])
+
+    assert (tmp_path / "a.deb").read_bytes() == data
+    assert broken.ranges == [None]
+    assert missing.ranges == ["bytes=30000-"]
+    assert working.ranges == ["bytes=30000-"]
+
+
+def test_parse_sources_fails_over_to_next_mirror(
+    cache_dir, local_mirror, unreachable_url
+):
+    local_mirror.publish("bionic", {"main": [("dash", "1")]})
+    mirror = StandInMirror(unreachable_url, [local_mirror.url])
+    source = DebianBasedSource(mirror, "bionic", "amd64", ["main"], [])
+
+    selector = MirrorSelector()
+    repository = parse_sources([source], jobs=1, selector=selector)
+
+    # Packages are still identified by the mirror of their source
+    assert repository["dash"].download_url().startswith(unreachable_url)
+    assert selector.urls(repository["dash"].download_url())[0].startswith(
+        local_mirror.url
+    )
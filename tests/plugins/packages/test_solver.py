@@ -0,0 +1,141 @@
+import pytest
+
+from fetchy.plugins.packages.resolver import Resolver
+from fetchy.plugins.packages.solver import ConstraintResolver, ResolutionError
+
+
+def _resolve(repository, *names, excludes=()):
+    resolver = ConstraintResolver(repository, architecture="amd64")
+    packages = resolver.gather_dependencies(names, excludes)
+    return [
+        (name, package.version.upstream_version)
+        for (name, package) in packages.items()
+    ]
+
+
+def test_solver_honours_version_relationships(make_repository):
+    repository = make_repository(
+        {"Package": "python3", "Depends": "libc6 (<< 2.28), libssl (>= 1.1)"},
+        {"Package": "libc6", "Version": "2.27"},
+        {"Package": "libc6", "Version": "2.28"},
+        {"Package": "libssl", "Version": "1.0"},
+        {"Package": "libssl", "Version": "1.1"},
+    )
+
+    assert _resolve(repository, "python3") == [
+        ("libc6", "2.27"),
+        ("libssl", "1.1"),
+        ("python3", "1"),
+    ]
+
+
+def test_solver_backtracks_over_alternatives(make_repository):
+    repository = make_repository(
+        {"Package": "mime-support", "Depends": "gawk | mawk"},
+        {"Package": "gawk", "Depends": "libsigsegv2 (>= 2)"},
+        {"Package": "libsigsegv2", "Version": "1"},
+        {"Package": "mawk"},
+    )
+
+    assert _resolve(repository, "mime-support") == [
+        ("mawk", "1"),
+        ("mime-support", "1"),
+    ]
+
+
+def test_solver_honours_conflicts_and_breaks(make_repository):
+    repository = make_repository(
+        {"Package": "app", "Depends": "mta, libdb (>= 2) | libdb-compat"},
+        {"Package": "postfix", "Provides": "mta", "Installed-Size": "1"},
+        {"Package": "exim4", "Provides": "mta", "Installed-Size": "2"},
+        {"Package": "libdb", "Version": "2", "Conflicts": "postfix"},
+        {"Package": "libdb-compat", "Breaks": "exim4 (<< 2)"},
+    )
+
+    assert _resolve(repository, "app") == [
+        ("postfix", "1"),
+        ("libdb-compat", "1"),
+        ("app", "1"),
+    ]
+
+
+def test_solver_honours_conflicts_on_virtual_packages(make_repository):
+    repository = make_repository(
+        {"Package": "app", "Depends": "postfix, exim4"},
+        {"Package": "postfix", "Provides": "mta", "Conflicts": "mta"},
+        {"Package": "exim4", "Provides": "mta", "Conflicts": "mta"},
+    )
+
+    with pytest.raises(ResolutionError):
+        _resolve(repository, "app")
+
+
+def test_solver_honours_versioned_provides(make_repository):
+    repository = make_repository(
+        {"Package": "app", "Depends": "libjpeg (>= 8), jpeg-tools"},
+        {"Package": "libjpeg-turbo8", "Provides": "libjpeg (= 8.1), libjpeg8"},
+        {"Package": "libjpeg6", "Provides": "libjpeg (= 6), jpeg-tools"},
+        {"Package": "jpeg-tools-ng", "Provides": "jpeg-tools (= 2)"},
+    )
+
+    assert _resolve(repository, "app") == [
+        ("libjpeg-turbo8", "1"),
+        ("libjpeg6", "1"),
+        ("app", "1"),
+    ]
+    assert list(Resolver(repository).gather_dependencies(["app"])) == [
+        "libjpeg-turbo8",
+        "libjpeg6",
+        "app",
+    ]
+
+
+def test_solver_honours_architectures(make_repository):
+    repository = make_repository(
+        {"Package": "app", "Depends": "libc6 [amd64], libc6-i386 [i386], tzdata"},
+        {"Package": "libc6"},
+        {"Package": "libc6-i386", "Architecture": "i386"},
+        {"Package": "tzdata", "Architecture": "all"},
+        {"Package": "tzdata", "Version": "2", "Architecture": "i386"},
+    )
+
+    assert _resolve(repository, "app") == [
+        ("libc6", "1"),
+        ("tzdata", "1"),
+        ("app", "1"),
+    ]
+
+
+def test_solver_excludes_and_ignores_missing_packages(make_repository):
+    repository = make_repository(
+        {"Package": "python3", "Depends": "dpkg, python3-minimal, python3-missing"},
+        {"Package": "dpkg"},
+        {"Package": "python3-minimal", "Pre-Depends": "dpkg"},
+    )
+
+    assert _resolve(repository, "python3", excludes=["dpkg"]) == [
+        ("python3-minimal", "1"),
+        ("python3", "1"),
+    ]
+
+
+def test_solver_fails_on_unsatisfiable_dependencies(make_repository):
+    repository = make_repository(
+        {"Package": "python3", "Depends": "libc6 (>= 2.28)"},
+        {"Package": "libc6", "Version": "2.27"},
+    )
+
+    with pytest.raises(ResolutionError, match="libc6"):
+        _resolve(repository, "python3")
+
+
+def test_solver_deep_chain(make_repository):
+    depth = 5000
+    repository = make_repository(
+        *[{"Package": f"p{i}", "Depends": f"p{i + 1} | q{i}"} for i in range(depth)]
+    )
+
+    packages = _resolve(repository, "p0")
+
+    assert len(packages) == depth
+    assert packages[-1] == ("p0", "1")
@@ -0,0 +1,48 @@
+import os
+import errno
+import hashlib
+
+from fetchy.plugins.packages import store
+from fetchy.plugins.packages.store import PackageStore, materialize
+
+
+def _fail(error):
+    def fail(*args):
+        raise OSError(error, os.strerror(error))
+
+    return fail
+
+
+def test_materialize_hardlinks(tmp_path):
+    (tmp_path / "source").write_bytes(b"package")
+
+    assert materialize(tmp_path / "source", tmp_path / "target") == "hardlink"
+    assert os.path.samefile(tmp_path / "source", tmp_path / "target")
+
+
+def test_materialize_falls_back_to_copies(tmp_path, monkeypatch):
+    (tmp_path / "source").write_bytes(b"package")
+    (tmp_path / "target").write_bytes(b"stale")
+    monkeypatch.setattr(os, "link", _fail(errno.EXDEV))
+    monkeypatch.setattr(store, "_reflink", _fail(errno.EOPNOTSUPP))
+
+    assert materialize(tmp_path / "source", tmp_path / "target") == "copy"
+    assert (tmp_path / "target").read_bytes() == b"package"
+    assert not os.path.samefile(tmp_path / "source", tmp_path / "target")
+
+
+def test_package_store(tmp_path):
+    package_store = PackageStore(tmp_path / "debs")
+    sha256 = hashlib.sha256(b"package").hexdigest()
+
+    assert sha256 not in package_store
+
+    partial_path = package_store.partial_path(sha256)
+    partial_path.write_bytes(b"package")
+    package_store.add(partial_path, sha256)
+
+    assert sha256 in package_store
+    assert not partial_path.exists()
+
+    package_store.materialize(sha256, tmp_path / "package.deb")
+    assert (tmp_path / "package.deb").read_bytes() == b"package"
@@ -0,0 +1,253 @@
+import os
+import time
+import hashlib
+import pytest
+import threading
+import http.client
+import urllib.error
+
+from fetchy.plugins.packages import transfer
+from fetchy.plugins.packages.downloader import Downloader
+from fetchy.plugins.packages.package import package_from_dict
+from fetchy.plugins.packages.repository import Repository
+from fetchy.plugins.packages.transfer import (
+    ConnectionPool,
+    Download,
+    ChecksumError,
+    download_files,
+)
+
+
+def _publish(mirror, count, size=100000):
+    files = {}
+    for i in range(count):
+        path = f"pool/main/p/package{i}_1.0_amd64.deb"
+        files[path] = os.urandom(size)
+        (mirror.directory / path).parent.mkdir(parents=True, exist_ok=True)
+        (mirror.directory / path).write_bytes(files[path])
+    return files
+
+
+def test_download_files_concurrently(local_mirror, tmp_path):
+    files = _publish(local_mirror, 16)
+    local_mirror.delay = 0.2
+
+    downloads = [
+        Download(local_mirror.url + path, tmp_path / os.path.basename(path))
+        for path in files
+    ]
+    start = time.perf_counter()
+    download_files(downloads, concurrency=8)
+
+    assert time.perf_counter() - start < 16 * 0.2 / 2
+    assert local_mirror.connections <= 8
+    for (path, data) in files.items():
+        assert (tmp_path / os.path.basename(path)).read_bytes() == data
+
+
+def test_download_files_keeps_connections_alive(local_mirror, tmp_path):
+    files = _publish(local_mirror, 5)
+    pool = ConnectionPool()
+
+    downloads = [
+        Download(local_mirror.url + path, tmp_path / "package.deb") for path in files
+    ]
+    for _ in range(2):
+        download_files(downloads, concurrency=1, pool=pool)
+    pool.close()
+
+    assert local_mirror.connections == 1
+
+
+def test_download_files_removes_failed_downloads(local_mirror, tmp_path):
+    files = _publish(local_mirror, 1)
+
+    with pytest.raises(urllib.error.HTTPError):
+        download_files(
+            [
+                Download(local_mirror.url + path, tmp_path / os.path.basename(path))
+                for path in list(files) + ["pool/main/m/missing_1.0_amd64.deb"]
+            ],
+            concurrency=1,
+        )
+
+    assert not (tmp_path / "missing_1.0_amd64.deb").exists()
+
+
+def test_download_files_verifies_digests(local_mirror, tmp_path):
+    files = _publish(local_mirror, 1)
+    (path, data) = list(files.items())[0]
+    download = Download(
+        local_mirror.url + path,
+        tmp_path / "package.deb",
+        hashlib.sha256(data + b"tampered").hexdigest(),
+    )
+
+    with pytest.raises(ChecksumError):
+        download_files([download])
+
+    assert not (tmp_path / "package.deb").exists()
+
+
+def test_downloader_downloads_closure(local_mirror, cache_dir, tmp_path):
+    files = _publish(local_mirror, 3, size=1000)
+    repository = Repository()
+    for (i, path) in enumerate(files):
+        stanza = {
+            "Package": f"package{i}",
+            "Version": "1.0",
+            "Architecture": "amd64",
+            "Filename": path,
+            "SHA256": hashlib.sha256(files[path]).hexdigest(),
+            "Size": str(len(files[path])),
+        }
+        if i + 1 < len(files):
+            stanza["Depends"] = f"package{i + 1}"
+        repository.add(package_from_dict(stanza, local_mirror.url))
+
+    out_dir = tmp_path / "out"
+    downloaded = Downloader(repository, str(out_dir), concurrency=2).download_packages(
+        ["package0"]
+    )
+
+    assert [deb.package.name for deb in downloaded] == [
+        "package2",
+        "package1",
+        "package0",
+    ]
+    for deb in downloaded:
+        assert open(deb.deb_file, "rb").read() == files[deb.package.file_name()]
+
+    local_mirror.requests.clear()
+    again = Downloader(repository, str(tmp_path / "again")).download_packages(
+        ["package0"]
+    )
+    assert local_mirror.requests == []
+    for (first, second) in zip(downloaded, again):
+        assert os.stat(first.deb_file).st_ino == os.stat(second.deb_file).st_ino
+
+
+def test_download_files_resumes_dropped_connections(
+    local_mirror, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(transfer, "BACKOFF", 0)
+    files = _publish(local_mirror, 1)
+    (path, data) = list(files.items())[0]
+    local_mirror.drop(2, after=30000)
+
+    download = Download(
+        local_mirror.url + path,
+        tmp_path / "package.deb",
+        hashlib.sha256(data).hexdigest(),
+    )
+    download_files([download])
+
+    assert (tmp_path / "package.deb").read_bytes() == data
+    assert not os.path.exists(download.partial)
+    assert local_mirror.ranges == [None, "bytes=30000-", "bytes=60000-"]
+
+
+def test_download_files_restarts_without_range_support(
+    local_mirror, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(transfer, "BACKOFF", 0)
+    files = _publish(local_mirror, 1)
+    (path, data) = list(files.items())[0]
+    local_mirror.server.supports_ranges = False
+    local_mirror.drop(1, after=30000)
+
+    download = Download(
+        local_mirror.url + path,
+        tmp_path / "package.deb",
+        hashlib.sha256(data).hexdigest(),
+    )
+    download_files([download])
+
+    assert (tmp_path / "package.deb").read_bytes() == data
+
+
+def test_download_files_keeps_partial_downloads(local_mirror, tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer, "BACKOFF", 0)
+    monkeypatch.setattr(transfer, "RETRIES", 1)
+    files = _publish(local_mirror, 1)
+    (path, data) = list(files.items())[0]
+    local_mirror.drop(2, after=20000)
+
+    download = Download(
+        local_mirror.url + path,
+        tmp_path / "package.deb",
+        hashlib.sha256(data).hexdigest(),
+    )
+    with pytest.raises(http.client.IncompleteRead):
+        download_files([download])
+
+    assert not (tmp_path / "package.deb").exists()
+    assert open(download.partial, "rb").read() == data[:40000]
+
+    download_files([download])
+
+    assert (tmp_path / "package.deb").read_bytes() == data
+    assert local_mirror.ranges[-1] == "bytes=40000-"
+
+
+def test_download_files_removes_partial_downloads_without_digest(
+    local_mirror, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(transfer, "BACKOFF", 0)
+    monkeypatch.setattr(transfer, "RETRIES", 0)
+    files = _publish(local_mirror, 1)
+    local_mirror.drop(1, after=20000)
+
+    download = Download(local_mirror.url + list(files)[0], tmp_path / "package.deb")
+    with pytest.raises(http.client.IncompleteRead):
+        download_files([download])
+
+    assert not (tmp_path / "package.deb").exists()
+    assert not os.path.exists(download.partial)
+
+
+def test_concurrent_downloads_of_the_same_file(local_mirror, tmp_path):
+    files = _publish(local_mirror, 1)
+    (path, data) = list(files.items())[0]
+    local_mirror.delay = 0.3
+
+    # Every download opens its own connections, as separate builds would
+    def download():
+        download_files(
+            [
+                Download(
+                    local_mirror.url + path,
+                    tmp_path / "package.deb",
+                    hashlib.sha256(data).hexdigest(),
+                    partial=tmp_path / "package.part",
+                )
+            ],
+            pool=ConnectionPool(),
+        )
+
+    threads = [threading.Thread(target=download) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert (tmp_path / "package.deb").read_bytes() == data
+    assert not (tmp_path / "package.part").exists()
+    assert len(local_mirror.requests) == 1
+
+
+def test_download_files_restarts_mismatching_partial_downloads(local_mirror, tmp_path):
+    files = _publish(local_mirror, 1)
+    (path, data) = list(files.items())[0]
+
+    download = Download(
+        local_mirror.url + path,
+        tmp_path / "package.deb",
+        hashlib.sha256(data).hexdigest(),
+    )
+    with open(download.partial, "wb") as partial:
+        partial.write(b"\0" * 1000)
+    download_files([download])
+
+    assert (tmp_path / "package.deb").read_bytes() == data
+    assert local_mirror.ranges == ["bytes=1000-", None]
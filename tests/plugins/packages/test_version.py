@@ -1,6 +1,6 @@
 import pytest
 
-from fetchy.plugins.packages.version import Version, version_from_string
+from fetchy.plugins.packages.version import Version, compare_versions, version_from_string
 
 
 @pytest.mark.parametrize(
@@ -32,3 +32,34 @@ def test_version_from_string(input, epoch, upstream, debian):
 )
 def test_version_to_str(input, expected):
     assert str(input) == expected
+
+
+@pytest.mark.parametrize(
+    "earlier,later",
+    [
+        ("1.0~rc1", "1.0"),
+        ("1.0", "1.0.1"),
+        ("1.0", "1.0a"),
+        ("1.0a", "1.0+dfsg"),
+        ("1.0+dfsg", "1.0.1"),
+        ("1.9", "1.10"),
+        ("1.0~~", "1.0~"),
+        ("2.0", "1:0.1"),
+        ("2.27-3ubuntu1", "2.27-3ubuntu1.2"),
+        ("1.0-1~bpo1", "1.0-1"),
+    ],
+)
+def test_version_ordering(earlier, later):
+    assert version_from_string(earlier) < version_from_string(later)
+    assert version_from_string(later) > version_from_string(earlier)
+    assert compare_versions(earlier, later) < 0
+    assert compare_versions(later, earlier) > 0
+
+
+@pytest.mark.parametrize(
+    "left,right", [("1.0", "1.0-0"), ("1.00", "1.0"), ("0:1.0", "1.0")]
+)
+def test_version_equality(left, right):
+    assert version_from_string(left) == version_from_string(right)
+    assert hash(version_from_string(left)) == hash(version_from_string(right))
+    assert compare_versions(left, right) == 0
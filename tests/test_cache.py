@@ -0,0 +1,160 @@
+import os
+import sys
+import subprocess
+import pytest
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from fetchy.cache import CacheManager, parse_size
+
+PIN = """
+import sys
+from fetchy.cache import CacheManager
+
+manager = CacheManager(sys.argv[1])
+manager.pin(sys.argv[2])
+print("pinned", flush=True)
+sys.stdin.read()
+"""
+
+
+def create_entry(directory, name, size, accessed):
+    path = Path(directory, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0" * size)
+    os.utime(path, (accessed, accessed))
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    directory = Path(tmp_path, "fetchy")
+    create_entry(directory, "debs/aa/a.deb", 100, 1000)
+    create_entry(directory, "debs/bb/b.deb", 100, 3000)
+    create_entry(directory, "indices/c.idx", 50, 2000)
+    create_entry(directory, "builder/d", 200, 4000)
+    return CacheManager(directory)
+
+
+def pin_in_process(directory, path):
+    process = subprocess.Popen(
+        [sys.executable, "-c", PIN, str(directory), str(path)],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        cwd=Path(__file__).parent.parent,
+    )
+    assert process.stdout.readline() == b"pinned\n"
+    return process
+
+
+def test_parse_size():
+    assert parse_size("512") == 512
+    assert parse_size("10K") == 10 * 1024
+    assert parse_size("1.5G") == 1536 * 1024 ** 2
+    assert parse_size("2GiB") == 2 * 1024 ** 3
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_stats(cache):
+    stats = cache.stats()
+
+    assert stats["debs"] == (2, 200, 1000)
+    assert stats["indices"] == (1, 50, 2000)
+    assert stats["builder"] == (1, 200, 4000)
+
+
+def test_prune_evicts_least_recently_used(cache):
+    evicted = cache.prune(300)
+
+    assert [entry.path.name for entry in evicted] == ["a.deb", "c.idx"]
+    assert sum(entry.size for entry in cache.entries()) == 300
+
+
+def test_pin_marks_entry_as_used(cache):
+    cache.pin(Path(cache.directory, "debs/aa/a.deb"))
+    cache.release()
+
+    evicted = cache.prune(300)
+
+    assert [entry.path.name for entry in evicted] == ["c.idx", "b.deb"]
+
+
+def test_prune_keeps_entries_pinned_by_running_build(cache):
+    path = Path(cache.directory, "debs/aa/a.deb")
+    os.utime(path, (1000, 1000))
+    process = pin_in_process(cache.directory, path)
+    try:
+        os.utime(path, (1000, 1000))
+        evicted = cache.prune(0)
+    finally:
+        process.communicate()
+
+    assert path.exists()
+    assert len(evicted) == 3
+
+    cache.prune(0)
+
+    assert not path.exists()
+    assert list(Path(cache.directory, "pins").iterdir()) == []
+
+
+def test_prune_keeps_own_pins(cache):
+    path = cache.pin(Path(cache.directory, "builder/d"))
+
+    cache.prune(0)
+
+    assert path.exists()
+    cache.release()
+    cache.prune(0)
+    assert not path.exists()
+
+
+def test_pin_records_path_once(cache):
+    path = Path(cache.directory, "builder/d")
+
+    for _ in range(3):
+        cache.pin(path)
+
+    pins = Path(cache._pins.name).read_text().splitlines()
+    cache.release()
+    assert pins == [str(path.absolute())]
+
+
+def test_pin_without_file_locks(cache, monkeypatch):
+    monkeypatch.setattr("fetchy.cache.fcntl", None)
+    path = cache.pin(Path(cache.directory, "debs/aa/a.deb"))
+
+    cache.prune(0)
+
+    assert path.exists()
+    assert not Path(cache.directory, "pins").exists()
+
+
+def test_pin_from_threads(cache):
+    paths = [Path(cache.directory, f"debs/{i}.deb") for i in range(100)]
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(cache.pin, paths))
+
+    pins = Path(cache._pins.name).read_text().splitlines()
+    cache.release()
+    assert sorted(pins) == sorted(str(path.absolute()) for path in paths)
+
+
+def test_prune_skips_released_pin_files(cache, monkeypatch):
+    process = pin_in_process(cache.directory, Path(cache.directory, "builder/d"))
+
+    def released(path, *args, **kwargs):
+        # The process releases its pins right after they are listed
+        if Path(path).parent.name == "pins":
+            raise FileNotFoundError(path)
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr("fetchy.cache.open", released, raising=False)
+    try:
+        cache.prune(0)
+    finally:
+        process.communicate()
+
+    assert cache.entries() == []
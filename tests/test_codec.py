@@ -0,0 +1,76 @@
+import io
+import os
+import gzip
+import tarfile
+import pytest
+
+from types import SimpleNamespace
+from fetchy.codec import GzipCodec, NoCodec, get_codec, is_local_daemon
+
+
+def sample():
+    return b"fetchy " * 100000 + os.urandom(200000) + b"\0" * 100000
+
+
+def write(codec, path, data, chunk=16384):
+    with codec.open(path) as fileobj:
+        for offset in range(0, len(data), chunk):
+            fileobj.write(data[offset : offset + chunk])
+
+
+@pytest.mark.parametrize("block_size", [1000, 50000, 1024 * 1024])
+def test_parallel_gzip(tmp_path, block_size):
+    data = sample()
+    path = tmp_path / "data.gz"
+
+    write(GzipCodec(workers=4, block_size=block_size), path, data)
+
+    assert gzip.decompress(path.read_bytes()) == data
+
+
+def test_empty_parallel_gzip(tmp_path):
+    path = tmp_path / "data.gz"
+
+    write(GzipCodec(), path, b"")
+
+    assert gzip.decompress(path.read_bytes()) == b""
+
+
+def test_zstd(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    data = sample()
+    path = tmp_path / "data.zst"
+
+    write(get_codec("zstd"), path, data)
+
+    with zstandard.ZstdDecompressor().stream_reader(path.read_bytes()) as reader:
+        assert reader.read() == data
+
+
+@pytest.mark.parametrize("codec", [NoCodec(), GzipCodec(block_size=1000)])
+def test_open_tar(tmp_path, codec):
+    path = tmp_path / "image.tar"
+
+    with codec.open_tar(path) as tar:
+        info = tarfile.TarInfo("./hello")
+        info.size = 5
+        tar.addfile(info, io.BytesIO(b"hello"))
+
+    with tarfile.open(path) as tar:
+        assert tar.extractfile("./hello").read() == b"hello"
+
+
+def test_get_codec():
+    assert get_codec().name == "none"
+    assert get_codec(local=False).name == "gzip"
+    assert get_codec("zstd").name == "zstd"
+    with pytest.raises(ValueError):
+        get_codec("lzma")
+
+
+def test_is_local_daemon():
+    def client(base_url):
+        return SimpleNamespace(api=SimpleNamespace(base_url=base_url))
+
+    assert is_local_daemon(client("http+docker://localhost"))
+    assert not is_local_daemon(client("https://docker.example.com:2376"))